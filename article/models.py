@@ -22,3 +22,10 @@ class Article(models.Model):
 
     def __str__(self) -> str:
         return self.title
+
+    class Meta:
+        indexes = [
+            # keyset pagination of articles_list and my_articles, see utils/pagination.py
+            models.Index(fields=['-created_at', '-id'], name='article_created_id_idx'),
+            models.Index(fields=['student', '-created_at', '-id'], name='article_student_created_idx'),
+        ]
@@ -1,3 +1,43 @@
+from datetime import timedelta
 from django.test import TestCase
+from django.utils import timezone
+from authentication.models import Student
+from utils.pagination import KeysetPaginator
+from .models import Article
 
-# Create your tests here.
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        student = Student.objects.create(username="writer", email="writer@example.com")
+        cls.articles = [Article.objects.create(title=str(i), student=student) for i in range(7)]
+        # articles come in pairs sharing a timestamp, the id breaks the tie
+        start = timezone.now()
+        for i, article in enumerate(cls.articles):
+            article.created_at = start + timedelta(minutes=i // 2 * 2 + (i == 6))
+        Article.objects.bulk_update(cls.articles, ['created_at'])
+        cls.newest_first = [a.pk for a in sorted(cls.articles, key=lambda a: (a.created_at, a.pk), reverse=True)]
+
+    def paginator(self):
+        return KeysetPaginator(Article.objects.all(), 3)
+
+    def test_forward_then_back(self):
+        pages = [self.paginator().page()]
+        while pages[-1].has_next():
+            pages.append(self.paginator().page(pages[-1].next_cursor))
+        self.assertEqual([[a.pk for a in page] for page in pages],
+                         [self.newest_first[0:3], self.newest_first[3:6], self.newest_first[6:]])
+        self.assertFalse(pages[0].has_previous())
+
+        back = self.paginator().page(pages[-1].previous_cursor)
+        self.assertEqual([a.pk for a in back], self.newest_first[3:6])
+        self.assertTrue(back.has_previous() and back.has_next())
+
+    def test_bad_or_stale_cursor_starts_over(self):
+        first = [a.pk for a in self.paginator().page()]
+        self.assertEqual([a.pk for a in self.paginator().page("garbage")], first)
+
+        second = self.paginator().page(self.paginator().page().next_cursor)
+        cursor = self.paginator().page(second.next_cursor).previous_cursor
+        Article.objects.filter(pk__in=self.newest_first[:6]).delete()
+        self.assertEqual([a.pk for a in self.paginator().page(cursor)], self.newest_first[6:])
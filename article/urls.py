@@ -8,6 +8,8 @@ urlpatterns = [
     path('article/create/', views.article_create, name="ArticleCreate"),
     path('article/<int:article_id>/update/', views.article_update, name="ArticleUpdate"),
     path('article/delete/<int:article_id>/', views.article_delete, name='ArticleDelete'),
+    path('article/<int:article_id>/comments/', views.article_comments, name="ArticleComments"),
+    path('article/<int:article_id>/comments/<int:comment_id>/replies/', views.article_comment_replies, name="ArticleCommentReplies"),
     path('comment-add-article/<int:article_id>/', views.comment_add_article, name="CommentAddArticle"),
     path('comment-add-comment-article/<int:article_id>/<int:comment_id>/', views.comment_add_comment_article, name='CommentAddCommentArticle'),
 ]
@@ -1,23 +1,24 @@
 from django.shortcuts import redirect, render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
-from django.core.paginator import Paginator
 from django.http import HttpResponseForbidden, JsonResponse
 from school.models import  Comment
+from school import blocklist
+from school.threads import root_page, replies, as_json
+from django.contrib import messages
+from django.utils.translation import gettext as _
+from django.http import Http404
+from django.urls import reverse
 from .models import Article
 import random
-from utils.s3 import upload_fileobj_to_s3, public_url
+from utils.pagination import KeysetPaginator
+from utils.upload_handlers import streaming_uploads
+from jobs.media import defer_upload
 
 @login_required
 def article_detail(request, article_id):
     article = get_object_or_404(Article, pk=article_id)
-    comments = (Comment.objects
-                .filter(receiver_content_type__model='article',
-                        receiver_object_id=article.pk)
-                .select_related('sender')
-                .prefetch_related('children__sender')
-                .prefetch_related('children')
-                .order_by('-created_at'))
+    comments = root_page(article)
     return render(request, 'article.html', {
         'article': article,
         'comments': comments
@@ -27,6 +28,37 @@ def article_detail(request, article_id):
 
 
 @login_required
+@require_http_methods(["GET"])
+def article_comments(request, article_id):
+    "JSON feed of the article top level comments, newest first, ?cursor= for the next page"
+    article = get_object_or_404(Article.objects.only('id'), pk=article_id)
+    page = root_page(article, request.GET.get('cursor'))
+    return JsonResponse({
+        'comments': [
+            as_json(c,
+                    reverse('CommentAddCommentArticle', args=[article.pk, c.pk]),
+                    reverse('ArticleCommentReplies', args=[article.pk, c.pk]))
+            for c in page
+        ],
+        'next': page.next_cursor,
+    })
+
+
+@login_required
+@require_http_methods(["GET"])
+def article_comment_replies(request, article_id, comment_id):
+    "JSON list of every reply under one top level comment"
+    article = get_object_or_404(Article.objects.only('id'), pk=article_id)
+    rows = replies(article, comment_id)
+    if rows is None:
+        raise Http404("Comment not found.")
+    return JsonResponse({'replies': [as_json(r) for r in rows]})
+
+
+
+
+@login_required
+@streaming_uploads({'image': None})
 def article_create(request):
     if request.method == 'POST':
         try:
@@ -34,29 +66,17 @@ def article_create(request):
             content = request.POST.get('content')
             f = request.FILES.get("image")
 
-            image_url = None
-            if f:
-                try:
-                    f.open()
-                except Exception:
-                    pass
-
-                try:
-                    f.seek(0)
-                except Exception:
-                    pass
-
-                key = upload_fileobj_to_s3(f, content_type=f.content_type)
-                
-                image_url = public_url(key)
-
             a = Article.objects.create(
                 title=title,
                 content=content,
-                image=image_url,
+                image=None,
                 student=request.user
             )
 
+            # الصورة تُرفع في الخلفية وتُضاف للمقال عند انتهاء الرفع
+            if f:
+                defer_upload(request, a, 'image', f)
+
             return redirect('Article', a.pk)
         except Exception as e:
             print(e)
@@ -76,25 +96,13 @@ def article_update(request, article_id):
         article.title = request.POST.get('title') or article.title
         article.content = request.POST.get('content') or article.content
 
-        # إن وُجد ملف جديد ارفعه إلى S3 واحفظ رابطَه
+        article.save()
+
+        # إن وُجد ملف جديد يُرفع في الخلفية، والصورة القديمة تبقى حتى ينتهي الرفع
         f = request.FILES.get('image')
         if f:
-            try:
-                f.open()
-            except Exception:
-                pass
-            try:
-                f.seek(0)
-            except Exception:
-                pass
+            defer_upload(request, article, 'image', f)
 
-            key = upload_fileobj_to_s3(f, content_type=f.content_type)
-                
-            image_url = public_url(key)
-
-            article.image = image_url #type:ignore
-
-        article.save()
         return redirect('Article', article.pk)
 
     return render(request, 'article_form.html', {'article': article})
@@ -123,20 +131,16 @@ def article_delete(request, article_id):
 
 
 def articles_list(request):
-    articles = Article.objects.all().order_by("-created_at").select_related('student')
-    paginator = Paginator(articles, 15)
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.page(page_number)
-    return render(request, "article_list.html", { 'articles' : page_obj } )
+    articles = Article.objects.all().select_related('student')
+    page_obj = KeysetPaginator(articles, 15).page(request.GET.get('cursor'))
+    return render(request, "article_list.html", { 'articles' : page_obj, 'page_obj' : page_obj } )
 
 
 @login_required
 def my_articles(request):
-    articles = Article.objects.filter(student=request.user).order_by("-created_at")
-    paginator = Paginator(articles, 15)
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.page(page_number)
-    return render(request, "article_list.html", { 'articles' : page_obj } )
+    articles = Article.objects.filter(student=request.user).select_related('student')
+    page_obj = KeysetPaginator(articles, 15).page(request.GET.get('cursor'))
+    return render(request, "article_list.html", { 'articles' : page_obj, 'page_obj' : page_obj } )
 
 
 @login_required
@@ -147,6 +151,9 @@ def comment_add_comment_article(request, article_id, comment_id):
     content = request.POST.get('content')
     if content is None:
         return redirect("Article", article.pk)
+    if blocklist.blocked_term(content):
+        messages.error(request, _("Your comment was not posted because it contains a blocked word."))
+        return redirect("Article", article.pk)
     Comment.objects.create(
         content=content,
         sender=request.user,
@@ -163,6 +170,9 @@ def comment_add_article(request, article_id):
     content = request.POST.get('content')
     if content is None:
         return redirect("Article", article.pk)
+    if blocklist.blocked_term(content):
+        messages.error(request, _("Your comment was not posted because it contains a blocked word."))
+        return redirect("Article", article.pk)
     Comment.objects.create(
         content=content,
         sender=request.user,
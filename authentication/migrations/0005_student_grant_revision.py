@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0004_remove_student_is_teacher'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='grant_revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
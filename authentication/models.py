@@ -8,6 +8,8 @@ class Student(AbstractUser):
     REQUIRED_FIELDS = []
     bio = models.TextField(null=True, blank=True)
     courses = models.ManyToManyField('school.Course', related_name='students')
+    # bumped on refund/cancel so every signed course grant of the student stops verifying
+    grant_revision = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.first_name + ' ' + self.last_name
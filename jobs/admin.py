@@ -0,0 +1,16 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import Job, JobStatus
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'run_after', 'locked_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('created_at', 'finished_at')
+    actions = ['retry']
+
+    @admin.action(description="Queue the selected jobs again")
+    def retry(self, request, queryset):
+        queryset.update(status=JobStatus.QUEUED, attempts=0, run_after=timezone.now(),
+                        locked_until=None, locked_by='', finished_at=None)
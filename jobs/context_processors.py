@@ -0,0 +1,4 @@
+def pending_jobs(request):
+    "Uploads still running for this session, rendered by base.html and polled from the page."
+    session = getattr(request, 'session', None)
+    return {'pending_jobs': session.get('pending_jobs', []) if session is not None else []}
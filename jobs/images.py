@@ -0,0 +1,161 @@
+import io
+import os
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image, ImageOps, UnidentifiedImageError
+from utils.storage import get_storage
+from .media import post_processor
+from .queue import PermanentError, task
+
+
+WIDTHS = tuple(getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', (320, 640, 1024)))
+
+FORMATS = {
+    'webp': ('image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# the keys never change content, browsers and CDNs can keep them forever
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+DECODE_ERRORS = (UnidentifiedImageError, Image.DecompressionBombError)
+
+
+def derivative_key(key, width, fmt):
+    "media/courses/ab12.png -> media/courses/ab12.w640.webp, next to the original."
+    root, _ = os.path.splitext(key)
+    return f"{root}.w{width}.{'jpg' if fmt == 'jpeg' else fmt}"
+
+
+def _frame(image, fmt):
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    if not has_alpha:
+        return image.convert('RGB')
+    image = image.convert('RGBA')
+    if fmt == 'webp':
+        return image
+    # JPEG has no alpha: flatten on white like the cards' background
+    flat = Image.new('RGB', image.size, (255, 255, 255))
+    flat.paste(image, mask=image.getchannel('A'))
+    return flat
+
+
+def render(data):
+    """
+    Original bytes -> (width, height, {(width, fmt): bytes}) for every fixed width below the original's.
+    No I/O, the backfill runs it in other processes.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        if image.getexif().get(0x0112, 1) == 1:
+            # JPEG: let the decoder skip straight to a scale still wider than the largest derivative
+            image.draft('RGB', (WIDTHS[-1], WIDTHS[-1] * image.height // max(image.width, 1)))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    width, height = image.size
+    out = {}
+    for fmt in FORMATS:
+        source = _frame(image, fmt)
+        for w in WIDTHS:
+            if w >= width:
+                break
+            resized = source.resize((w, max(1, round(height * w / width))), Image.LANCZOS)
+            buffer = io.BytesIO()
+            resized.save(buffer, fmt.upper(), **FORMATS[fmt][1])
+            out[(w, fmt)] = buffer.getvalue()
+    return width, height, out
+
+
+def process(key):
+    "Makes and uploads the derivatives of one original; returns what record() stores. No database access."
+    storage = get_storage()
+    width, height, out = render(storage.get_bytes(key))
+    for (w, fmt), body in out.items():
+        storage.put_bytes(derivative_key(key, w, fmt), body, FORMATS[fmt][0], cache_control=CACHE_CONTROL)
+    return {'key': key, 'width': width, 'height': height, 'widths': sorted({w for w, _ in out})}
+
+
+def record(result):
+    from .models import ProcessedImage
+
+    ProcessedImage.objects.update_or_create(
+        key=result['key'],
+        defaults={'width': result['width'], 'height': result['height'], 'widths': result['widths']},
+    )
+    bump()
+
+
+VERSION_KEY = "jobs:images:version"
+
+# with a per-process cache (LocMemCache) the worker's bump never reaches the web processes
+MAX_AGE = 300
+
+
+def version():
+    value = cache.get(VERSION_KEY)
+    if value is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        value = cache.get(VERSION_KEY)
+    return value
+
+
+def bump():
+    cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+_loaded = (None, 0, {})
+_lock = threading.Lock()
+
+
+def processed():
+    "{key: ([widths], original width)} of every processed original, held per process, reloaded when the version moves."
+    global _loaded
+    current = version()
+    loaded_version, loaded_at, table = _loaded
+    if loaded_version == current and time.monotonic() - loaded_at < MAX_AGE:
+        return table
+    with _lock:
+        if _loaded[0] != current or time.monotonic() - _loaded[1] >= MAX_AGE:
+            from .models import ProcessedImage
+            rows = ProcessedImage.objects.values_list('key', 'widths', 'width')
+            _loaded = (current, time.monotonic(), {key: (widths, width) for key, widths, width in rows})
+        return _loaded[2]
+
+
+def srcset(url, fmt='jpeg'):
+    "srcset value for an image field, '' while it has no derivatives (or lives outside the storage)."
+    storage = get_storage()
+    key = storage.key_from_url(url)
+    widths, width = processed().get(key, ((), 0)) if key else ((), 0)
+    if not widths:
+        return ''
+    candidates = [f"{storage.url(derivative_key(key, w, fmt))} {w}w" for w in widths]
+    if fmt == 'jpeg':
+        # wider screens still get the original rather than an upscaled derivative
+        candidates.append(f"{url} {width}w")
+    return ', '.join(candidates)
+
+
+@post_processor('image')
+def derive(key, instance, field):
+    "Runs in the upload job, so the field only points at the image once its derivatives exist."
+    try:
+        result = process(key)
+    except DECODE_ERRORS:
+        # not an image Pillow can read: recorded without derivatives, the original is still served
+        result = {'key': key, 'width': 0, 'height': 0, 'widths': []}
+    record(result)
+    return {'widths': result['widths']}
+
+
+@task('images.derive')
+def derive_task(payload):
+    if get_storage().head(payload['key']) is None:
+        raise PermanentError("the original is gone")
+    try:
+        result = process(payload['key'])
+    except DECODE_ERRORS:
+        result = {'key': payload['key'], 'width': 0, 'height': 0, 'widths': []}
+    record(result)
+    return {'widths': result['widths']}
@@ -0,0 +1,58 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import django
+from django.core.management.base import BaseCommand
+from article.models import Article
+from jobs import images
+from jobs.models import ProcessedImage
+from school.models import Course, Lesson
+from utils.storage import get_storage
+
+
+class Command(BaseCommand):
+    help = "Makes the responsive derivatives of every course, lesson and article image that has none yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 2)
+        parser.add_argument('--limit', type=int, help="stop after this many originals")
+        parser.add_argument('--all', action='store_true', help="redo images that already have derivatives")
+
+    def handle(self, *args, **options):
+        keys = set()
+        skipped = 0
+        for model in (Course, Lesson, Article):
+            for url in model.objects.exclude(image='').exclude(image=None).values_list('image', flat=True).iterator():
+                key = get_storage().key_from_url(url)
+                if key is None:
+                    skipped += 1
+                else:
+                    keys.add(key)
+        if not options['all']:
+            keys -= set(ProcessedImage.objects.filter(key__in=keys).values_list('key', flat=True))
+        keys = sorted(keys)[:options['limit']]
+        self.stdout.write(f"{len(keys)} originals to process, {skipped} images outside the storage skipped")
+        if not keys:
+            return
+
+        started = time.perf_counter()
+        done = failed = 0
+        # spawn, not fork: every child sets Django up again and opens its own S3 connections,
+        # the parent alone writes to the database
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(options['processes'], mp_context=context, initializer=django.setup) as pool:
+            futures = {pool.submit(images.process, key): key for key in keys}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    result = future.result()
+                except images.DECODE_ERRORS:
+                    result = {'key': key, 'width': 0, 'height': 0, 'widths': []}
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"{key}: {e}")
+                    continue
+                images.record(result)
+                done += 1
+        self.stdout.write(f"{done} processed, {failed} failed in {time.perf_counter() - started:.1f}s")
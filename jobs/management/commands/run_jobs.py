@@ -0,0 +1,66 @@
+import os
+import signal
+import socket
+import threading
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from jobs import queue
+
+
+class Command(BaseCommand):
+    help = "Runs queued background jobs (media uploads, post-processing) with a pool of worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help="worker threads in this process")
+        parser.add_argument('--visibility', type=int, default=getattr(settings, 'JOBS_VISIBILITY_TIMEOUT', 300),
+                            help="seconds a claimed job stays locked without a heartbeat")
+        parser.add_argument('--poll', type=float, default=1.0, help="seconds to wait when the queue is empty")
+        parser.add_argument('--burst', action='store_true', help="exit once the queue is empty")
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            # finish the running jobs, then exit
+            signal.signal(sig, lambda *_: self.stop.set())
+
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        threads = [threading.Thread(target=self.work, args=(f"{prefix}:{n}", options), daemon=True)
+                   for n in range(options['concurrency'])]
+        for t in threads:
+            t.start()
+        while any(t.is_alive() for t in threads):
+            for t in threads:
+                t.join(0.5)
+
+    def work(self, worker, options):
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                job = queue.claim(worker, options['visibility'])
+                if job is None:
+                    if options['burst']:
+                        return
+                    self.stop.wait(options['poll'])
+                    continue
+                status = self.run_with_heartbeat(job, worker, options['visibility'])
+                self.stdout.write(f"{worker} {job.name}#{job.pk} attempt {job.attempts}: {status}")
+        finally:
+            connection.close()
+
+    def run_with_heartbeat(self, job, worker, visibility):
+        done = threading.Event()
+
+        def beat():
+            # keeps the lock while a long upload runs, a crashed worker stops beating and the job comes back
+            while not done.wait(visibility / 3):
+                queue.extend(job, worker, visibility)
+            connection.close()
+
+        heart = threading.Thread(target=beat, daemon=True)
+        heart.start()
+        try:
+            return queue.run(job, worker)
+        finally:
+            done.set()
+            heart.join()
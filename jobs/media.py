@@ -0,0 +1,119 @@
+import os
+import shutil
+import uuid
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from utils import s3
+from .queue import PermanentError, enqueue, task
+
+
+# post-processing per file class ('image', 'video', 'default'), run by the worker after the upload:
+# func(key, instance, field) -> dict merged into the job result
+POST_PROCESSORS = {}
+
+
+def post_processor(kind):
+    def decorator(func):
+        POST_PROCESSORS.setdefault(kind, []).append(func)
+        return func
+    return decorator
+
+
+def spool_dir():
+    path = getattr(settings, 'JOBS_SPOOL_DIR', os.path.join(settings.BASE_DIR, 'spool'))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _spool(uploaded_file):
+    "Keeps the request's file where the worker can read it; a temporary upload is moved, not copied."
+    _, ext = os.path.splitext(uploaded_file.name)
+    path = os.path.join(spool_dir(), f"{uuid.uuid4().hex}{ext.lower()}")
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        uploaded_file.close()
+        shutil.move(uploaded_file.temporary_file_path(), path)
+    else:
+        with open(path, 'wb') as out:
+            for chunk in uploaded_file.chunks():
+                out.write(chunk)
+    return path
+
+
+def defer_upload(request, instance, field, uploaded_file, folder=None):
+    """
+    Sets ``instance.<field>`` to the uploaded file's public URL, now or from the worker.
+    Bytes the bucket already has (streamed during the request, or the same SHA-256 uploaded before)
+    are set at once and None is returned. Anything else is spooled for the worker, which uploads it,
+    runs the post-processing and then sets the field; the job is returned and the next pages poll it.
+    Without JOBS_SPOOL_SHARED the workers cannot read the spool, so the upload happens here and only
+    the post-processing (queued by the post_save receivers) waits for a worker.
+    folder: the bucket folder when it is not UPLOAD_S3_FOLDER (s3.PRIVATE_S3_FOLDER for paid content).
+    """
+    if getattr(uploaded_file, 's3_key', None):
+        key, digest = uploaded_file.claim(), None
+    else:
+        digest, size = s3.file_digest(uploaded_file)
+        key = s3.find_existing(digest, size, uploaded_file.name, folder)
+        if key is None and not getattr(settings, 'JOBS_SPOOL_SHARED', False):
+            key = s3.upload_fileobj_to_s3(uploaded_file, content_type=getattr(uploaded_file, 'content_type', None),
+                                          digest=digest, folder=folder)
+    if key is not None:
+        # the post_save receivers take care of whatever post-processing the object still lacks
+        setattr(instance, field, s3.public_url(key))
+        instance.save(update_fields=[field])
+        return None
+
+    payload = {
+        'model': instance._meta.label,
+        'pk': instance.pk,
+        'field': field,
+        'name': uploaded_file.name,
+        'content_type': getattr(uploaded_file, 'content_type', None),
+        'sha256': digest,
+        'folder': folder,
+        'path': _spool(uploaded_file),
+    }
+    job = enqueue('media.upload', payload, owner=request.user)
+    request.session['pending_jobs'] = request.session.get('pending_jobs', []) + [job.pk]
+    return job
+
+
+@task('media.upload')
+def upload(payload):
+    try:
+        model = apps.get_model(payload['model'])
+    except LookupError:
+        raise PermanentError(f"unknown model {payload['model']}")
+    instance = model.objects.filter(pk=payload['pk']).first()
+
+    key = payload.get('key')
+    path = payload.get('path')
+    if key is None:
+        if not path or not os.path.exists(path):
+            raise PermanentError("the spooled file is gone")
+        if instance is None:
+            os.remove(path)
+            raise PermanentError(f"{payload['model']}#{payload['pk']} was deleted")
+        with open(path, 'rb') as f:
+            key = s3.upload_fileobj_to_s3(File(f, name=payload['name']), content_type=payload['content_type'],
+                                          digest=payload.get('sha256'), folder=payload.get('folder'))
+        # a retry after this point reuses the uploaded object
+        payload['key'] = key
+    elif instance is None:
+        # the object stays: content addressed keys may be used by other rows
+        if path and os.path.exists(path):
+            os.remove(path)
+        raise PermanentError(f"{payload['model']}#{payload['pk']} was deleted")
+
+    result = {'key': key, 'url': s3.public_url(key)}
+    for func in POST_PROCESSORS.get(s3.file_class(payload['name'], payload['content_type']), []):
+        result.update(func(key, instance, payload['field']) or {})
+
+    # save() rather than update() so the post_save receivers (search index, caches) see the new file
+    setattr(instance, payload['field'], result['url'])
+    instance.save(update_fields=[payload['field']])
+    if path and os.path.exists(path):
+        # only now: a worker that dies half way can start again from the file
+        os.remove(path)
+    return result
@@ -0,0 +1,113 @@
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Job, JobStatus
+
+
+TASKS = {}
+
+
+class PermanentError(Exception):
+    "Raised by a task when trying again cannot help (the file or the row is gone): the job fails at once."
+
+
+def task(name):
+    """
+    Registers a function as the handler of jobs called ``name``: it gets the payload and returns the result dict.
+    Changes it makes to the payload are kept when the job is retried.
+    """
+    def decorator(func):
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue(name, payload, owner=None, max_attempts=None, delay=0):
+    "Adds a job; inside a transaction the workers only see it once the transaction commits."
+    if name not in TASKS:
+        raise ValueError(f"unknown job {name!r}")
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        owner=owner if owner is not None and owner.is_authenticated else None,
+        max_attempts=max_attempts or _setting('JOBS_MAX_ATTEMPTS', 5),
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def _claimable(now):
+    return (Q(status=JobStatus.QUEUED, run_after__lte=now)
+            | Q(status=JobStatus.RUNNING, locked_until__lt=now))
+
+
+def claim(worker, visibility=None):
+    """
+    The next due job, locked for ``visibility`` seconds, or None.
+    Each candidate is taken with a conditional UPDATE, so any number of workers on any database
+    can race for the same rows and only one wins each; a job whose worker died comes back once its lock runs out.
+    """
+    visibility = visibility or _setting('JOBS_VISIBILITY_TIMEOUT', 300)
+    now = timezone.now()
+    candidates = list(Job.objects.filter(_claimable(now)).order_by('run_after', 'id').values_list('id', flat=True)[:10])
+    for pk in candidates:
+        taken = (Job.objects
+                 .filter(_claimable(now), pk=pk)
+                 .update(status=JobStatus.RUNNING, locked_by=worker, attempts=F('attempts') + 1,
+                         locked_until=now + timedelta(seconds=visibility)))
+        if not taken:
+            continue
+        job = Job.objects.get(pk=pk)
+        if job.attempts > job.max_attempts:
+            # the last attempt took the worker down with it
+            _close(job, worker, JobStatus.FAILED, error=job.last_error or "worker lost the job too many times")
+            continue
+        return job
+    return None
+
+
+def extend(job, worker, visibility=None):
+    "Heartbeat for long jobs; False when the lock already went to another worker."
+    visibility = visibility or _setting('JOBS_VISIBILITY_TIMEOUT', 300)
+    return bool(Job.objects
+                .filter(pk=job.pk, status=JobStatus.RUNNING, locked_by=worker)
+                .update(locked_until=timezone.now() + timedelta(seconds=visibility)))
+
+
+def _close(job, worker, status, result=None, error='', payload=None):
+    changes = dict(status=status, locked_until=None, last_error=error)
+    if payload is not None:
+        changes['payload'] = payload
+    if status in (JobStatus.DONE, JobStatus.FAILED):
+        changes['finished_at'] = timezone.now()
+    if result is not None:
+        changes['result'] = result
+    if status == JobStatus.QUEUED:
+        backoff = _setting('JOBS_RETRY_BACKOFF', 30) * 2 ** max(job.attempts - 1, 0)
+        changes['run_after'] = timezone.now() + timedelta(seconds=min(backoff, 3600))
+    return bool(Job.objects.filter(pk=job.pk, status=JobStatus.RUNNING, locked_by=worker).update(**changes))
+
+
+def run(job, worker):
+    "Runs a claimed job and records the outcome: done, queued again with backoff, or failed."
+    handler = TASKS.get(job.name)
+    try:
+        if handler is None:
+            raise PermanentError(f"no handler for {job.name!r}")
+        result = handler(job.payload) or {}
+    except PermanentError as e:
+        _close(job, worker, JobStatus.FAILED, error=str(e))
+        return JobStatus.FAILED
+    except Exception:
+        error = traceback.format_exc(limit=5)
+        status = JobStatus.QUEUED if job.attempts < job.max_attempts else JobStatus.FAILED
+        # tasks may record progress in the payload (an uploaded key) for the next attempt
+        _close(job, worker, status, error=error, payload=job.payload)
+        return status
+    _close(job, worker, JobStatus.DONE, result=result)
+    return JobStatus.DONE
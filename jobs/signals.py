@@ -0,0 +1,25 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from utils.storage import get_storage
+from .models import ProcessedImage
+from .queue import enqueue
+
+
+def _needs_derivatives(instance, update_fields):
+    if update_fields is not None and 'image' not in update_fields:
+        return None
+    key = get_storage().key_from_url(instance.image)
+    if key is None or ProcessedImage.objects.filter(key=key).exists():
+        return None
+    return key
+
+
+@receiver(post_save, sender='school.Course')
+@receiver(post_save, sender='school.Lesson')
+@receiver(post_save, sender='article.Article')
+def image_saved(sender, instance, update_fields=None, **kwargs):
+    "Images that did not come through the upload job (edit forms, admin) get their derivatives in the background."
+    key = _needs_derivatives(instance, update_fields)
+    if key is not None:
+        transaction.on_commit(lambda: enqueue('images.derive', {'key': key}))
@@ -0,0 +1,295 @@
+import io
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils.datastructures import MultiValueDict
+from django.utils import timezone
+from PIL import Image
+from utils import s3
+from utils.storage import LocalStorage, get_storage
+from utils.upload_handlers import S3UploadedFile, discard_unclaimed
+from . import images, queue
+from .models import Job, JobStatus, StoredObject
+
+
+def succeed(payload):
+    return {'echo': payload.get('value')}
+
+
+def flaky(payload):
+    payload['tries'] = payload.get('tries', 0) + 1
+    raise RuntimeError("try again")
+
+
+def gone(payload):
+    raise queue.PermanentError("the file is gone")
+
+
+@override_settings(JOBS_MAX_ATTEMPTS=2, JOBS_RETRY_BACKOFF=30, JOBS_VISIBILITY_TIMEOUT=60)
+class QueueTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(queue.TASKS, {'test.succeed': succeed, 'test.flaky': flaky, 'test.gone': gone})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def expire_lock(self, job):
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+    def test_enqueue_unknown_task(self):
+        with self.assertRaises(ValueError):
+            queue.enqueue('test.missing', {})
+
+    def test_claim_locks_the_job_for_one_worker(self):
+        job = queue.enqueue('test.succeed', {'value': 3})
+        claimed = queue.claim('a')
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual((claimed.status, claimed.locked_by, claimed.attempts), (JobStatus.RUNNING, 'a', 1))
+        self.assertIsNone(queue.claim('b'))
+
+    def test_delayed_job_waits(self):
+        queue.enqueue('test.succeed', {}, delay=60)
+        self.assertIsNone(queue.claim('a'))
+
+    def test_run_records_the_result(self):
+        queue.enqueue('test.succeed', {'value': 3})
+        job = queue.claim('a')
+        self.assertEqual(queue.run(job, 'a'), JobStatus.DONE)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), (JobStatus.DONE, {'echo': 3}))
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(queue.claim('a'))
+
+    def test_retry_with_backoff_then_fail(self):
+        queue.enqueue('test.flaky', {})
+        job = queue.claim('a')
+        self.assertEqual(queue.run(job, 'a'), JobStatus.QUEUED)
+        job.refresh_from_db()
+        self.assertEqual(job.payload, {'tries': 1})
+        self.assertIn("try again", job.last_error)
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=20))
+        # not due before the backoff
+        self.assertIsNone(queue.claim('a'))
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        job = queue.claim('a')
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(queue.run(job, 'a'), JobStatus.FAILED)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.payload), (JobStatus.FAILED, {'tries': 2}))
+
+    def test_permanent_error_fails_at_once(self):
+        queue.enqueue('test.gone', {})
+        job = queue.claim('a')
+        self.assertEqual(queue.run(job, 'a'), JobStatus.FAILED)
+        job.refresh_from_db()
+        self.assertEqual((job.attempts, job.last_error), (1, "the file is gone"))
+
+    def test_expired_lock_goes_to_another_worker(self):
+        queue.enqueue('test.succeed', {'value': 1})
+        lost = queue.claim('a')
+        self.assertTrue(queue.extend(lost, 'a'))
+        self.assertIsNone(queue.claim('b'))
+
+        self.expire_lock(lost)
+        taken = queue.claim('b')
+        self.assertEqual((taken.pk, taken.locked_by, taken.attempts), (lost.pk, 'b', 2))
+        # the first worker woke up: it can neither extend nor close the job any more
+        self.assertFalse(queue.extend(lost, 'a'))
+        queue.run(lost, 'a')
+        taken.refresh_from_db()
+        self.assertEqual((taken.status, taken.locked_by), (JobStatus.RUNNING, 'b'))
+        self.assertEqual(queue.run(taken, 'b'), JobStatus.DONE)
+
+    def test_job_losing_every_worker_fails(self):
+        queue.enqueue('test.succeed', {})
+        for worker in ('a', 'b'):
+            self.expire_lock(queue.claim(worker))
+        self.assertIsNone(queue.claim('c'))
+        job = Job.objects.get()
+        self.assertEqual(job.status, JobStatus.FAILED)
+        self.assertEqual(job.attempts, 3)
+
+
+class LocalStorageTests(SimpleTestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.storage = LocalStorage(root.name, '/media/')
+
+    def test_round_trip(self):
+        key = 'media/courses/a/b.webp'
+        self.assertIsNone(self.storage.head(key))
+        self.storage.put_bytes(key, b'image', 'image/webp')
+        self.assertEqual(self.storage.get_bytes(key), b'image')
+        self.assertEqual(self.storage.head(key), {'ContentLength': 5, 'ContentType': 'image/webp'})
+        self.storage.delete(key)
+        self.storage.delete(key)
+        self.assertIsNone(self.storage.head(key))
+
+    def test_keys_stay_under_the_root(self):
+        for key in ('../outside', '/etc/passwd', 'a/../../outside'):
+            with self.subTest(key=key), self.assertRaises(ValueError):
+                self.storage.put_bytes(key, b'x')
+
+    def test_urls(self):
+        self.assertEqual(self.storage.url('a/b.png'), '/media/a/b.png')
+        self.assertEqual(self.storage.key_from_url('/media/a/b.png'), 'a/b.png')
+        # what a FileField holds on local storage
+        self.assertEqual(self.storage.key_from_url('a/b.png'), 'a/b.png')
+        for url in ('https://cdn.example.com/a/b.png', '/static/a.png', '/media/', ''):
+            with self.subTest(url=url):
+                self.assertIsNone(self.storage.key_from_url(url))
+
+    def test_settings_pick_the_storage(self):
+        with override_settings(OBJECT_STORAGE='', USE_S3=False):
+            self.assertIsInstance(get_storage(), LocalStorage)
+            self.assertIs(get_storage(), get_storage())
+        with override_settings(OBJECT_STORAGE='utils.storage.S3Storage'):
+            self.assertEqual(type(get_storage()).__name__, 'S3Storage')
+
+
+def image_bytes(size, mode='RGB', color=(200, 30, 30), fmt='PNG', orientation=None):
+    image = Image.new(mode, size, color)
+    buffer = io.BytesIO()
+    if orientation:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        image.save(buffer, fmt, exif=exif)
+    else:
+        image.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+@mock.patch.object(images, 'WIDTHS', (320, 640, 1024))
+class RenderTests(SimpleTestCase):
+    def test_widths_below_the_original(self):
+        width, height, out = images.render(image_bytes((700, 350)))
+        self.assertEqual((width, height), (700, 350))
+        self.assertEqual(sorted(out), [(320, 'jpeg'), (320, 'webp'), (640, 'jpeg'), (640, 'webp')])
+        with Image.open(io.BytesIO(out[(640, 'jpeg')])) as derivative:
+            self.assertEqual((derivative.format, derivative.size), ('JPEG', (640, 320)))
+        self.assertEqual(images.render(image_bytes((300, 300)))[2], {})
+
+    def test_alpha_is_flattened_for_jpeg_only(self):
+        _, _, out = images.render(image_bytes((400, 100), 'RGBA', (200, 30, 30, 0)))
+        with Image.open(io.BytesIO(out[(320, 'jpeg')])) as jpeg:
+            self.assertEqual(jpeg.mode, 'RGB')
+            self.assertEqual(jpeg.getpixel((160, 40)), (255, 255, 255))
+        with Image.open(io.BytesIO(out[(320, 'webp')])) as webp:
+            self.assertEqual(webp.mode, 'RGBA')
+            self.assertEqual(webp.getpixel((160, 40))[3], 0)
+
+    def test_exif_orientation_is_applied(self):
+        # stored landscape, shown portrait (rotated 90°)
+        width, height, out = images.render(image_bytes((800, 400), fmt='JPEG', orientation=6))
+        self.assertEqual((width, height), (400, 800))
+        with Image.open(io.BytesIO(out[(320, 'jpeg')])) as derivative:
+            self.assertEqual(derivative.size, (320, 640))
+
+    def test_derivative_key(self):
+        self.assertEqual(images.derivative_key('media/courses/ab12.png', 640, 'webp'), 'media/courses/ab12.w640.webp')
+        self.assertEqual(images.derivative_key('media/courses/ab12.png', 320, 'jpeg'), 'media/courses/ab12.w320.jpg')
+        self.assertEqual(images.derivative_key('ab12', 320, 'webp'), 'ab12.w320.webp')
+
+
+class SrcsetTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        override = override_settings(OBJECT_STORAGE='utils.storage.LocalStorage', MEDIA_ROOT=root.name,
+                                     MEDIA_URL='/media/')
+        override.enable()
+        self.addCleanup(override.disable)
+        get_storage().put_bytes('courses/a.png', image_bytes((700, 350)))
+
+    @mock.patch.object(images, 'WIDTHS', (320, 640, 1024))
+    def test_empty_until_processed(self):
+        self.assertEqual(images.srcset('/media/courses/a.png'), '')
+        images.record(images.process('courses/a.png'))
+        self.assertEqual(get_storage().head('courses/a.w640.webp')['ContentType'], 'image/webp')
+        self.assertEqual(images.srcset('/media/courses/a.png'),
+                         '/media/courses/a.w320.jpg 320w, /media/courses/a.w640.jpg 640w, /media/courses/a.png 700w')
+        self.assertEqual(images.srcset('/media/courses/a.png', 'webp'),
+                         '/media/courses/a.w320.webp 320w, /media/courses/a.w640.webp 640w')
+        # outside the storage
+        self.assertEqual(images.srcset('https://cdn.example.com/a.png'), '')
+
+
+class DeduplicationTests(TestCase):
+    """utils.s3 content addressing, with the bucket's HEAD answers stubbed."""
+
+    DIGEST = 'ab' * 32
+
+    def setUp(self):
+        self.objects = {}
+        for name, stub in (('head', self.objects.get), ('delete', self.objects.pop)):
+            patcher = mock.patch.object(s3, name, side_effect=stub)
+            self.addCleanup(patcher.stop)
+            setattr(self, name, patcher.start())
+
+    def store(self, key, size):
+        self.objects[key] = {'ContentLength': size}
+
+    def public_key(self):
+        return s3.content_key(self.DIGEST, 'a.png')
+
+    def test_index_hit(self):
+        key = s3.new_key('a.png')
+        self.store(key, 10)
+        StoredObject.objects.create(sha256=self.DIGEST, key=key, size=10)
+        self.assertEqual(s3.find_existing(self.DIGEST, 10, 'a.png'), key)
+        self.head.assert_called_once_with(key)
+
+    def test_stale_index_row_is_dropped(self):
+        key = s3.new_key('a.png')
+        for stored in (4, None):
+            with self.subTest(stored=stored):
+                self.objects.clear()
+                if stored:
+                    self.store(key, stored)
+                StoredObject.objects.create(sha256=self.DIGEST, key=key, size=10)
+                self.assertIsNone(s3.find_existing(self.DIGEST, 10))
+                self.assertFalse(StoredObject.objects.exists())
+
+    def test_content_key_fallback(self):
+        self.store(self.public_key(), 10)
+        self.assertEqual(s3.find_existing(self.DIGEST, 10, 'a.PNG'), self.public_key())
+        self.assertEqual(StoredObject.objects.get().key, self.public_key())
+        self.assertIsNone(s3.find_existing('cd' * 32, 10, 'a.png'))
+
+    def test_public_and_private_copies_stay_apart(self):
+        self.store(self.public_key(), 10)
+        StoredObject.objects.create(sha256=self.DIGEST, key=self.public_key(), size=10)
+        self.assertIsNone(s3.find_existing(self.DIGEST, 10, 'a.png', s3.PRIVATE_S3_FOLDER))
+        self.head.assert_called_once_with(s3.content_key(self.DIGEST, 'a.png', s3.PRIVATE_S3_FOLDER))
+        # the public copy is still indexed for public uploads
+        self.assertEqual(s3.find_existing(self.DIGEST, 10, 'a.png'), self.public_key())
+
+    def test_upload_sends_only_new_bytes(self):
+        with mock.patch.object(s3, 'client') as client:
+            key = s3.upload_fileobj_to_s3(SimpleUploadedFile('a.png', b'image', 'image/png'))
+            digest, size = s3.file_digest(SimpleUploadedFile('a.png', b'image'))
+            self.assertEqual(key, s3.content_key(digest, 'a.png'))
+            self.assertEqual(client().upload_fileobj.call_count, 1)
+            self.store(key, size)
+
+            again = s3.upload_fileobj_to_s3(SimpleUploadedFile('b.png', b'image', 'image/png'))
+            self.assertEqual(again, key)
+            self.assertEqual(client().upload_fileobj.call_count, 1)
+
+    def test_discard_unclaimed(self):
+        def streamed(key, disposable):
+            f = S3UploadedFile(key, 'a.png', 'image/png', 10)
+            f.disposable = (self.DIGEST, 10) if disposable else None
+            self.store(key, 10)
+            return f
+
+        dropped, kept, shared = streamed('u/1.png', True), streamed('u/2.png', True), streamed('c/ab.png', False)
+        kept.claim()
+        request = RequestFactory().post('/')
+        request._files = MultiValueDict({'image': [dropped, kept], 'other': [shared]})
+        discard_unclaimed(request)
+        self.delete.assert_called_once_with('u/1.png')
+        self.assertEqual(StoredObject.objects.get().key, 'u/2.png')
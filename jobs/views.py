@@ -0,0 +1,18 @@
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from .models import Job, JobStatus
+
+
+@login_required
+def job_status(request, pk):
+    "polled by static/js/job_status.js until the job is done or failed"
+    job = get_object_or_404(Job, pk=pk, owner=request.user)
+    data = {'id': job.pk, 'status': job.status, 'attempts': job.attempts}
+    if job.status == JobStatus.DONE:
+        data['url'] = job.result.get('url')
+    if job.finished:
+        pending = request.session.get('pending_jobs', [])
+        if job.pk in pending:
+            request.session['pending_jobs'] = [i for i in pending if i != job.pk]
+    return JsonResponse(data)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class OperationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'operation'
+
+    def ready(self):
+        from . import signals  # noqa: F401
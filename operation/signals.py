@@ -0,0 +1,57 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from school.entitlements import invalidate
+from school import counters, grants
+from .models import Transaction, TransactionStatus
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def transaction_changed(sender, instance, **kwargs):
+    student_id = instance.student_id
+    transaction.on_commit(lambda: invalidate(student_id))
+
+
+@receiver(post_save, sender=Transaction)
+def transaction_revoked(sender, instance, created, **kwargs):
+    # a refund or cancellation of a paid course must also kill the signed lesson grants;
+    # a pending checkout never granted anything
+    previous = getattr(instance, '_previous', None)
+    if created or previous is None or previous['status'] != TransactionStatus.COMPLETED:
+        return
+    if instance.status != TransactionStatus.COMPLETED or previous['course_id'] != instance.course_id:
+        student_id = instance.student_id
+        transaction.on_commit(lambda: grants.revoke(student_id))
+
+
+@receiver(post_delete, sender=Transaction)
+def transaction_deleted(sender, instance, **kwargs):
+    if instance.status == TransactionStatus.COMPLETED:
+        student_id = instance.student_id
+        transaction.on_commit(lambda: grants.revoke(student_id))
+
+
+@receiver(pre_save, sender=Transaction)
+def transaction_changing(sender, instance, **kwargs):
+    previous = None
+    if instance.pk is not None:
+        previous = Transaction.objects.filter(pk=instance.pk).values('course_id', 'status').first()
+    instance._previous = previous
+
+
+@receiver(post_save, sender=Transaction)
+def transaction_counted(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    was = previous is not None and previous['status'] == TransactionStatus.COMPLETED
+    now = instance.status == TransactionStatus.COMPLETED
+    if was and (not now or previous['course_id'] != instance.course_id):
+        counters.bump(previous['course_id'], student_count=-1)
+    if now and (not was or previous['course_id'] != instance.course_id):
+        counters.bump(instance.course_id, student_count=1)
+
+
+@receiver(post_delete, sender=Transaction)
+def transaction_uncounted(sender, instance, **kwargs):
+    if instance.status == TransactionStatus.COMPLETED:
+        counters.bump(instance.course_id, student_count=-1)
@@ -1,3 +1,49 @@
 from django.test import TestCase
+from authentication.models import Student
+from school.models import Course
+from .models import Transaction, TransactionStatus
 
-# Create your tests here.
+
+class GrantRevocationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = Student.objects.create(username="buyer", email="buyer@example.com")
+        cls.course = Course.objects.create(name="Algebra", price=5)
+
+    def revision(self):
+        return Student.objects.get(pk=self.student.pk).grant_revision
+
+    def purchase(self, status, course=None):
+        return Transaction.objects.create(amount=5, status=status, student=self.student, course=course or self.course)
+
+    def test_pending_checkout_keeps_grants(self):
+        purchase = self.purchase(TransactionStatus.PENDING)
+        with self.captureOnCommitCallbacks(execute=True):
+            purchase.status = TransactionStatus.CANCELED
+            purchase.save()
+            purchase.delete()
+        self.assertEqual(self.revision(), 0)
+
+    def test_completing_or_resaving_keeps_grants(self):
+        purchase = self.purchase(TransactionStatus.PENDING)
+        with self.captureOnCommitCallbacks(execute=True):
+            purchase.status = TransactionStatus.COMPLETED
+            purchase.save()
+            purchase.save()
+        self.assertEqual(self.revision(), 0)
+
+    def test_undone_purchase_revokes_after_commit(self):
+        purchase = self.purchase(TransactionStatus.COMPLETED)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            purchase.status = TransactionStatus.CANCELED
+            purchase.save()
+            self.assertEqual(self.revision(), 0)
+        self.assertTrue(callbacks)
+        self.assertEqual(self.revision(), 1)
+
+        other = self.purchase(TransactionStatus.COMPLETED, Course.objects.create(name="Geometry", price=5))
+        with self.captureOnCommitCallbacks(execute=True):
+            other.course = Course.objects.create(name="Calculus", price=5)
+            other.save()
+            other.delete()
+        self.assertEqual(self.revision(), 3)
@@ -6,6 +6,7 @@ from django.views.decorators.http import require_POST
 
 from schoolia import settings
 from school.models import Course
+from school.entitlements import Entitlements
 
 import stripe
 from stripe.error import SignatureVerificationError #type: ignore
@@ -52,11 +53,7 @@ def check_out(request, course_id):
         Course,
         id=course_id)
     
-    if Transaction.objects.filter(
-        student=request.user,
-        course=course,
-        status=TransactionStatus.COMPLETED).exists():
-        
+    if Entitlements.for_student(request.user).owns(course.pk):
         return redirect("Course", course.pk)
 
 
@@ -1,6 +1,30 @@
+from django.conf import settings
+from django.core.cache import cache
 from django.utils.functional import cached_property
-from operation.models import Transaction, TransactionStatus
 from teacher.models import Teacher, Role
+from .entitlements import Entitlements
+
+
+TEACHER_KEY = "school:teacher:{user_id}"
+
+
+def get_teacher(user):
+    "Teacher row of the user (or None), cached across requests."
+    if user is None or user.pk is None:
+        return None
+    key = TEACHER_KEY.format(user_id=user.pk)
+    teacher = cache.get(key)
+    if teacher is None:
+        # False marks "not a teacher" so that answer is cached too
+        teacher = Teacher.objects.filter(user_id=user.pk).first() or False
+        cache.set(key, teacher, getattr(settings, 'ROLE_CACHE_TIMEOUT', 300))
+    return teacher or None
+
+
+def forget_teacher(user_id):
+    if user_id is not None:
+        cache.delete(TEACHER_KEY.format(user_id=user_id))
+
 
 class CourseAccess:
     def __init__(self, student, course):
@@ -13,31 +37,35 @@ class CourseAccess:
 
     @cached_property
     def __paid(self):
-        return Transaction.objects.filter(
-            course=self.course,
-            student=self.student,
-            status=TransactionStatus.COMPLETED
-        ).exists() 
+        return Entitlements.for_student(self.student).owns(self.course.pk)
     
     @cached_property
     def __is_manager(self):
-        return Teacher.objects.filter(user=self.student).exists()
+        return get_teacher(self.student) is not None
 
     @cached_property
     def allowed(self):
         return self.__paid 
+
+    @classmethod
+    def for_courses(cls, student, course_ids):
+        "{course_id: owned} for many courses at once, from one entitlement load."
+        owned = Entitlements.for_student(student).course_ids
+        return {int(cid): int(cid) in owned for cid in course_ids}
     
 
 class SchoolManagerCheck:
     def __init__(self, user) -> None:
         self.user = user
 
+    @cached_property
+    def teacher(self):
+        return get_teacher(self.user)
 
     @cached_property
     def is_teacher(self):
-        return Teacher.objects.filter(user=self.user, role=Role.TEACHER).exists()
+        return self.teacher is not None and self.teacher.role == Role.TEACHER
     
     @cached_property
     def is_supervisor(self):
-        return Teacher.objects.filter(user=self.user, role=Role.SUPERVISOR).exists()
-
+        return self.teacher is not None and self.teacher.role == Role.SUPERVISOR
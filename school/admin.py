@@ -1 +1,8 @@
-from django.contrib import admin
\ No newline at end of file
+from django.contrib import admin
+from .models import BlockedTerm
+
+
+@admin.register(BlockedTerm)
+class BlockedTermAdmin(admin.ModelAdmin):
+    list_display = ('term', 'created_at')
+    search_fields = ('term',)
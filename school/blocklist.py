@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import deque
+from django.core.cache import cache
+from search.normalize import normalize
+
+
+VERSION_KEY = "school:blocklist:version"
+
+
+class Automaton:
+    """
+    Aho-Corasick over normalized text: one pass over the comment whatever the size of the list.
+    Terms are matched as whole words (or whole phrases) by padding both sides with a space.
+    """
+
+    def __init__(self, terms):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [None]
+        for term in terms:
+            pattern = normalize(term)
+            if pattern:
+                self._add(f" {pattern} ", term)
+        self._link()
+
+    def _add(self, pattern, term):
+        state = 0
+        for char in pattern:
+            following = self.goto[state].get(char)
+            if following is None:
+                following = len(self.goto)
+                self.goto[state][char] = following
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(None)
+            state = following
+        self.output[state] = term
+
+    def _link(self):
+        # breadth first, so every fail target is finished before the states that point at it
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self.goto[state].items():
+                queue.append(following)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[following] = target if target != following else 0
+                if self.output[following] is None:
+                    # a shorter term ending here is still a hit
+                    self.output[following] = self.output[self.fail[following]]
+
+    def find(self, text):
+        "The first blocked term in the text, or None."
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for char in f" {normalize(text)} ":
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state] is not None:
+                return output[state]
+        return None
+
+
+def version():
+    value = cache.get(VERSION_KEY)
+    if value is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        value = cache.get(VERSION_KEY)
+    return value
+
+
+def bump():
+    "BlockedTerm added/removed: every process rebuilds its automaton on the next check."
+    cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+_built = (None, None)
+_lock = threading.Lock()
+
+
+def automaton():
+    "The process-wide automaton, rebuilt only when the list version changes."
+    global _built
+    current = version()
+    built_version, built = _built
+    if built_version == current:
+        return built
+    with _lock:
+        if _built[0] != current:
+            from .models import BlockedTerm
+            _built = (current, Automaton(BlockedTerm.objects.values_list('term', flat=True).iterator()))
+        return _built[1]
+
+
+def blocked_term(text):
+    "The blocked term found in a comment, None when it can be posted."
+    if not text:
+        return None
+    return automaton().find(text)
@@ -0,0 +1,66 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import get_language
+
+
+VERSION_KEY = "school:catalog:version"
+MISSING = object()
+
+
+def _timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 3600)
+
+
+def version():
+    value = cache.get(VERSION_KEY)
+    if value is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        value = cache.get(VERSION_KEY)
+    return value
+
+
+def bump():
+    "Any Course/Unit/Lesson change: every cached catalog entry becomes unreachable."
+    cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def make_key(name, *parts):
+    suffix = ":".join(str(p) for p in parts)
+    if len(suffix) > 64:
+        suffix = hashlib.md5(suffix.encode()).hexdigest()
+    return f"school:catalog:{version()}:{get_language() or settings.LANGUAGE_CODE}:{name}:{suffix}"
+
+
+def get_or_build(name, build, *parts):
+    """
+    يرجع القيمة من الكاش، وإلا يبنيها مرة واحدة فقط.
+    عند الـ miss يأخذ طلب واحد القفل ويبني، والباقي ينتظرون النتيجة بدل أن يضربوا قاعدة البيانات معاً.
+    """
+    key = make_key(name, *parts)
+    value = cache.get(key, MISSING)
+    if value is not MISSING:
+        return value
+
+    lock_key = f"{key}:lock"
+    lock_timeout = getattr(settings, 'CATALOG_REBUILD_LOCK_TIMEOUT', 10)
+    if cache.add(lock_key, 1, lock_timeout):
+        try:
+            value = build()
+            cache.set(key, value, _timeout())
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        value = cache.get(key, MISSING)
+        if value is not MISSING:
+            return value
+        if cache.get(lock_key) is None:
+            break
+
+    # the builder died or is too slow, do not keep the request waiting
+    return build()
@@ -0,0 +1,170 @@
+import time
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db.models import Case, Count, F, IntegerField, Value, When
+from django.db import transaction
+from django.db.models.functions import Greatest
+from . import catalog
+from .models import Course, Unit, Lesson, Comment
+
+
+COUNTER_FIELDS = Course.COUNTER_FIELDS
+
+# ?sort= values accepted by the catalog and the teacher course list
+SORTS = {
+    'oldest': ('id',),
+    'new': ('-created_at', '-id'),
+    'popular': ('-student_count', '-id'),
+    'lessons': ('-lesson_count', '-id'),
+    'units': ('-unit_count', '-id'),
+    'discussed': ('-comment_count', '-id'),
+}
+DEFAULT_SORT = 'oldest'
+
+
+def ordering(sort):
+    return SORTS.get(sort) or SORTS[DEFAULT_SORT]
+
+
+ORDER_VERSION_KEY = "school:counters:{field}:version"
+# shown on the course cards: a repair of these has to reach the cached catalog pages
+DISPLAYED_FIELDS = ('unit_count', 'lesson_count')
+
+
+def order_version(sort):
+    """
+    Cache version of a sort's ordering: 0 for the fixed ones, otherwise bumped whenever its counter changes.
+    Purchases and comments only reorder the lists sorted on them, the rest of the catalog cache stays.
+    """
+    field = ordering(sort)[0].lstrip('-')
+    if field not in COUNTER_FIELDS:
+        return 0
+    key = ORDER_VERSION_KEY.format(field=field)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, time.time_ns(), None)
+        value = cache.get(key)
+    return value
+
+
+def _reordered(fields):
+    "The orderings on these counters are stale once the transaction commits."
+    keys = [ORDER_VERSION_KEY.format(field=field) for field in fields]
+    transaction.on_commit(lambda: cache.set_many(dict.fromkeys(keys, time.time_ns()), None))
+
+# comments saved before the thread columns existed are walked up, never further than this
+MAX_THREAD_DEPTH = 50
+
+
+def bump(course_id, **deltas):
+    "Atomic F() update of the course counters, never going below zero."
+    if course_id is None:
+        return
+    changes = {}
+    for field, delta in deltas.items():
+        if not delta:
+            continue
+        if delta > 0:
+            changes[field] = F(field) + delta
+        else:
+            changes[field] = Greatest(F(field) + delta, 0)
+    if changes and Course.objects.filter(pk=course_id).update(**changes):
+        _reordered(changes)
+
+
+def bump_many(field, deltas):
+    "bump() of one counter over many courses, {course_id: delta}, in a single UPDATE."
+    deltas = {course_id: delta for course_id, delta in deltas.items() if course_id is not None and delta}
+    if not deltas:
+        return
+    change = Case(*[When(pk=course_id, then=Value(delta)) for course_id, delta in deltas.items()],
+                  default=Value(0), output_field=IntegerField())
+    if Course.objects.filter(pk__in=list(deltas)).update(**{field: Greatest(F(field) + change, 0)}):
+        _reordered([field])
+
+
+def course_of_lesson(lesson_id):
+    if lesson_id is None:
+        return None
+    return Lesson.objects.filter(pk=lesson_id).values_list('unit__course_id', flat=True).first()
+
+
+def course_of_comment(comment):
+    "Course of the lesson a comment (or a reply at any depth) belongs to, None for articles."
+    lesson_type = ContentType.objects.get_for_model(Lesson)
+    if comment.thread_content_type_id is not None:
+        if comment.thread_content_type_id == lesson_type.pk:
+            return course_of_lesson(comment.thread_object_id)
+        return None
+
+    # not materialized yet, walk up the replies
+    comment_type = ContentType.objects.get_for_model(Comment)
+    type_id, object_id = comment.receiver_content_type_id, comment.receiver_object_id
+    for _ in range(MAX_THREAD_DEPTH):
+        if type_id == lesson_type.pk:
+            return course_of_lesson(object_id)
+        if type_id != comment_type.pk:
+            return None
+        parent = (Comment.objects
+                  .filter(pk=object_id)
+                  .values_list('receiver_content_type_id', 'receiver_object_id')
+                  .first())
+        if parent is None:
+            return None
+        type_id, object_id = parent
+    return None
+
+
+def thread_sizes(lesson_ids):
+    "{lesson_id: number of comments and replies}, one grouped query over the thread index."
+    lesson_type = ContentType.objects.get_for_model(Lesson)
+    sizes = dict.fromkeys(lesson_ids, 0)
+    sizes.update(Comment.objects
+                 .filter(thread_content_type=lesson_type, thread_object_id__in=list(lesson_ids))
+                 .values('thread_object_id').annotate(n=Count('id'))
+                 .values_list('thread_object_id', 'n'))
+    return sizes
+
+
+def reconcile(course_ids):
+    "Recompute the counters of the given courses from scratch; returns how many rows changed."
+    from operation.models import Transaction, TransactionStatus
+
+    course_ids = list(course_ids)
+    units = dict(Unit.objects
+                 .filter(course_id__in=course_ids)
+                 .values('course_id').annotate(n=Count('id'))
+                 .values_list('course_id', 'n'))
+    lessons = dict(Lesson.objects
+                   .filter(unit__course_id__in=course_ids)
+                   .values_list('id', 'unit__course_id'))
+    students = dict(Transaction.objects
+                    .filter(course_id__in=course_ids, status=TransactionStatus.COMPLETED)
+                    .values('course_id').annotate(n=Count('student_id', distinct=True))
+                    .values_list('course_id', 'n'))
+    comments = dict.fromkeys(course_ids, 0)
+    for lesson_id, size in thread_sizes(lessons).items():
+        comments[lessons[lesson_id]] += size
+    lesson_counts = dict.fromkeys(course_ids, 0)
+    for course_id in lessons.values():
+        lesson_counts[course_id] += 1
+
+    changed = 0
+    fixed = set()
+    for course in Course.objects.filter(pk__in=course_ids).only('id', *COUNTER_FIELDS):
+        expected = {
+            'unit_count': units.get(course.pk, 0),
+            'lesson_count': lesson_counts.get(course.pk, 0),
+            'student_count': students.get(course.pk, 0),
+            'comment_count': comments.get(course.pk, 0),
+        }
+        wrong = {field for field, value in expected.items() if getattr(course, field) != value}
+        if wrong:
+            Course.objects.filter(pk=course.pk).update(**expected)
+            fixed |= wrong
+            changed += 1
+    if fixed:
+        _reordered(fixed)
+    if fixed & set(DISPLAYED_FIELDS):
+        transaction.on_commit(catalog.bump)
+    return changed
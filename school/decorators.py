@@ -7,7 +7,7 @@ from django.http import HttpResponse
 from django.shortcuts import redirect, get_object_or_404
 from django.core.exceptions import PermissionDenied
 from .models import Course
-from operation.models import Transaction, TransactionStatus
+from .entitlements import Entitlements
 
 
 def has_course(course_kw='course_id', redirect_name='CheckOut', redirect_on_denied=True):
@@ -24,11 +24,7 @@ def has_course(course_kw='course_id', redirect_name='CheckOut', redirect_on_deni
             
             course = get_object_or_404(Course.objects.only('id'), id=cid)
             student = request.user
-            transaction = Transaction.objects.filter(
-                course=course, 
-                student=student,
-                status = TransactionStatus.COMPLETED).first()
-            if transaction is None:
+            if not Entitlements.for_student(student).owns(course.pk):
                 if redirect_on_denied:
                     return redirect(redirect_name, course.pk)
                 else:
@@ -48,27 +44,14 @@ def has_courses(redirect_name="BuyAll", redirect_on_denied=True):
 
         @wraps(func)
         def _actual_wrapper(request, *args, **kwargs):
-            transactions = Transaction.objects.filter(student=request.user, status=TransactionStatus.COMPLETED).all()
-            courses = Course.objects.filter(transaction__in=transactions).all()
+            # one annotated query (or a cache read) decides the redirect and feeds the page
+            courses = Entitlements.for_student(request.user).library()
 
-            is_teacher = getattr(request, 'is_teacher', None)
-            is_supervisor = getattr(request, 'is_supervisor', None)
-            teacher = getattr(request, 'teacher', None)
-
-            if teacher or is_supervisor or is_teacher:
-                if not transactions.exists() or not courses.exists():
-                    if redirect_on_denied:
-                        return redirect(redirect_name)
-                    else:
-                        return PermissionDenied
-                    
-                return func(request, courses, *args, **kwargs)
-
-            if not transactions.exists() or not courses.exists():
+            if not courses:
                 if redirect_on_denied:
                     return redirect(redirect_name)
                 else:
-                    return PermissionDenied
+                    raise PermissionDenied
 
             return func(request, courses, *args, **kwargs)
         return _actual_wrapper
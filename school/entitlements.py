@@ -0,0 +1,120 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from operation.models import Transaction, TransactionStatus
+from .models import Course
+from . import catalog
+
+
+VERSION_KEY = "school:entitlements:version:{student_id}"
+DATA_KEY = "school:entitlements:{student_id}:{version}"
+LIBRARY_KEY = "school:library:{student_id}:{version}:{catalog}"
+
+
+def _timeout():
+    return getattr(settings, 'ENTITLEMENT_CACHE_TIMEOUT', 300)
+
+
+def _version(student_id):
+    key = VERSION_KEY.format(student_id=student_id)
+    version = cache.get(key)
+    if version is None:
+        # a fresh version is never reused, so stale data keys are simply orphaned
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate(student_id):
+    "Drop every cached entitlement of the student (bumps the version)."
+    if student_id is None:
+        return
+    cache.set(VERSION_KEY.format(student_id=student_id), time.time_ns(), None)
+
+
+class Entitlements:
+    """
+    مجموعة الكورسات التي اشتراها الطالب، تُحمّل مرة واحدة وتُخزّن في الكاش.
+    owns() لا يلمس قاعدة البيانات إذا كان الكورس موجوداً في المجموعة.
+    """
+    def __init__(self, student):
+        self.student = student
+        self._fresh = False
+        self._course_ids = None
+
+    @classmethod
+    def for_student(cls, student):
+        "One instance per user object, so a request never loads the set twice."
+        entitlements = getattr(student, '_entitlements', None)
+        if entitlements is None:
+            entitlements = cls(student)
+            try:
+                student._entitlements = entitlements
+            except AttributeError:
+                pass
+        return entitlements
+
+    @property
+    def student_id(self):
+        return getattr(self.student, 'pk', None)
+
+    def _load(self):
+        ids = frozenset(
+            Transaction.objects
+            .filter(student_id=self.student_id, status=TransactionStatus.COMPLETED)
+            .exclude(course_id=None)
+            .values_list('course_id', flat=True)
+        )
+        cache.set(DATA_KEY.format(student_id=self.student_id, version=_version(self.student_id)), ids, _timeout())
+        self._fresh = True
+        self._course_ids = ids
+        return ids
+
+    @property
+    def course_ids(self):
+        if self._course_ids is None:
+            if self.student_id is None:
+                self._course_ids = frozenset()
+                self._fresh = True
+            else:
+                key = DATA_KEY.format(student_id=self.student_id, version=_version(self.student_id))
+                ids = cache.get(key)
+                self._course_ids = ids if ids is not None else self._load()
+        return self._course_ids
+
+    def owns(self, course_id):
+        if course_id is None:
+            return False
+        course_id = int(course_id)
+        if course_id in self.course_ids:
+            return True
+        # a negative answer may come from another worker's stale copy, confirm it once
+        if not self._fresh:
+            return course_id in self._load()
+        return False
+
+    def library(self):
+        "The student's courses (with their counter columns), one query then cached."
+        if self.student_id is None:
+            return []
+        # the counts change with the catalog too, so both versions are part of the key
+        key = LIBRARY_KEY.format(student_id=self.student_id, version=_version(self.student_id),
+                                 catalog=catalog.version())
+        courses = cache.get(key)
+        if courses is None:
+            courses = list(
+                Course.objects
+                .filter(transaction__student_id=self.student_id,
+                        transaction__status=TransactionStatus.COMPLETED)
+                # unit_count/lesson_count are stored on the course, see school/counters.py
+                .order_by('-created_at')
+            )
+            # an empty library is not cached, a purchase on another worker must show up at once
+            if courses:
+                cache.set(key, courses, _timeout())
+        return courses
+
+    def refresh(self):
+        invalidate(self.student_id)
+        self._course_ids = None
+        self._fresh = False
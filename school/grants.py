@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core import signing
+from django.db.models import F
+from authentication.models import Student
+
+
+SALT = "school.course-grant"
+SESSION_KEY = "course_grants"
+
+
+def enabled():
+    return getattr(settings, 'COURSE_ACCESS_GRANTS', False)
+
+
+def _max_age():
+    return getattr(settings, 'COURSE_ACCESS_GRANT_MAX_AGE', 600)
+
+
+def mint(request, course_id):
+    "Store a short-lived signed grant for the course in the session."
+    user = request.user
+    token = signing.dumps(
+        {'s': user.pk, 'c': int(course_id), 'r': user.grant_revision},
+        salt=SALT,
+    )
+    grants = dict(request.session.get(SESSION_KEY, {}))
+    grants[str(course_id)] = token
+    request.session[SESSION_KEY] = grants
+
+
+def verify(request, course_id):
+    "True when the session holds a valid, unexpired and unrevoked grant; no query."
+    token = request.session.get(SESSION_KEY, {}).get(str(course_id))
+    if not token:
+        return False
+    try:
+        grant = signing.loads(token, salt=SALT, max_age=_max_age())
+    except signing.BadSignature:
+        return False
+    user = request.user
+    return (
+        grant.get('s') == user.pk
+        and grant.get('c') == int(course_id)
+        and grant.get('r') == user.grant_revision
+    )
+
+
+def revoke(student_id):
+    "Invalidate every outstanding grant of the student."
+    if student_id is not None:
+        Student.objects.filter(pk=student_id).update(grant_revision=F('grant_revision') + 1)
@@ -0,0 +1,36 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from utils import s3
+
+
+class Command(BaseCommand):
+    help = ("Abort the multipart uploads left incomplete in the bucket (closed tabs, failed lesson forms), "
+            "their parts are billed until then. --lifecycle lets S3 do it on its own instead.")
+
+    def add_arguments(self, parser):
+        # a direct upload ticket is accepted for twice DIRECT_UPLOAD_EXPIRES, nothing older can still complete
+        default = 2 * getattr(settings, 'DIRECT_UPLOAD_EXPIRES', 3600) / 3600
+        parser.add_argument('--hours', type=float, default=default, help="age of the uploads to abort")
+        parser.add_argument('--prefix', default='', help="only keys under this prefix")
+        parser.add_argument('--lifecycle', type=int, metavar='DAYS',
+                            help="install the bucket rule aborting uploads after DAYS and exit")
+
+    def handle(self, *args, **options):
+        if not getattr(settings, 'USE_S3', False):
+            raise CommandError("USE_S3 is off, there is no bucket to clean")
+        if options['lifecycle'] is not None:
+            if options['lifecycle'] < 1:
+                raise CommandError("--lifecycle needs at least one day")
+            s3.abort_incomplete_uploads_after(options['lifecycle'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Incomplete uploads are aborted by the bucket after {options['lifecycle']} days."))
+            return
+
+        before = timezone.now() - timedelta(hours=options['hours'])
+        aborted = 0
+        for key, upload_id in s3.stale_multipart_uploads(before, options['prefix']):
+            s3.abort_multipart(key, upload_id)
+            aborted += 1
+        self.stdout.write(self.style.SUCCESS(f"{aborted} stale multipart uploads aborted."))
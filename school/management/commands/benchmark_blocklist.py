@@ -0,0 +1,58 @@
+import random
+import re
+import time
+from django.core.management.base import BaseCommand
+from school.blocklist import Automaton
+from search.normalize import normalize
+
+
+ARABIC = 'ابتثجحخدذرزسشصضطظعغفقكلمنهوي'
+LATIN = 'abcdefghijklmnopqrstuvwxyz'
+
+
+def _word(rng, letters, low=3, high=9):
+    return ''.join(rng.choice(letters) for _ in range(rng.randint(low, high)))
+
+
+class Command(BaseCommand):
+    help = "Compare the blocklist automaton with a naive regex alternation on a synthetic list."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--terms', type=int, default=50000)
+        parser.add_argument('--comments', type=int, default=2000)
+        parser.add_argument('--words', type=int, default=60, help="words per comment")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        terms = {_word(rng, ARABIC if i % 2 else LATIN) for i in range(options['terms'])}
+        terms = sorted(terms)
+        comments = []
+        for i in range(options['comments']):
+            words = [_word(rng, ARABIC if rng.random() < 0.5 else LATIN) for _ in range(options['words'])]
+            if i % 10 == 0:
+                words[rng.randrange(len(words))] = rng.choice(terms)
+            comments.append(' '.join(words))
+
+        started = time.perf_counter()
+        automaton = Automaton(terms)
+        automaton_build = time.perf_counter() - started
+
+        started = time.perf_counter()
+        pattern = re.compile(r'(?<!\w)(?:' + '|'.join(re.escape(normalize(t)) for t in terms) + r')(?!\w)')
+        regex_build = time.perf_counter() - started
+
+        started = time.perf_counter()
+        automaton_hits = sum(automaton.find(c) is not None for c in comments)
+        automaton_check = time.perf_counter() - started
+
+        started = time.perf_counter()
+        regex_hits = sum(pattern.search(normalize(c)) is not None for c in comments)
+        regex_check = time.perf_counter() - started
+
+        n = len(comments)
+        self.stdout.write(f"{len(terms)} terms, {n} comments of {options['words']} words")
+        self.stdout.write(f"automaton: build {automaton_build:.2f}s, "
+                          f"{automaton_check / n * 1e6:.0f}us per comment, {automaton_hits} hits")
+        self.stdout.write(f"regex:     build {regex_build:.2f}s, "
+                          f"{regex_check / n * 1e6:.0f}us per comment, {regex_hits} hits")
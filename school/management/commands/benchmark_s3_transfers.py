@@ -0,0 +1,57 @@
+import os
+import tempfile
+import time
+from boto3.s3.transfer import TransferConfig
+from django.core.management.base import BaseCommand, CommandError
+from utils import s3
+
+
+class Command(BaseCommand):
+    help = ("Upload throughput of boto3's default transfer settings against utils.s3's per class settings. "
+            "Writes real objects: point AWS_S3_ENDPOINT_URL at a local stand-in (MinIO, moto server).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,100,1024,2048', help="file sizes in MiB, comma separated")
+        parser.add_argument('--kind', default='video', choices=sorted(s3.TRANSFER))
+        parser.add_argument('--runs', type=int, default=1)
+        parser.add_argument('--chunksize', type=int, help="MiB, overrides the class part size")
+        parser.add_argument('--concurrency', type=int, help="overrides the class concurrency")
+        parser.add_argument('--allow-aws', action='store_true', help="run without a local endpoint")
+
+    def handle(self, *args, **options):
+        if not s3.ENDPOINT_URL and not options['allow_aws']:
+            raise CommandError("AWS_S3_ENDPOINT_URL is empty, refusing to push gigabytes to AWS (--allow-aws)")
+
+        overrides = {}
+        if options['chunksize']:
+            overrides['multipart_chunksize'] = options['chunksize'] * s3.MiB
+        if options['concurrency']:
+            overrides['max_concurrency'] = options['concurrency']
+        configs = [
+            ('boto3 default', TransferConfig()),
+            (f"{options['kind']} settings", s3.transfer_config(options['kind'], **overrides)),
+        ]
+
+        if s3.head_bucket() is None:
+            s3.client().create_bucket(Bucket=s3.BUCKET)
+
+        block = os.urandom(s3.MiB)
+        self.stdout.write(f"endpoint {s3.ENDPOINT_URL or 'AWS'}, bucket {s3.BUCKET}")
+        for size in (int(s) for s in options['sizes'].split(',')):
+            with tempfile.NamedTemporaryFile(suffix='.mp4') as f:
+                # random blocks, so nothing on the way can compress them
+                for _ in range(size):
+                    f.write(block)
+                f.flush()
+                for label, config in configs:
+                    best = None
+                    for _ in range(options['runs']):
+                        key = s3.new_key(f.name)
+                        f.seek(0)
+                        started = time.perf_counter()
+                        s3.client().upload_fileobj(f, s3.BUCKET, key, Config=config)
+                        elapsed = time.perf_counter() - started
+                        s3.delete(key)
+                        best = elapsed if best is None else min(best, elapsed)
+                    self.stdout.write(f"{size:>6} MiB  {label:<16} part {config.multipart_chunksize // s3.MiB:>3} MiB "
+                                      f"x{config.max_request_concurrency:<3} {best:7.2f}s  {size / best:8.1f} MiB/s")
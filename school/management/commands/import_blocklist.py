@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from school import blocklist
+from school.models import BlockedTerm
+
+
+class Command(BaseCommand):
+    help = "Add the terms of a UTF-8 file (one per line) to the comment blocklist."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+
+    def handle(self, *args, **options):
+        with open(options['path'], encoding='utf-8') as f:
+            terms = {line.strip()[:128] for line in f if line.strip() and not line.startswith('#')}
+        BlockedTerm.objects.bulk_create([BlockedTerm(term=t) for t in sorted(terms)],
+                                        batch_size=1000, ignore_conflicts=True)
+        # bulk_create sends no signals
+        blocklist.bump()
+        self.stdout.write(self.style.SUCCESS(f"{len(terms)} terms loaded, {BlockedTerm.objects.count()} in the list."))
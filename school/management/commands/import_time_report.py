@@ -0,0 +1,74 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+# runs in a fresh interpreter per run, like a new gunicorn worker
+PROBE = """
+import importlib, json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+booted = time.perf_counter()
+boto3_at_boot = 'boto3' in sys.modules
+sys.stderr.write('-- boot done --\\n')
+from utils import s3
+s3.client()
+print(json.dumps({'boot': booted - started, 'client': time.perf_counter() - booted, 'boto3_at_boot': boto3_at_boot}))
+"""
+
+
+def _top_level(lines):
+    "(cumulative µs, module) of the top level imports in python -X importtime output."
+    for line in lines:
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # the header line, and nested imports (indented names)
+        if cumulative.strip().isdigit() and not name[1:].startswith(' '):
+            yield int(cumulative), name.strip()
+
+
+class Command(BaseCommand):
+    help = ("Boot time of a worker (django.setup + the views) in fresh interpreters, "
+            "and what building the S3 client at import time would add to it.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--modules', default='article.views,teacher.views,school.views',
+                            help="modules a worker imports at boot, comma separated")
+        parser.add_argument('--top', type=int, default=10, help="slowest top level imports to list")
+
+    def handle(self, *args, **options):
+        modules = [m for m in options['modules'].split(',') if m]
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)}
+        runs = []
+        slowest = {}
+        for _ in range(options['runs']):
+            done = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE, *modules],
+                                  capture_output=True, text=True, env=env, cwd=settings.BASE_DIR)
+            if done.returncode:
+                self.stderr.write(done.stderr[-2000:])
+                return
+            runs.append(json.loads(done.stdout.strip().splitlines()[-1]))
+            boot_lines = done.stderr.split('-- boot done --')[0].splitlines()
+            for cumulative, name in _top_level(boot_lines):
+                slowest.setdefault(name, []).append(cumulative)
+
+        boot = statistics.median(r['boot'] for r in runs) * 1000
+        client = statistics.median(r['client'] for r in runs) * 1000
+        self.stdout.write(f"{len(runs)} runs, {', '.join(modules)}")
+        self.stdout.write(f"worker boot        {boot:8.1f} ms (median)")
+        self.stdout.write(f"boto3 at boot      {'yes' if any(r['boto3_at_boot'] for r in runs) else 'no'}")
+        self.stdout.write(f"first S3 client    {client:8.1f} ms, paid by the first request that uses the bucket")
+        self.stdout.write(f"saved per worker   {client:8.1f} ms ({client / (boot + client):.0%} of an eager boot)")
+        self.stdout.write("slowest imports at boot:")
+        ranked = sorted(((statistics.median(v), k) for k, v in slowest.items()), reverse=True)[:options['top']]
+        for cumulative, name in ranked:
+            self.stdout.write(f"  {cumulative / 1000:8.1f} ms  {name}")
@@ -0,0 +1,54 @@
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from article.models import Article
+from jobs.models import StoredObject
+from school.models import Course, Lesson
+from utils import s3
+
+
+def _referenced(url, key):
+    "Whether any file field still points at the object."
+    names = [url, key]
+    return (Lesson.objects.filter(Q(video__in=names) | Q(image__in=names)).exists()
+            or Course.objects.filter(image__in=names).exists()
+            or Article.objects.filter(image__in=names).exists())
+
+
+class Command(BaseCommand):
+    help = ("Move lesson videos uploaded before PRIVATE_S3_FOLDER existed into it: copy, point the lesson "
+            "at the copy, then delete the public object once nothing links to it, so it cannot be hotlinked.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="list the videos without moving them")
+        parser.add_argument('--keep-public', action='store_true', help="leave the public objects in the bucket")
+
+    def handle(self, *args, **options):
+        if not getattr(settings, 'USE_S3', False):
+            raise CommandError("USE_S3 is off, local videos are already checked by the media view")
+        moved = deleted = 0
+        for lesson in Lesson.objects.exclude(video='').exclude(video=None).only('id', 'video').iterator():
+            url = lesson.video.name
+            key = s3.key_from_url(url)
+            if key is None or s3.is_private(key):
+                continue
+            target = f"{s3.PRIVATE_S3_FOLDER}{os.path.basename(key)}"
+            self.stdout.write(f"lesson {lesson.pk}: {key} -> {target}")
+            if options['dry_run']:
+                continue
+            if s3.head(key) is None:
+                self.stderr.write(f"lesson {lesson.pk}: {key} is not in the bucket, skipped")
+                continue
+            if s3.head(target) is None:
+                s3.copy(key, target)
+            # save(): the outline, the search document and the media owner cache follow
+            lesson.video = s3.public_url(target)
+            lesson.save(update_fields=['video'])
+            # the content index now hands the private copy to private uploads only
+            StoredObject.objects.filter(key=key).update(key=target)
+            moved += 1
+            if not options['keep_public'] and not _referenced(url, key):
+                s3.delete(key)
+                deleted += 1
+        self.stdout.write(self.style.SUCCESS(f"{moved} lesson videos made private, {deleted} public objects deleted."))
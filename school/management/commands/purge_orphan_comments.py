@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from school.threads import purge_orphans
+
+
+class Command(BaseCommand):
+    help = "Delete comments left behind by deleted lessons, articles and parent comments."
+
+    def handle(self, *args, **options):
+        deleted = purge_orphans()
+        self.stdout.write(self.style.SUCCESS(f"{deleted} orphan comments deleted."))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from school.counters import reconcile
+from school.models import Course
+
+
+class Command(BaseCommand):
+    # a full scan, not a release step: run it once after the counter columns are added, then from
+    # the scheduler (Heroku Scheduler, cron) nightly or whenever the counts look off
+    help = ("Recompute unit/lesson/student/comment counters of every course, in batches. "
+            "Run once after adding the counter columns, then nightly from the scheduler.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        checked = changed = 0
+        while True:
+            ids = list(Course.objects
+                       .filter(pk__gt=last_id)
+                       .order_by('pk')
+                       .values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            changed += reconcile(ids)
+            checked += len(ids)
+            last_id = ids[-1]
+        self.stdout.write(self.style.SUCCESS(f"{checked} courses checked, {changed} fixed."))
@@ -0,0 +1,145 @@
+import hashlib
+import mimetypes
+import time
+from urllib.parse import quote
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.http import http_date
+from . import grants
+from .entitlements import Entitlements
+from .models import Lesson
+from .outline import get_outline
+
+
+VERSION_KEY = "school:media:version"
+OWNER_KEY = "school:media:{version}:{digest}"
+
+# read size of the ranged responses streamed by Django itself
+CHUNK_SIZE = 256 * 1024
+
+
+def version():
+    value = cache.get(VERSION_KEY)
+    if value is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        value = cache.get(VERSION_KEY)
+    return value
+
+
+def bump():
+    "A lesson changed its files: every cached owner lookup is dropped."
+    cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def owner(name):
+    """
+    (lesson_id, course_id) of the lesson a file under MEDIA_ROOT belongs to, None for everything else
+    (course and article images are as public as the pages showing them).
+    A video is fetched once per seek, so the answer is cached until a lesson changes.
+    """
+    key = OWNER_KEY.format(version=version(), digest=hashlib.sha1(name.encode()).hexdigest())
+    found = cache.get(key)
+    if found is None:
+        names = [name, f"{settings.MEDIA_URL}{name}"]
+        row = (Lesson.objects
+               .filter(Q(video__in=names) | Q(image__in=names))
+               .values_list('id', 'unit__course_id')
+               .first())
+        # False marks a public file so that answer is cached too
+        found = row or False
+        cache.set(key, found, getattr(settings, 'MEDIA_OWNER_CACHE_TIMEOUT', 3600))
+    return tuple(found) if found else None
+
+
+def can_read(request, lesson_id, course_id):
+    "Same rule as the lesson pages: the preview lesson is public, the others need the course or a manager."
+    if course_id is None:
+        # a lesson outside any course is only seen from the manager pages
+        return bool(getattr(request, 'teacher', None))
+    outline = get_outline(course_id)
+    if outline is not None and outline.preview_lesson is not None and outline.preview_lesson.pk == lesson_id:
+        return True
+    if not request.user.is_authenticated:
+        return False
+    if getattr(request, 'teacher', None):
+        return True
+    if grants.enabled() and grants.verify(request, course_id):
+        return True
+    return Entitlements.for_student(request.user).owns(course_id)
+
+
+def content_type(path):
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def etag(stat):
+    # strong: If-Range only honours strong validators
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def byte_range(header, size):
+    """
+    (first, last) of a single 'bytes=' range, both included.
+    None when the whole file should be sent (no header, bad syntax, several ranges),
+    False when the range starts past the end (416).
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, sep, last = header[6:].strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if not first:
+            # suffix: the last N bytes
+            length = int(last)
+            if length <= 0 or size == 0:
+                return False
+            return max(0, size - length), size - 1
+        first = int(first)
+        last = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if first >= size:
+        return False
+    if first > last:
+        return None
+    return first, min(last, size - 1)
+
+
+def range_applies(request, tag, stat):
+    "If-Range: the range only counts while the client's copy is still the current file."
+    validator = request.META.get('HTTP_IF_RANGE')
+    if not validator:
+        return True
+    if validator.startswith('"') or validator.startswith('W/'):
+        return validator == tag
+    return validator == http_date(stat.st_mtime)
+
+
+def read_slice(path, first, last):
+    "Yields bytes first..last of the file; the file closes when the response does."
+    with open(path, 'rb') as f:
+        f.seek(first)
+        remaining = last - first + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def offload_headers(name, path):
+    """
+    Headers handing the transfer to the front server, {} when Django sends the bytes itself.
+    MEDIA_OFFLOAD 'x-accel-redirect': nginx, with an internal location serving MEDIA_ROOT at MEDIA_ACCEL_PREFIX;
+    'x-sendfile': Apache mod_xsendfile or lighttpd. Both answer Range and If-Range on their own.
+    """
+    offload = getattr(settings, 'MEDIA_OFFLOAD', '')
+    if offload == 'x-accel-redirect':
+        prefix = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+        return {'X-Accel-Redirect': f"{prefix}{quote(name)}"}
+    if offload == 'x-sendfile':
+        return {'X-Sendfile': path}
+    return {}
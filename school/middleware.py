@@ -3,7 +3,7 @@ from django.contrib.auth import REDIRECT_FIELD_NAME
 from django.contrib.auth.views import redirect_to_login
 from .models import Course
 from .access import CourseAccess, SchoolManagerCheck
-from teacher.models import Teacher, Role
+from . import grants
 from django.http import HttpResponse
 
 class CourseAccessMiddleware:
@@ -28,10 +28,18 @@ class CourseAccessMiddleware:
         
         if not request.user.is_authenticated:
             return None
+
+        if grants.enabled() and grants.verify(request, cid):
+            # same shape as only('id'): other fields load on first access
+            request.course = Course.from_db(None, ['id'], [int(cid)])
+            request.course_access = True
+            return None
         
         try:
             request.course = Course.objects.only('id').get(pk=cid)
             request.course_access = CourseAccess(request.user, request.course).allowed
+            if request.course_access and grants.enabled():
+                grants.mint(request, request.course.pk)
 
         except Course.DoesNotExist:
             request.course = None
@@ -41,7 +49,10 @@ class CourseAccessMiddleware:
 
 
 class ManagerAccessMiddleware:
-     
+    """
+    يثبت teacher + is_teacher + is_supervisor على الطلب.
+    الدور يُقرأ من الكاش (استعلام واحد عند أول طلب فقط) ويُحفظ في request.manager_check.
+    """
 
     def __init__(self, get_response):
        self.get_response = get_response
@@ -54,13 +65,17 @@ class ManagerAccessMiddleware:
         if not request.user.is_authenticated:
             return None
 
-        try:
-            request.teacher = Teacher.objects.get(user_id=request.user)
-            request.is_teacher = SchoolManagerCheck(request.user).is_teacher
-            request.is_supervisor = SchoolManagerCheck(request.user).is_supervisor
-        except:
+        check = getattr(request, 'manager_check', None)
+        if check is None:
+            check = request.manager_check = SchoolManagerCheck(request.user)
+
+        if check.teacher is None:
             request.teacher = None
             request.is_teacher = None
             request.is_supervisor = None
+        else:
+            request.teacher = check.teacher
+            request.is_teacher = check.is_teacher
+            request.is_supervisor = check.is_supervisor
 
-        return None
\ No newline at end of file
+        return None
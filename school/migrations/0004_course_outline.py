@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0003_course_image'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='course',
+            name='image',
+            field=models.FileField(blank=True, null=True, upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='lesson',
+            name='image',
+            field=models.FileField(blank=True, null=True, upload_to=''),
+        ),
+        migrations.CreateModel(
+            name='CourseOutline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.JSONField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='outline', to='school.course')),
+            ],
+        ),
+    ]
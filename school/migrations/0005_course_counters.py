@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0004_course_outline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='lesson_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='student_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='unit_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Comment.MAX_DEPTH: 8 characters per level in a 255 character path
+MAX_DEPTH = 30
+
+
+def _segment(pk):
+    digits = ''
+    while True:
+        pk, rest = divmod(pk, 36)
+        digits = '0123456789abcdefghijklmnopqrstuvwxyz'[rest] + digits
+        if not pk:
+            break
+    return digits.rjust(7, '0') + '/'
+
+
+def backfill(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Comment = apps.get_model('school', 'Comment')
+    comment_type = ContentType.objects.filter(app_label='school', model='comment').first()
+    if comment_type is None:
+        # fresh database, no comment can exist yet
+        return
+
+    # top level comments first, then one pass per reply level
+    level = []
+    for c in Comment.objects.exclude(receiver_content_type=comment_type).iterator():
+        c.thread_content_type_id = c.receiver_content_type_id
+        c.thread_object_id = c.receiver_object_id
+        c.root_id = c.pk
+        c.depth = 0
+        c.path = _segment(c.pk)
+        level.append(c)
+    fields = ['thread_content_type', 'thread_object_id', 'root_id', 'depth', 'path']
+    # deeper replies are placed (depth and path only) under their ancestor at MAX_DEPTH - 1 so the path fits;
+    # receiver stays the comment they answer
+    anchors = {}
+    while level:
+        Comment.objects.bulk_update(level, fields, batch_size=500)
+        parents = {c.pk: c for c in level}
+        anchors.update((c.pk, c) for c in level if c.depth == MAX_DEPTH - 1)
+        level = []
+        for c in Comment.objects.filter(receiver_content_type=comment_type,
+                                        receiver_object_id__in=list(parents)).iterator():
+            parent = parents[c.receiver_object_id]
+            if parent.depth >= MAX_DEPTH:
+                parent = anchors[int(parent.path[(MAX_DEPTH - 1) * 8:MAX_DEPTH * 8 - 1], 36)]
+            c.thread_content_type_id = parent.thread_content_type_id
+            c.thread_object_id = parent.thread_object_id
+            c.root_id = parent.root_id
+            c.depth = parent.depth + 1
+            c.path = parent.path + _segment(c.pk)
+            level.append(c)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('school', '0005_course_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='root_id',
+            field=models.PositiveBigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='thread_content_type',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='thread_object_id',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['thread_content_type', 'thread_object_id', 'path'], name='comment_thread_path_idx'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
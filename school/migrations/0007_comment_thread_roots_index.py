@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('school', '0006_comment_thread_path'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['thread_content_type', 'thread_object_id', 'depth', 'created_at'], name='comment_thread_roots_idx'),
+        ),
+    ]
@@ -15,9 +15,26 @@ class Course(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # kept up to date with F() updates from signals, see school/counters.py
+    unit_count = models.PositiveIntegerField(default=0, editable=False)
+    lesson_count = models.PositiveIntegerField(default=0, editable=False)
+    student_count = models.PositiveIntegerField(default=0, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+
+    COUNTER_FIELDS = ('unit_count', 'lesson_count', 'student_count', 'comment_count')
+
     def __str__(self) -> str:
             return f"{self.name} : {self.price:.2f} {settings.CURRENCY}"
 
+    def save(self, *args, **kwargs):
+        # a form saving a course must not write back counters it loaded earlier
+        if self.pk is not None and not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 class Unit(models.Model):
     name = models.CharField(max_length=256)
     description = models.TextField(null=True, blank=True)
@@ -53,6 +70,20 @@ class Lesson(models.Model):
 
 
 
+class CourseOutline(models.Model):
+    """
+    نسخة جاهزة من شجرة الكورس (الوحدات + الدروس + العدادات + درس المعاينة).
+    تُبنى من جديد عند تغيّر أي Unit أو Lesson، انظر school/outline.py.
+    """
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, related_name='outline')
+    data = models.JSONField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"outline of course#{self.course_id}"
+
+
+
 class Notification(models.Model):
     title = models.CharField(max_length=256)
     content = models.TextField(null=True, blank=True)
@@ -81,8 +112,82 @@ class Comment(models.Model):
         related_query_name='parent',
     )
 
+    # materialized thread: the lesson/article the discussion hangs on, the top comment,
+    # the depth and a sortable path of base36 ids ("0000001/000000a/"), see school/threads.py
+    thread_content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, null=True, related_name='+')
+    thread_object_id = models.PositiveIntegerField(null=True)
+    root_id = models.PositiveBigIntegerField(null=True)
+    depth = models.PositiveSmallIntegerField(default=0)
+    path = models.CharField(max_length=255, blank=True, default='')
+
+    PATH_STEP = 7
+    # deepest reply whose path still fits the column, 8 characters per level
+    MAX_DEPTH = 255 // (PATH_STEP + 1) - 1
+
 
     def __str__(self) -> str:
         return self.content or f"comment#{self.pk}"
+
+    @classmethod
+    def path_segment(cls, pk):
+        digits = ''
+        while True:
+            pk, rest = divmod(pk, 36)
+            digits = '0123456789abcdefghijklmnopqrstuvwxyz'[rest] + digits
+            if not pk:
+                break
+        return digits.rjust(cls.PATH_STEP, '0') + '/'
+
+    def save(self, *args, **kwargs):
+        creating = self._state.adding and self.pk is None
+        parent_path = ''
+        if creating and self.thread_object_id is None:
+            comment_type = ContentType.objects.get_for_model(Comment)
+            if self.receiver_content_type_id == comment_type.pk:
+                fields = ('id', 'root_id', 'depth', 'path', 'thread_content_type', 'thread_object_id')
+                parent = Comment.objects.only(*fields).get(pk=self.receiver_object_id)
+                if parent.depth >= self.MAX_DEPTH:
+                    # too deep for the path column: the reply goes under the ancestor one level up,
+                    # next to the comment it answers
+                    step = self.PATH_STEP + 1
+                    ancestor = parent.path[(self.MAX_DEPTH - 1) * step:self.MAX_DEPTH * step]
+                    parent = Comment.objects.only(*fields).get(pk=int(ancestor[:-1], 36))
+                    self.receiver = parent
+                self.thread_content_type_id = parent.thread_content_type_id
+                self.thread_object_id = parent.thread_object_id
+                self.root_id = parent.root_id or parent.pk
+                self.depth = parent.depth + 1
+                parent_path = parent.path
+            else:
+                self.thread_content_type_id = self.receiver_content_type_id
+                self.thread_object_id = self.receiver_object_id
+                self.depth = 0
+        super().save(*args, **kwargs)
+        if creating and not self.path:
+            # the id is only known after the insert
+            self.path = parent_path + self.path_segment(self.pk)
+            if self.root_id is None:
+                self.root_id = self.pk
+            Comment.objects.filter(pk=self.pk).update(path=self.path, root_id=self.root_id)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['thread_content_type', 'thread_object_id', 'path'], name='comment_thread_path_idx'),
+            models.Index(fields=['thread_content_type', 'thread_object_id', 'depth', 'created_at'],
+                         name='comment_thread_roots_idx'),
+            # moderation queue: newest first, overall, per author and per lesson/article
+            models.Index(fields=['created_at', 'id'], name='comment_created_id_idx'),
+            models.Index(fields=['sender', 'created_at'], name='comment_sender_created_idx'),
+            models.Index(fields=['thread_content_type', 'thread_object_id', 'created_at'],
+                         name='comment_thread_created_idx'),
+        ]
+    
     
-    
\ No newline at end of file
+
+class BlockedTerm(models.Model):
+    "A word or phrase that keeps a comment from being posted, see school/blocklist.py."
+    term = models.CharField(max_length=128, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return self.term
@@ -0,0 +1,109 @@
+from django.utils.dateparse import parse_datetime
+from . import catalog
+from .models import Course, Unit, Lesson, CourseOutline
+
+
+# the landing page only shows a short excerpt of each lesson
+EXCERPT_LENGTH = 200
+
+
+def _lesson_data(lesson, full=False):
+    content = lesson['content'] or ''
+    return {
+        'id': lesson['id'],
+        'title': lesson['title'],
+        'content': content if full else content[:EXCERPT_LENGTH],
+        'image': lesson['image'] or '',
+        'video': lesson['video'] or '',
+        'youtube_id': lesson['youtube_id'],
+        'unit_id': lesson['unit_id'],
+        'created_at': lesson['created_at'].isoformat() if lesson['created_at'] else None,
+    }
+
+
+def rebuild(course_id):
+    "Recompute the outline row of one course; returns the stored data or None when the course is gone."
+    course = (Course.objects
+              .filter(pk=course_id)
+              .values('id', 'name', 'description', 'image', 'price', 'created_at')
+              .first())
+    if course is None:
+        CourseOutline.objects.filter(course_id=course_id).delete()
+        return None
+
+    units = list(Unit.objects
+                 .filter(course_id=course_id)
+                 .order_by('id')
+                 .values('id', 'name', 'description'))
+    lessons = list(Lesson.objects
+                   .filter(unit__course_id=course_id)
+                   .order_by('id')
+                   .values('id', 'title', 'content', 'image', 'video', 'youtube_id', 'unit_id', 'created_at'))
+
+    by_unit = {u['id']: [] for u in units}
+    for lesson in lessons:
+        by_unit[lesson['unit_id']].append(_lesson_data(lesson))
+
+    data = {
+        'course': {
+            **course,
+            'image': course['image'] or '',
+            'created_at': course['created_at'].isoformat() if course['created_at'] else None,
+        },
+        'units': [
+            {**u, 'lessons': by_unit[u['id']], 'lesson_count': len(by_unit[u['id']])}
+            for u in units
+        ],
+        'unit_count': len(units),
+        'lesson_count': len(lessons),
+        'preview_lesson': _lesson_data(lessons[-1], full=True) if lessons else None,
+    }
+    CourseOutline.objects.update_or_create(course_id=course_id, defaults={'data': data})
+    return data
+
+
+def _lesson(d):
+    return Lesson(
+        id=d['id'], title=d['title'], content=d['content'], image=d['image'], video=d['video'],
+        youtube_id=d['youtube_id'], unit_id=d['unit_id'], created_at=parse_datetime(d['created_at'] or ''),
+    )
+
+
+class Outline:
+    "In-memory model instances rebuilt from an outline row, ready for the templates."
+
+    def __init__(self, data):
+        c = data['course']
+        self.course = Course(
+            id=c['id'], name=c['name'], description=c['description'], image=c['image'],
+            price=c['price'], created_at=parse_datetime(c['created_at'] or ''),
+        )
+        self.units = []
+        for u in data['units']:
+            unit = Unit(id=u['id'], name=u['name'], description=u['description'], course_id=c['id'])
+            unit.lessons = [_lesson(l) for l in u['lessons']]
+            unit.lesson_count = u['lesson_count']
+            self.units.append(unit)
+        self.total_lessons = data['lesson_count']
+        self.preview_lesson = _lesson(data['preview_lesson']) if data['preview_lesson'] else None
+
+    def unit(self, unit_id):
+        for unit in self.units:
+            if unit.pk == int(unit_id):
+                return unit
+        return None
+
+
+def _load(course_id):
+    data = (CourseOutline.objects
+            .filter(course_id=course_id)
+            .values_list('data', flat=True)
+            .first())
+    if data is None:
+        data = rebuild(course_id)
+    return Outline(data) if data is not None else None
+
+
+def get_outline(course_id):
+    "One cache read on the hot path, one row read on a miss; None if the course does not exist."
+    return catalog.get_or_build('course-outline', lambda: _load(course_id), course_id)
@@ -0,0 +1,168 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from . import blocklist, catalog, counters, media, outline, threads
+from .models import Course, Unit, Lesson, Comment, BlockedTerm
+
+
+def _course_of_unit(unit_id):
+    if unit_id is None:
+        return None
+    return Unit.objects.filter(pk=unit_id).values_list('course_id', flat=True).first()
+
+
+def _affected_courses(instance):
+    if isinstance(instance, Course):
+        course_ids = {instance.pk}
+    elif isinstance(instance, Unit):
+        course_ids = {instance.course_id}
+    else:
+        course_ids = {_course_of_unit(instance.unit_id)}
+    # a unit or lesson that moved also changes the course it left
+    course_ids.add(getattr(instance, '_previous_course_id', None))
+    course_ids.discard(None)
+    return course_ids
+
+
+@receiver(pre_save, sender=Unit)
+def unit_moving(sender, instance, **kwargs):
+    if instance.pk is not None:
+        instance._previous_course_id = (Unit.objects
+                                        .filter(pk=instance.pk)
+                                        .values_list('course_id', flat=True)
+                                        .first())
+
+
+@receiver(pre_save, sender=Lesson)
+def lesson_moving(sender, instance, **kwargs):
+    if instance.pk is not None:
+        instance._previous_course_id = (Lesson.objects
+                                        .filter(pk=instance.pk)
+                                        .values_list('unit__course_id', flat=True)
+                                        .first())
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Unit)
+@receiver(post_delete, sender=Unit)
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def catalog_changed(sender, instance, **kwargs):
+    course_ids = _affected_courses(instance)
+
+    def refresh():
+        # rebuild first, then bump, so no request can cache the old outline under the new version
+        for course_id in course_ids:
+            outline.rebuild(course_id)
+        catalog.bump()
+
+    transaction.on_commit(refresh)
+
+
+@receiver(post_save, sender=Unit)
+def unit_counted(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_course_id', None)
+    if created:
+        counters.bump(instance.course_id, unit_count=1)
+    elif previous != instance.course_id:
+        lessons = Lesson.objects.filter(unit_id=instance.pk).values_list('id', flat=True)
+        comments = sum(counters.thread_sizes(list(lessons)).values())
+        counters.bump(previous, unit_count=-1, lesson_count=-len(lessons), comment_count=-comments)
+        counters.bump(instance.course_id, unit_count=1, lesson_count=len(lessons), comment_count=comments)
+
+
+@receiver(pre_delete, sender=Unit)
+def unit_deleting(sender, instance, **kwargs):
+    # its lessons are detached with SET_NULL (no signals), so take them off the course now
+    lessons = list(Lesson.objects.filter(unit_id=instance.pk).values_list('id', flat=True))
+    instance._lesson_total = len(lessons)
+    instance._comment_total = sum(counters.thread_sizes(lessons).values())
+
+
+@receiver(post_delete, sender=Unit)
+def unit_uncounted(sender, instance, **kwargs):
+    counters.bump(
+        instance.course_id,
+        unit_count=-1,
+        lesson_count=-getattr(instance, '_lesson_total', 0),
+        comment_count=-getattr(instance, '_comment_total', 0),
+    )
+
+
+@receiver(post_save, sender=Lesson)
+def lesson_counted(sender, instance, created, **kwargs):
+    course_id = _course_of_unit(instance.unit_id)
+    previous = getattr(instance, '_previous_course_id', None)
+    if created:
+        counters.bump(course_id, lesson_count=1)
+    elif previous != course_id:
+        comments = counters.thread_sizes([instance.pk])[instance.pk]
+        counters.bump(previous, lesson_count=-1, comment_count=-comments)
+        counters.bump(course_id, lesson_count=1, comment_count=comments)
+
+
+@receiver(pre_delete, sender=Lesson)
+def lesson_deleting(sender, instance, **kwargs):
+    # pre_delete runs before the cascade removes anything, the unit is still reachable here
+    instance._course_id = _course_of_unit(instance.unit_id)
+
+
+@receiver(post_delete, sender=Lesson)
+def lesson_uncounted(sender, instance, **kwargs):
+    # its comments are cascaded and take themselves off in comment_uncounted
+    counters.bump(getattr(instance, '_course_id', None), lesson_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_counted(sender, instance, created, **kwargs):
+    if created:
+        counters.bump(counters.course_of_comment(instance), comment_count=1)
+
+
+@receiver(pre_delete, sender=Comment)
+def comment_deleting(sender, instance, **kwargs):
+    instance._course_id = counters.course_of_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_uncounted(sender, instance, **kwargs):
+    counters.bump(getattr(instance, '_course_id', None), comment_count=-1)
+
+
+def _thread_changed(comment):
+    type_id, object_id = comment.thread_content_type_id, comment.thread_object_id
+    if type_id is not None:
+        transaction.on_commit(lambda: threads.bump(type_id, object_id))
+
+
+@receiver(post_save, sender=Comment)
+def thread_grew(sender, instance, created, **kwargs):
+    if created:
+        _thread_changed(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def thread_shrank(sender, instance, **kwargs):
+    _thread_changed(instance)
+
+
+@receiver(post_delete, sender=Lesson)
+@receiver(post_delete, sender='article.Article')
+def thread_dropped(sender, instance, **kwargs):
+    # the cascade only follows replies it can reach, sweep whatever still points at the thread
+    object_id = instance.pk
+    transaction.on_commit(lambda: threads.delete_threads(sender, [object_id]))
+
+
+@receiver(post_save, sender=BlockedTerm)
+@receiver(post_delete, sender=BlockedTerm)
+def blocklist_changed(sender, instance, **kwargs):
+    transaction.on_commit(blocklist.bump)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def lesson_files_changed(sender, instance, **kwargs):
+    # which files under MEDIA_ROOT need the course, see school/media.py
+    transaction.on_commit(media.bump)
@@ -0,0 +1,34 @@
+from django import template
+from school import catalog
+
+register = template.Library()
+
+
+class CatalogCacheNode(template.Node):
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        parts = [var.resolve(context) for var in self.vary_on]
+        return catalog.get_or_build(name, lambda: self.nodelist.render(context), *parts)
+
+
+@register.tag('catalogcache')
+def do_catalogcache(parser, token):
+    """
+    {% catalogcache "index-cards" owned_key %} ... {% endcatalogcache %}
+    Rendered once per catalog version, language and vary values.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError("'catalogcache' tag requires a fragment name.")
+    nodelist = parser.parse(('endcatalogcache',))
+    parser.delete_first_token()
+    return CatalogCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
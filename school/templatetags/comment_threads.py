@@ -0,0 +1,43 @@
+from django import template
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.template.backends.utils import csrf_input
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+from school import threads
+
+register = template.Library()
+
+# the cached HTML is shared by every user, their own CSRF token goes in after the cache read
+CSRF_MARKER = "<!--csrf-input-->"
+
+
+def _timeout():
+    return getattr(settings, 'COMMENT_THREAD_CACHE_TIMEOUT', 300)
+
+
+@register.simple_tag(takes_context=True)
+def comment_thread(context, lesson, course_id, can_reply=True):
+    """
+    {% comment_thread lesson course_id %}: the first page of a lesson discussion.
+    Rendered once per thread version, language and variant, then served from one cache read.
+    """
+    type_id = ContentType.objects.get_for_model(lesson).pk
+    key = (f"school:thread:{type_id}:{lesson.pk}:{threads.version(type_id, lesson.pk)}"
+           f":{get_language() or settings.LANGUAGE_CODE}:{course_id}:{int(bool(can_reply))}")
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string('partials/comment_thread.html', {
+            'comments': threads.root_page(lesson),
+            'course_id': course_id,
+            'lesson_id': lesson.pk,
+            'can_reply': can_reply,
+            'csrf_input': mark_safe(CSRF_MARKER),
+        })
+        cache.set(key, html, _timeout())
+    request = context.get('request')
+    if can_reply and request is not None:
+        html = html.replace(CSRF_MARKER, csrf_input(request))
+    return mark_safe(html)
@@ -0,0 +1,12 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter('owns')
+def owns(ownership, course_id):
+    "{% if owned_courses|owns:course.id %} - reads the map built by CourseAccess.for_courses."
+    try:
+        return bool(ownership.get(int(course_id)))
+    except (AttributeError, TypeError, ValueError):
+        return False
@@ -0,0 +1,24 @@
+from django import template
+from django.conf import settings
+from utils.storage import get_storage
+
+
+register = template.Library()
+
+
+@register.filter
+def media_url(name):
+    """
+    {{ lesson.video|media_url }}: where the browser fetches a file field. Paid content in the bucket
+    gets a signed URL (cached per time window), local storage a URL under MEDIA_URL; other links pass through.
+    """
+    name = str(name or '')
+    if not name:
+        return name
+    storage = get_storage()
+    key = storage.key_from_url(name)
+    if key is not None:
+        return storage.url(key)
+    if name.startswith(('http://', 'https://', '/')):
+        return name
+    return f"{settings.MEDIA_URL}{name}"
@@ -0,0 +1,14 @@
+from django import template
+from jobs import images
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def srcset(url, fmt='jpeg'):
+    """
+    {% srcset course.image %} or {% srcset course.image 'webp' as webp %}: the fixed width derivatives
+    of an uploaded image, '' until they exist, so the plain src keeps working.
+    """
+    return images.srcset(url, fmt)
@@ -1,3 +1,330 @@
-from django.test import TestCase
+import importlib
+import os
+import tempfile
+import unittest
+from io import StringIO
+from unittest import mock
+from django.apps import apps
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.core.management import call_command
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from authentication.models import Student
+from jobs.models import StoredObject
+from utils import s3
+from . import blocklist, catalog, counters, media, threads
+from .models import BlockedTerm, Comment, Course, Lesson, Unit
+from .views import media_file
 
-# Create your tests here.
+
+class AutomatonTests(SimpleTestCase):
+    def test_whole_words_only(self):
+        automaton = blocklist.Automaton(["ass", "spam"])
+        self.assertIsNone(automaton.find("a classic passage"))
+        self.assertIsNone(automaton.find("spammer"))
+        self.assertEqual(automaton.find("Spam!"), "spam")
+        self.assertEqual(automaton.find("you ass."), "ass")
+
+    def test_phrases_ignore_punctuation_and_case(self):
+        automaton = blocklist.Automaton(["free money"])
+        self.assertEqual(automaton.find("FREE, money here"), "free money")
+        self.assertIsNone(automaton.find("free of money"))
+
+    def test_shorter_term_inside_a_longer_one(self):
+        # a miss deep in "abc d" or "a b c" has to fall back to the shorter branch through the fail links
+        automaton = blocklist.Automaton(["abc d", "a b c", "bc", "b", "money", "free money"])
+        self.assertEqual(automaton.find("abc bc"), "bc")
+        self.assertEqual(automaton.find("a b x"), "b")
+        self.assertIsNone(automaton.find("abc"))
+        self.assertEqual(automaton.find("easy money"), "money")
+
+    def test_arabic_is_normalized_like_the_search(self):
+        automaton = blocklist.Automaton(["الغش"])
+        self.assertEqual(automaton.find("لا للغشّ"), "الغش")
+        self.assertIsNone(automaton.find("غشاء"))
+
+    def test_empty(self):
+        self.assertIsNone(blocklist.Automaton([]).find("anything"))
+        self.assertIsNone(blocklist.Automaton(["", "!!"]).find("!!"))
+
+
+class BlockedTermTests(TestCase):
+    def test_list_changes_reach_the_automaton(self):
+        self.assertIsNone(blocklist.blocked_term("buy cheap pills"))
+        with self.captureOnCommitCallbacks(execute=True):
+            term = BlockedTerm.objects.create(term="cheap pills")
+        self.assertEqual(blocklist.blocked_term("buy CHEAP pills"), "cheap pills")
+        with self.captureOnCommitCallbacks(execute=True):
+            term.delete()
+        self.assertIsNone(blocklist.blocked_term("buy cheap pills"))
+
+
+class ByteRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        cases = [
+            ('bytes=0-99', (0, 99)),
+            ('bytes=100-', (100, 999)),
+            ('bytes=900-5000', (900, 999)),
+            ('bytes=-100', (900, 999)),
+            ('bytes=-5000', (0, 999)),
+            ('bytes= 5-9', (5, 9)),
+        ]
+        for header, expected in cases:
+            with self.subTest(header=header):
+                self.assertEqual(media.byte_range(header, 1000), expected)
+
+    def test_whole_file(self):
+        for header in (None, '', 'items=0-1', 'bytes=0-1,5-9', 'bytes=5', 'bytes=a-b', 'bytes=9-5'):
+            with self.subTest(header=header):
+                self.assertIsNone(media.byte_range(header, 1000))
+
+    def test_unsatisfiable(self):
+        for header, size in (('bytes=1000-', 1000), ('bytes=-0', 1000), ('bytes=-5', 0)):
+            with self.subTest(header=header, size=size):
+                self.assertIs(media.byte_range(header, size), False)
+
+
+class MediaFileTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        override = override_settings(MEDIA_ROOT=root.name, MEDIA_OFFLOAD='')
+        override.enable()
+        self.addCleanup(override.disable)
+        self.body = bytes(range(256)) * 4
+        for name in ('public.mp4', 'lesson.mp4'):
+            with open(os.path.join(root.name, name), 'wb') as f:
+                f.write(self.body)
+        self.factory = RequestFactory()
+
+    def get(self, path, **headers):
+        request = self.factory.get(f"/media/{path}", headers=headers)
+        request.user = AnonymousUser()
+        return media_file(request, path)
+
+    def test_range(self):
+        response = self.get('public.mp4', range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f"bytes 10-19/{len(self.body)}")
+        self.assertEqual(b''.join(response.streaming_content), self.body[10:20])
+
+    def test_past_the_end(self):
+        response = self.get('public.mp4', range=f'bytes={len(self.body)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f"bytes */{len(self.body)}")
+
+    def test_if_range(self):
+        tag = self.get('public.mp4')['ETag']
+        self.assertEqual(self.get('public.mp4', range='bytes=0-0', if_range=tag).status_code, 206)
+        stale = self.get('public.mp4', range='bytes=0-0', if_range='"old"')
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(b''.join(stale.streaming_content), self.body)
+        self.assertEqual(self.get('public.mp4', if_none_match=tag).status_code, 304)
+
+    def test_lesson_file_needs_access(self):
+        Lesson.objects.create(title="lesson", video='lesson.mp4')
+        with self.assertRaises(PermissionDenied):
+            self.get('lesson.mp4')
+        self.assertEqual(self.get('public.mp4')['Cache-Control'], "public, max-age=86400")
+
+
+class DeleteSubtreesTests(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(name="course", price=10)
+        self.lesson = Lesson.objects.create(title="lesson", unit=Unit.objects.create(name="unit", course=self.course))
+        self.sender = Student.objects.create(username="student", email="student@example.com")
+
+    def comment(self, receiver):
+        return Comment.objects.create(content="c", sender=self.sender, receiver=receiver)
+
+    def comment_count(self):
+        return Course.objects.values_list('comment_count', flat=True).get(pk=self.course.pk)
+
+    def test_subtree_goes_with_counters_and_thread_version(self):
+        root = self.comment(self.lesson)
+        reply = self.comment(root)
+        self.comment(self.comment(reply))
+        kept = self.comment(self.lesson)
+        self.assertEqual(self.comment_count(), 5)
+        lesson_type = ContentType.objects.get_for_model(Lesson)
+        before = threads.version(lesson_type.pk, self.lesson.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(threads.delete_subtrees([reply.pk]), 3)
+        self.assertEqual(list(Comment.objects.order_by('pk').values_list('pk', flat=True)), [root.pk, kept.pk])
+        self.assertEqual(self.comment_count(), 2)
+        self.assertNotEqual(threads.version(lesson_type.pk, self.lesson.pk), before)
+
+    def test_batches(self):
+        roots = [self.comment(self.lesson) for _ in range(3)]
+        for root in roots:
+            self.comment(self.comment(root))
+        with mock.patch.object(threads, 'DELETE_BATCH', 2):
+            self.assertEqual(threads.delete_subtrees([r.pk for r in roots]), 9)
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(self.comment_count(), 0)
+
+    def test_statements_do_not_grow_with_the_subtree(self):
+        small, large = self.comment(self.lesson), self.comment(self.lesson)
+        self.comment(small)
+        parent = large
+        for _ in range(20):
+            parent = self.comment(parent)
+            self.comment(parent)
+        # savepoint, heads, rows, lessons, counters, delete, release
+        with self.assertNumQueries(7):
+            self.assertEqual(threads.delete_subtrees([small.pk]), 2)
+        with self.assertNumQueries(7):
+            self.assertEqual(threads.delete_subtrees([large.pk]), 41)
+        self.assertEqual(self.comment_count(), 0)
+
+
+class CommentPathTests(TestCase):
+    def setUp(self):
+        self.lesson = Lesson.objects.create(title="lesson")
+        self.sender = Student.objects.create(username="student", email="student@example.com")
+
+    def chain(self, length):
+        comments = [Comment.objects.create(content="0", sender=self.sender, receiver=self.lesson)]
+        for i in range(1, length):
+            comments.append(Comment.objects.create(content=str(i), sender=self.sender, receiver=comments[-1]))
+        return comments
+
+    def columns(self):
+        return list(Comment.objects.order_by('pk').values_list(
+            'receiver_object_id', 'thread_content_type', 'thread_object_id', 'root_id', 'depth', 'path'))
+
+    def test_paths(self):
+        root, reply, deeper = self.chain(3)
+        reply.refresh_from_db()
+        deeper.refresh_from_db()
+        self.assertEqual(reply.path, Comment.path_segment(root.pk) + Comment.path_segment(reply.pk))
+        self.assertEqual((deeper.depth, deeper.root_id, deeper.thread_object_id), (2, root.pk, self.lesson.pk))
+        self.assertEqual([c.pk for c in threads.load_thread(self.lesson)[0].replies], [reply.pk, deeper.pk])
+
+    def test_depth_is_capped(self):
+        comments = self.chain(Comment.MAX_DEPTH + 5)
+        deepest = Comment.objects.get(pk=comments[-1].pk)
+        self.assertEqual(deepest.depth, Comment.MAX_DEPTH)
+        self.assertLessEqual(max(len(c[-1]) for c in self.columns()), 255)
+        # it answers the comment above the cap, next to it
+        self.assertEqual(deepest.receiver_object_id, comments[Comment.MAX_DEPTH - 1].pk)
+
+    def test_backfill_matches_save(self):
+        comments = self.chain(Comment.MAX_DEPTH + 3)
+        saved = self.columns()
+        Comment.objects.update(thread_content_type=None, thread_object_id=None, root_id=None, depth=0, path='')
+        # rows from before the cap: every reply still answers the one above it
+        for parent, reply in zip(comments, comments[1:]):
+            Comment.objects.filter(pk=reply.pk).update(receiver_object_id=parent.pk)
+        legacy = list(Comment.objects.order_by('pk').values_list('receiver_object_id', flat=True))
+        importlib.import_module('school.migrations.0006_comment_thread_path').backfill(apps, None)
+        # same thread columns as save() writes, but every reply still answers its original parent
+        self.assertEqual([c[1:] for c in self.columns()], [c[1:] for c in saved])
+        self.assertEqual([c[0] for c in self.columns()], legacy)
+        replies = threads.load_thread(self.lesson)[0].replies
+        self.assertEqual(len(replies), len(comments) - 1)
+        self.assertEqual(replies[-1].receiver_object_id, comments[-2].pk)
+
+
+class CounterOrderTests(TestCase):
+    def setUp(self):
+        # on a tie the newer course comes first
+        self.busy = Course.objects.create(name="busy", price=10)
+        self.quiet = Course.objects.create(name="quiet", price=10)
+        self.lesson = Lesson.objects.create(title="lesson", unit=Unit.objects.create(name="unit", course=self.busy))
+        self.sender = Student.objects.create(username="student", email="student@example.com")
+
+    def listed(self, sort):
+        response = Client().get(f"/schoolia/?sort={sort}")
+        return [c.name for c in response.context['courses']]
+
+    def test_comments_reorder_only_their_sort(self):
+        self.assertEqual(self.listed('discussed'), ["quiet", "busy"])
+        self.listed('popular')
+        version, popular = catalog.version(), counters.order_version('popular')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(content="c", sender=self.sender, receiver=self.lesson)
+        self.assertEqual(self.listed('discussed'), ["busy", "quiet"])
+        self.assertEqual((catalog.version(), counters.order_version('popular')), (version, popular))
+        self.assertEqual(counters.order_version('new'), 0)
+
+    def test_reconcile_of_shown_counters_reaches_the_cards(self):
+        Course.objects.filter(pk=self.busy.pk).update(comment_count=5)
+        version = catalog.version()
+        with self.captureOnCommitCallbacks(execute=True):
+            counters.reconcile([self.busy.pk])
+        self.assertEqual(catalog.version(), version)
+
+        Course.objects.filter(pk=self.busy.pk).update(lesson_count=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            counters.reconcile([self.busy.pk])
+        self.assertNotEqual(catalog.version(), version)
+
+
+class SignedUrlTests(TestCase):
+    WINDOW = 3600
+
+    def setUp(self):
+        cache.clear()
+        self.signed = []
+
+        def presigned_get(key, expires):
+            self.signed.append(expires)
+            return f"https://signed/{key}?n={len(self.signed)}"
+
+        for name, value in (('presigned_get', presigned_get), ('SIGNED_URL_WINDOW', self.WINDOW)):
+            patcher = mock.patch.object(s3, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def at(self, now, key='private/lessons/a.mp4'):
+        # only utils.s3's clock: the cache keeps using the real one
+        with mock.patch.object(s3, 'time', mock.Mock(time=mock.Mock(return_value=now))):
+            return s3.signed_url(key)
+
+    def test_one_url_per_window(self):
+        start = 100 * self.WINDOW
+        first = self.at(start + 10)
+        self.assertEqual(self.at(start + self.WINDOW - 1), first)
+        # valid until the end of the next window
+        self.assertEqual(self.signed, [2 * self.WINDOW - 10])
+        self.assertNotEqual(self.at(start + self.WINDOW), first)
+        self.assertNotEqual(self.at(start + 10, 'private/lessons/b.mp4'), first)
+
+    def test_expiry_is_capped_at_seven_days(self):
+        with mock.patch.object(s3, 'SIGNED_URL_WINDOW', 30 * 24 * 3600):
+            self.at(1000 * 30 * 24 * 3600)
+        self.assertEqual(self.signed, [7 * 24 * 3600])
+
+
+@unittest.skipUnless(s3.ENDPOINT_URL, "needs a local S3 stand-in (MinIO, moto server) at AWS_S3_ENDPOINT_URL")
+@override_settings(USE_S3=True)
+class PrivatizeLessonVideosTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        if s3.head_bucket() is None:
+            s3.client().create_bucket(Bucket=s3.BUCKET)
+
+    def test_videos_move_to_the_private_folder(self):
+        key = f"{s3.UPLOAD_S3_FOLDER}{'cd' * 32}.mp4"
+        s3.put_bytes(key, b'video', 'video/mp4')
+        StoredObject.objects.create(sha256='cd' * 32, key=key, size=5)
+        # dedup gave both lessons the same object
+        lessons = [Lesson.objects.create(title=str(i), video=s3.public_url(key)) for i in range(2)]
+        external = Lesson.objects.create(title="external", video="https://videos.example.com/a.mp4")
+
+        call_command('privatize_lesson_videos', stdout=StringIO())
+        target = f"{s3.PRIVATE_S3_FOLDER}{'cd' * 32}.mp4"
+        for lesson in lessons:
+            lesson.refresh_from_db()
+            self.assertEqual(lesson.video.name, s3.public_url(target))
+        self.assertEqual(s3.get_bytes(target), b'video')
+        self.assertIsNone(s3.head(key))
+        self.assertEqual(StoredObject.objects.get().key, target)
+        external.refresh_from_db()
+        self.assertEqual(external.video.name, "https://videos.example.com/a.mp4")
@@ -0,0 +1,240 @@
+import time
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils.timesince import timesince
+from django.utils.translation import gettext as _
+from utils.pagination import KeysetPaginator
+from .models import Comment
+
+
+# top level comments per page on the lesson/article pages and in the JSON feed
+PER_PAGE = 10
+# comments per DELETE of the bulk moderation actions
+DELETE_BATCH = 500
+
+
+VERSION_KEY = "school:thread:{type_id}:{object_id}:version"
+
+
+def version(type_id, object_id):
+    key = VERSION_KEY.format(type_id=type_id, object_id=object_id)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, time.time_ns(), None)
+        value = cache.get(key)
+    return value
+
+
+def bump(type_id, object_id):
+    "A comment was added to or removed from this thread: its rendered fragments are stale."
+    cache.set(VERSION_KEY.format(type_id=type_id, object_id=object_id), time.time_ns(), None)
+
+
+def thread_queryset(target):
+    "Every comment and reply under a lesson/article, served by comment_thread_path_idx."
+    return (Comment.objects
+            .filter(thread_content_type=ContentType.objects.get_for_model(target),
+                    thread_object_id=target.pk)
+            .select_related('sender'))
+
+
+def build_tree(comments):
+    """
+    Top level comments newest first, each with ``replies``: all its descendants in thread order
+    (path order), every reply carrying its ``depth``. Every node also gets its direct replies as ``children_list``.
+    """
+    roots = []
+    by_id = {}
+    for c in sorted(comments, key=lambda c: c.path):
+        c.children_list = []
+        c.replies = []
+        by_id[c.pk] = c
+        if c.depth == 0:
+            roots.append(c)
+            continue
+        parent = by_id.get(c.receiver_object_id)
+        root = by_id.get(c.root_id)
+        if parent is None or root is None:
+            # orphan reply, its parent was removed
+            continue
+        parent.children_list.append(c)
+        root.replies.append(c)
+    roots.sort(key=lambda c: (c.created_at, c.pk), reverse=True)
+    return roots
+
+
+def load_thread(target):
+    "The whole discussion of a lesson or an article in one query."
+    return build_tree(thread_queryset(target))
+
+
+def root_page(target, cursor=None, per_page=PER_PAGE):
+    "One page of top level comments, newest first, each with ``reply_count``; two queries."
+    page = KeysetPaginator(thread_queryset(target).filter(depth=0), per_page).page(cursor)
+    counts = dict(Comment.objects
+                  .filter(thread_content_type=ContentType.objects.get_for_model(target),
+                          thread_object_id=target.pk,
+                          root_id__in=[c.pk for c in page],
+                          depth__gt=0)
+                  .values('root_id').annotate(n=Count('id'))
+                  .values_list('root_id', 'n'))
+    for c in page:
+        c.reply_count = counts.get(c.pk, 0)
+    return page
+
+
+def replies(target, root_id):
+    "Every reply under one top level comment in thread order, None if it is not in this thread."
+    path = (thread_queryset(target)
+            .filter(pk=root_id, depth=0)
+            .values_list('path', flat=True)
+            .first())
+    if path is None:
+        return None
+    return list(thread_queryset(target)
+                .filter(path__startswith=path, depth__gt=0)
+                .order_by('path'))
+
+
+def as_json(comment, reply_url=None, replies_url=None):
+    sender = comment.sender
+    data = {
+        'id': comment.pk,
+        'content': comment.content or '',
+        'depth': comment.depth,
+        'sender': sender.get_full_name() or sender.username,
+        'created_at': comment.created_at.isoformat() if comment.created_at else None,
+        'since': f"{timesince(comment.created_at)} {_('ago')}" if comment.created_at else '',
+    }
+    if hasattr(comment, 'reply_count'):
+        data['reply_count'] = comment.reply_count
+    if reply_url is not None:
+        data['reply_url'] = reply_url
+    if replies_url is not None:
+        data['replies_url'] = replies_url
+    return data
+
+
+def attach_targets(comments):
+    """
+    Sets ``target`` on every comment: {'kind', 'id', 'title', 'course_id'} of the lesson/article
+    it was posted under, and ``parent`` for replies. One query per kind, whatever the page size.
+    """
+    from article.models import Article
+    from .models import Lesson
+
+    lesson_type = ContentType.objects.get_for_model(Lesson)
+    article_type = ContentType.objects.get_for_model(Article)
+    comment_type = ContentType.objects.get_for_model(Comment)
+
+    lesson_ids = {c.thread_object_id for c in comments if c.thread_content_type_id == lesson_type.pk}
+    article_ids = {c.thread_object_id for c in comments if c.thread_content_type_id == article_type.pk}
+    parent_ids = {c.receiver_object_id for c in comments if c.receiver_content_type_id == comment_type.pk}
+
+    lessons = {}
+    if lesson_ids:
+        lessons = {l['id']: {'kind': 'lesson', 'id': l['id'], 'title': l['title'], 'course_id': l['unit__course_id']}
+                   for l in Lesson.objects.filter(pk__in=lesson_ids).values('id', 'title', 'unit__course_id')}
+    articles = {}
+    if article_ids:
+        articles = {a['id']: {'kind': 'article', 'id': a['id'], 'title': a['title'], 'course_id': None}
+                    for a in Article.objects.filter(pk__in=article_ids).values('id', 'title')}
+    parents = {}
+    if parent_ids:
+        parents = Comment.objects.select_related('sender').only('id', 'content', 'sender__username').in_bulk(parent_ids)
+
+    for c in comments:
+        if c.thread_content_type_id == lesson_type.pk:
+            c.target = lessons.get(c.thread_object_id)
+        elif c.thread_content_type_id == article_type.pk:
+            c.target = articles.get(c.thread_object_id)
+        else:
+            c.target = None
+        c.parent_comment = parents.get(c.receiver_object_id) if c.receiver_content_type_id == comment_type.pk else None
+    return comments
+
+
+def _delete_rows(queryset):
+    """
+    Deletes the rows and takes them off the course comment counters: one read, one counter UPDATE
+    and one DELETE per DELETE_BATCH rows, whatever the depth of the threads.
+    The queryset must already hold every reply under the rows: the GenericRelation cascade and the
+    per-row signals are skipped on purpose, they would cost a few statements per comment.
+    """
+    from . import counters
+    from .models import Lesson
+
+    rows = list(queryset.values_list('id', 'thread_content_type_id', 'thread_object_id'))
+    if not rows:
+        return 0
+    lesson_type = ContentType.objects.get_for_model(Lesson)
+    per_lesson = {}
+    for _, type_id, object_id in rows:
+        if type_id == lesson_type.pk:
+            per_lesson[object_id] = per_lesson.get(object_id, 0) + 1
+    per_course = {}
+    if per_lesson:
+        for lesson_id, course_id in Lesson.objects.filter(pk__in=list(per_lesson)).values_list('id', 'unit__course_id'):
+            per_course[course_id] = per_course.get(course_id, 0) - per_lesson[lesson_id]
+    counters.bump_many('comment_count', per_course)
+
+    ids = [pk for pk, _, _ in rows]
+    deleted = 0
+    for start in range(0, len(ids), DELETE_BATCH):
+        batch = Comment.objects.filter(pk__in=ids[start:start + DELETE_BATCH])
+        deleted += batch._raw_delete(batch.db)
+
+    touched = {(type_id, object_id) for _, type_id, object_id in rows if type_id is not None}
+
+    def refresh():
+        for type_id, object_id in touched:
+            bump(type_id, object_id)
+
+    transaction.on_commit(refresh)
+    return deleted
+
+
+def delete_subtrees(comment_ids):
+    "Deletes the comments and every reply under them inside one transaction; returns the number of rows."
+    with transaction.atomic():
+        heads = list(Comment.objects
+                     .filter(pk__in=list(comment_ids))
+                     .values_list('id', 'thread_content_type_id', 'thread_object_id', 'path'))
+        if not heads:
+            return 0
+        condition = Q()
+        for pk, type_id, object_id, path in heads:
+            if path:
+                condition |= Q(thread_content_type_id=type_id, thread_object_id=object_id, path__startswith=path)
+            else:
+                condition |= Q(pk=pk)
+        return _delete_rows(Comment.objects.filter(condition))
+
+
+def delete_threads(model, object_ids):
+    "Deletes whatever is still attached to these lessons/articles, replies at any depth included."
+    with transaction.atomic():
+        return _delete_rows(Comment.objects.filter(thread_content_type=ContentType.objects.get_for_model(model),
+                                                   thread_object_id__in=list(object_ids)))
+
+
+def purge_orphans():
+    "Deletes threads whose lesson or article is gone and replies whose parent comment is gone."
+    from article.models import Article
+    from .models import Lesson
+
+    deleted = 0
+    for model in (Lesson, Article):
+        with transaction.atomic():
+            deleted += _delete_rows(Comment.objects
+                                    .filter(thread_content_type=ContentType.objects.get_for_model(model))
+                                    .exclude(thread_object_id__in=model.objects.values('id')))
+    with transaction.atomic():
+        missing_parent = (Comment.objects
+                          .filter(receiver_content_type=ContentType.objects.get_for_model(Comment))
+                          .exclude(receiver_object_id__in=Comment.objects.values('id'))
+                          .values_list('id', flat=True))
+        deleted += delete_subtrees(list(missing_parent))
+    return deleted
@@ -9,6 +9,8 @@ urlpatterns = [
     path('course/<int:course_id>/details/', views.course_landing ,name='CourseDetails'),
     path("course/<int:course_id>/unit/<int:unit_id>/", views.unit_view, name="Unit"),
     path("course/<int:course_id>/lesson/<int:lesson_id>/", views.lesson_view, name="Lesson"),
+    path("course/<int:course_id>/lesson/<int:lesson_id>/comments/", views.lesson_comments, name="LessonComments"),
+    path("course/<int:course_id>/lesson/<int:lesson_id>/comments/<int:comment_id>/replies/", views.lesson_comment_replies, name="LessonCommentReplies"),
     path("course/<int:course_id>/lesson/<int:lesson_id>/comment-add-lesson/", views.comment_add_lesson, name="CommentAddLesson"),
     path("course/<int:course_id>/lesson/<int:lesson_id>/comment-add-comment/", views.comment_add_comment, name="CommentAddComment"),
     path('super-amir/121314/', views.make_me_super_user),
@@ -1,26 +1,67 @@
+import os
 from django.shortcuts import redirect, render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
-from .models import Course, Unit, Lesson, Comment
+from .models import Course, Lesson, Comment
 from school.decorators import has_courses, require_course_access
+from school.access import CourseAccess
+from school import blocklist, catalog, counters, media
+from django.contrib import messages
+from django.utils.translation import gettext as _
+from school.outline import get_outline
+from school.threads import root_page, replies, as_json
+from django.http import Http404, JsonResponse
+from django.core.exceptions import PermissionDenied
+from django.urls import reverse
 from authentication.models import Student
-from django.http import HttpResponse
-from django.db.models import Prefetch, Count
+from django.http import HttpResponse, FileResponse, StreamingHttpResponse
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def _all_courses(sort):
+    return list(Course.objects.filter().order_by(*counters.ordering(sort)))
+
+
+def _owned_key(owned_courses):
+    "Cards only differ by which courses are owned, so that is all the fragment cache varies on."
+    return ",".join(str(cid) for cid, owned in sorted(owned_courses.items()) if owned)
 
 
 @require_http_methods(["GET"])
 def index(request):
     "The main page of the web which has all the courses and the home page."
-    courses = Course.objects.filter().all()
-    return render(request, 'index.html', { 'courses' : courses })
+    sort = request.GET.get('sort') if request.GET.get('sort') in counters.SORTS else counters.DEFAULT_SORT
+    order = counters.order_version(sort)
+    courses = catalog.get_or_build('courses', lambda: _all_courses(sort), sort, order)
+    owned_courses = CourseAccess.for_courses(request.user, [c.pk for c in courses])
+    return render(request, 'index.html', {
+        'sort' : sort,
+        'order' : order,
+        'courses' : courses,
+        'owned_courses' : owned_courses,
+        'owned_key' : _owned_key(owned_courses),
+    })
 
 
 
 @require_http_methods(["GET"])
 def buy_all(request):
     "the page that has all the courses ready to buy ."
-    courses = Course.objects.filter().all()
-    return render(request, 'course/buy_all.html', { 'courses' : courses })
+    sort = request.GET.get('sort') if request.GET.get('sort') in counters.SORTS else counters.DEFAULT_SORT
+    order = counters.order_version(sort)
+    courses = catalog.get_or_build('courses', lambda: _all_courses(sort), sort, order)
+    owned_courses = CourseAccess.for_courses(request.user, [c.pk for c in courses])
+    return render(request, 'course/buy_all.html', {
+        'sort' : sort,
+        'order' : order,
+        'courses' : courses,
+        'owned_courses' : owned_courses,
+        'owned_key' : _owned_key(owned_courses),
+    })
 
 
 
@@ -39,47 +80,23 @@ def course_list(request, courses):
 @require_course_access()
 def course_view(request, course_id):
     "the page that showes each unit for the course"
-    units = Unit.objects.filter(course_id=course_id).all()
-    return render(request, 'course/course.html', { 'units' : units })
+    outline = get_outline(course_id)
+    if outline is None:
+        raise Http404("Course not found.")
+    return render(request, 'course/course.html', { 'units' : outline.units })
 
 
 def course_landing(request, course_id):
-    course = get_object_or_404(Course.objects.only('id'), pk=course_id)
-
-    lessons_qs = Lesson.objects.only('id', 'title', 'content', 'image', 'unit_id')
-
-    preview_lesson = (Lesson.objects
-                  .filter(unit__course_id=course_id)
-                  .order_by('-id')
-                  .first())
-    
-    preview_lesson_comments = None
-    if preview_lesson is not None:
-        preview_lesson_comments = (Comment.objects
-                    .filter(
-                    receiver_content_type__model='lesson',
-                    receiver_object_id=preview_lesson.pk
-                    )
-                    .select_related('sender')
-                    .prefetch_related('children__sender')
-                    .order_by('-created_at')
-                    )
-
-    units = (Unit.objects
-             .filter(course_id=course.pk)
-             .only('id', 'name', 'description', 'course_id')
-             .prefetch_related(Prefetch('lesson_set', queryset=lessons_qs))
-             .annotate(_lessons=Count('lesson')))
-    
-
-    total_lessons = sum(u.lesson_set.count() for u in units) #type:ignore
+    outline = get_outline(course_id)
+    if outline is None:
+        raise Http404("Course not found.")
+    preview_lesson = outline.preview_lesson
 
     return render(request, 'course/course_details.html', {
-        'course': course,
-        'units': units,
-        'total_lessons': total_lessons,
+        'course': outline.course,
+        'units': outline.units,
+        'total_lessons': outline.total_lessons,
         'preview_lesson' : preview_lesson,
-        'comments' : preview_lesson_comments,
     })
 
 
@@ -88,8 +105,11 @@ def course_landing(request, course_id):
 @require_course_access()
 def unit_view(request, course_id, unit_id):
     "the page that showes each lesson for the unit"
-    lessons = Lesson.objects.filter(unit_id=unit_id).all()
-    return render(request, 'course/lesson_list.html', { 'lessons' : lessons })
+    outline = get_outline(course_id)
+    unit = outline.unit(unit_id) if outline is not None else None
+    if unit is None:
+        raise Http404("Unit not found in this course.")
+    return render(request, 'course/lesson_list.html', { 'unit' : unit, 'lessons' : unit.lessons })
 
 
 
@@ -99,21 +119,11 @@ def unit_view(request, course_id, unit_id):
 def lesson_view(request, course_id, lesson_id):
     "the lesson page"
     lesson = get_object_or_404(Lesson.objects.only('id'), id=lesson_id)
-    comments = (Comment.objects
-                .filter(
-                    receiver_content_type__model='lesson',
-                    receiver_object_id=lesson.pk
-                )
-                .select_related('sender')
-                .prefetch_related('children__sender')
-                .order_by('-created_at')
-                )
     return render(
         request,
         'course/lesson.html',
         { 
             'lesson' : lesson,
-            'comments' : comments,
             'course_id' : course_id,
         }
     )
@@ -121,6 +131,45 @@ def lesson_view(request, course_id, lesson_id):
 
 
 
+def _readable_lesson(request, course_id, lesson_id):
+    "The preview lesson is public like the landing page, the other lessons need the course."
+    outline = get_outline(course_id)
+    if outline is None or not any(l.pk == lesson_id for u in outline.units for l in u.lessons):
+        raise Http404("Lesson not found in this course.")
+    preview = outline.preview_lesson
+    if preview is None or preview.pk != lesson_id:
+        if not request.user.is_authenticated:
+            raise PermissionDenied
+        if not (getattr(request, 'teacher', None) or getattr(request, 'course_access', None)):
+            raise PermissionDenied
+    return Lesson(id=lesson_id)
+
+
+@require_http_methods(["GET"])
+def lesson_comments(request, course_id, lesson_id):
+    "JSON feed of the lesson top level comments, newest first, ?cursor= for the next page"
+    lesson = _readable_lesson(request, course_id, lesson_id)
+    page = root_page(lesson, request.GET.get('cursor'))
+    reply_url = reverse('CommentAddComment', args=[course_id, lesson.pk])
+    return JsonResponse({
+        'comments': [
+            as_json(c, reply_url, reverse('LessonCommentReplies', args=[course_id, lesson.pk, c.pk]))
+            for c in page
+        ],
+        'next': page.next_cursor,
+    })
+
+
+@require_http_methods(["GET"])
+def lesson_comment_replies(request, course_id, lesson_id, comment_id):
+    "JSON list of every reply under one top level comment"
+    lesson = _readable_lesson(request, course_id, lesson_id)
+    rows = replies(lesson, comment_id)
+    if rows is None:
+        raise Http404("Comment not found.")
+    return JsonResponse({'replies': [as_json(r) for r in rows]})
+
+
 @login_required
 @require_http_methods(["POST"])
 @require_course_access()
@@ -129,6 +178,9 @@ def comment_add_lesson(request, course_id, lesson_id):
     content = request.POST.get('content')
     if content is None:
         return redirect("Lesson",course_id, lesson.pk)
+    if blocklist.blocked_term(content):
+        messages.error(request, _("Your comment was not posted because it contains a blocked word."))
+        return redirect("Lesson",course_id, lesson.pk)
     Comment.objects.create(
         content=content,
         sender=request.user,
@@ -148,6 +200,9 @@ def comment_add_comment(request, course_id, lesson_id):
     content = request.POST.get('content')
     if content is None:
         return redirect("Lesson",course_id, lesson.pk)
+    if blocklist.blocked_term(content):
+        messages.error(request, _("Your comment was not posted because it contains a blocked word."))
+        return redirect("Lesson",course_id, lesson.pk)
     Comment.objects.create(
         content=content,
         sender=request.user,
@@ -158,6 +213,61 @@ def comment_add_comment(request, course_id, lesson_id):
 
 
 
+
+@require_http_methods(["GET", "HEAD"])
+def media_file(request, path):
+    """
+    Files under MEDIA_ROOT when the site runs without the bucket. Byte ranges (so videos can seek),
+    ETag/If-Range and 304s; lesson files need the course like the lesson page.
+    With MEDIA_OFFLOAD the front server sends the bytes once the check passes.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("File not found.")
+    if not os.path.isfile(full_path):
+        raise Http404("File not found.")
+
+    lesson = media.owner(path)
+    if lesson is not None and not media.can_read(request, *lesson):
+        raise PermissionDenied
+    cache_control = "private, max-age=3600" if lesson is not None else "public, max-age=86400"
+
+    offload = media.offload_headers(path, full_path)
+    if offload:
+        response = HttpResponse(content_type=media.content_type(full_path), headers=offload)
+        response['Cache-Control'] = cache_control
+        return response
+
+    stat = os.stat(full_path)
+    tag = media.etag(stat)
+    response = get_conditional_response(request, etag=tag, last_modified=int(stat.st_mtime))
+    if response is None:
+        span = None
+        if media.range_applies(request, tag, stat):
+            span = media.byte_range(request.META.get('HTTP_RANGE'), stat.st_size)
+        if span is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{stat.st_size}"
+        elif request.method == 'HEAD':
+            response = HttpResponse(content_type=media.content_type(full_path))
+            response['Content-Length'] = stat.st_size
+        elif span is None:
+            # the whole file: FileResponse lets the WSGI server use sendfile()
+            response = FileResponse(open(full_path, 'rb'), content_type=media.content_type(full_path))
+        else:
+            first, last = span
+            response = StreamingHttpResponse(media.read_slice(full_path, first, last), status=206,
+                                             content_type=media.content_type(full_path))
+            response['Content-Range'] = f"bytes {first}-{last}/{stat.st_size}"
+            response['Content-Length'] = last - first + 1
+    response['Accept-Ranges'] = "bytes"
+    response['ETag'] = tag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = cache_control
+    return response
+
+
 @login_required
 @require_http_methods(["GET"])
 def make_me_super_user(request):
@@ -48,6 +48,8 @@ INSTALLED_APPS = [
     'school',
     'article',
     'teacher',
+    'search',
+    'jobs',
     'storages'
 ]
 
@@ -85,6 +87,7 @@ TEMPLATES = [
 
 TEMPLATES[0]['OPTIONS']['context_processors'] += [
     'school.course_context_processor.course_context',
+    'jobs.context_processors.pending_jobs',
 ]
 
 WSGI_APPLICATION = 'schoolia.wsgi.application'
@@ -170,6 +173,53 @@ STRIPE_ENDPOINT_SECRET = os.environ.get('STRIPE_ENDPOINT_SECRET') #or secret_inf
 
 CURRENCY = 'USD'
 
+# Cache
+# every worker must see the same cache: the catalog, role, entitlement and media versions are bumped
+# by whichever process handled the write. REDIS_URL when set, otherwise the database
+# (`manage.py createcachetable`, run on release); process-local only for DEBUG on a single runserver
+
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+elif DEBUG:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "schoolia",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "schoolia_cache",
+        }
+    }
+
+# catalog pages (index, buy-all, course details) are cached per catalog version and language,
+# see school/catalog.py
+CATALOG_CACHE_TIMEOUT = 3600
+CATALOG_REBUILD_LOCK_TIMEOUT = 10
+
+# how long (seconds) a student's owned-course set stays cached, see school/entitlements.py
+ENTITLEMENT_CACHE_TIMEOUT = 300
+
+# how long (seconds) a user's teacher row is cached, see school/access.py
+ROLE_CACHE_TIMEOUT = 300
+
+# rendered lesson discussions are cached per thread version and language; the TTL only keeps
+# the "x minutes ago" labels fresh, see school/templatetags/comment_threads.py
+COMMENT_THREAD_CACHE_TIMEOUT = 300
+
+# opt-in: after one successful access check a course is opened from a signed session grant
+# with no database query, until it expires or the student's grant_revision changes
+COURSE_ACCESS_GRANTS = os.getenv("COURSE_ACCESS_GRANTS") == "1"
+COURSE_ACCESS_GRANT_MAX_AGE = 600
+
 
 AUTH_USER_MODEL = "authentication.Student"
 
@@ -212,11 +262,18 @@ USE_S3 = bool(True)#os.getenv("USE_S3") == "1"
 
 if USE_S3:
     UPLOAD_S3_FOLDER = "media/courses/"
+    # lesson videos: the bucket policy must keep this folder private (no public-read),
+    # pages get presigned URLs that stay the same for SIGNED_MEDIA_URL_WINDOW seconds, see utils.s3.signed_url;
+    # videos uploaded before the folder existed are moved in once with `manage.py privatize_lesson_videos`
+    PRIVATE_S3_FOLDER = "private/lessons/"
+    SIGNED_MEDIA_URL_WINDOW = 3600
     AWS_STORAGE_BUCKET_NAME = os.getenv("AWS_STORAGE_BUCKET_NAME", "schooliamain")
     AWS_S3_REGION_NAME = os.getenv("AWS_S3_REGION_NAME", "us-east-1")
     AWS_S3_CUSTOM_DOMAIN = f"{AWS_STORAGE_BUCKET_NAME}.s3.{AWS_S3_REGION_NAME}.amazonaws.com"
     AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
     AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
+    # S3-compatible stand-in (MinIO, moto server) for tests and self-hosting, empty for AWS
+    AWS_S3_ENDPOINT_URL = os.getenv("AWS_S3_ENDPOINT_URL") or None
 
     AWS_QUERYSTRING_AUTH = False
     AWS_S3_FILE_OVERWRITE = False
@@ -228,5 +285,53 @@ else:
     # تخزين محلي (للتطوير)
     MEDIA_URL = "/media/"
     MEDIA_ROOT = BASE_DIR / "media"
+    # school.views.media_file checks access then lets the front server send the file:
+    # "x-accel-redirect" (nginx, an internal location aliasing MEDIA_ROOT at MEDIA_ACCEL_PREFIX),
+    # "x-sendfile" (Apache mod_xsendfile, lighttpd), empty to stream from Django
+    MEDIA_OFFLOAD = os.getenv("MEDIA_OFFLOAD", "")
+    MEDIA_ACCEL_PREFIX = "/protected-media/"
+
+
+# lesson videos go from the browser straight to the bucket, see utils/direct_upload.py
+# (the bucket CORS must allow POST/PUT from the site and expose the ETag header)
+LESSON_VIDEO_MAX_SIZE = 2 * 1024 ** 3
+DIRECT_UPLOAD_MULTIPART_THRESHOLD = 64 * 1024 ** 2
+DIRECT_UPLOAD_PART_SIZE = 16 * 1024 ** 2
+DIRECT_UPLOAD_EXPIRES = 3600
+# uploads the browser never finished: schedule `manage.py abort_stale_uploads`, or install the bucket rule
+# once with `manage.py abort_stale_uploads --lifecycle 1`
+# uploads that do go through Django are streamed to the bucket one part at a time, see utils/upload_handlers.py
+# (S3 parts are at least 5 MiB)
+STREAMING_UPLOAD_PART_SIZE = 8 * 1024 ** 2
+# transfer tuning per file class for utils.s3.upload_fileobj_to_s3, entries override the defaults there
+# keys: multipart_threshold, multipart_chunksize, max_concurrency, max_bandwidth (bytes/s)
+S3_TRANSFER = {
+    'video': {'multipart_threshold': 32 * 1024 ** 2, 'multipart_chunksize': 32 * 1024 ** 2, 'max_concurrency': 10},
+}
+# every S3 call retries throttling and 5xx errors with exponential backoff ('standard' or 'adaptive')
+S3_RETRIES = {'mode': 'standard', 'total_max_attempts': 5}
+# the client is built on first use in each process (utils.s3.client)
+# pooled connections per client: keep it at least the largest max_concurrency of S3_TRANSFER
+S3_MAX_POOL_CONNECTIONS = 10
+# seconds before a call gives up
+S3_CONNECT_TIMEOUT = 5
+S3_READ_TIMEOUT = 60
+# where the jobs keep derived files: dotted path of a utils.storage.Storage, empty for S3 with USE_S3
+# and MEDIA_ROOT without (utils.storage.LocalStorage also suits tests)
+OBJECT_STORAGE = os.getenv("OBJECT_STORAGE", "")
+
+# background jobs run by `manage.py run_jobs`, see jobs/queue.py
+# uploads wait in JOBS_SPOOL_DIR until a worker sends them, only when the web and worker processes share it
+# (JOBS_SPOOL_SHARED=1, one machine or a shared volume); Heroku dynos don't, there the request uploads the file
+JOBS_SPOOL_SHARED = os.getenv("JOBS_SPOOL_SHARED") == "1"
+JOBS_SPOOL_DIR = os.getenv("JOBS_SPOOL_DIR", str(BASE_DIR / "spool"))
+# a claimed job goes back to the queue when its worker stops sending heartbeats for this long
+JOBS_VISIBILITY_TIMEOUT = 300
+JOBS_MAX_ATTEMPTS = 5
+# seconds before the first retry, doubled on every attempt
+JOBS_RETRY_BACKOFF = 30
+
+# course/lesson/article images get WebP and JPEG copies at these widths, see jobs/images.py
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 1024)
 
     
\ No newline at end of file
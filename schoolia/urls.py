@@ -24,10 +24,17 @@ urlpatterns = [
     path('operation/', include('operation.urls')),
     path('article/', include('article.urls')),
     path('teacher/', include('teacher.urls')),
+    path('search/', include('search.urls')),
+    path('jobs/', include('jobs.urls')),
     path("i18n/", include("django.conf.urls.i18n")),
 ]
 
+import re
 from django.conf import settings
-from django.conf.urls.static import static
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+from django.urls import re_path
+from school.views import media_file
+if not settings.USE_S3:
+    # local storage, also in production: ranges for the video player and the lesson access check, see school/media.py
+    urlpatterns += [
+        re_path(rf"^{re.escape(settings.MEDIA_URL.lstrip('/'))}(?P<path>.+)$", media_file, name="Media"),
+    ]
\ No newline at end of file
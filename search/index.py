@@ -0,0 +1,82 @@
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from .models import SearchDocument, DocumentKind
+from .normalize import normalize, terms
+
+
+SNIPPET_LENGTH = 300
+# without FULLTEXT (sqlite in development) only this many candidates are ranked
+FALLBACK_CANDIDATES = 1000
+
+
+def _store(kind, object_id, title, body, course_id=None, snippet=''):
+    title = title or ''
+    SearchDocument.objects.update_or_create(
+        kind=kind,
+        object_id=object_id,
+        defaults={
+            'course_id': course_id,
+            'title': title[:256],
+            'snippet': (snippet or '')[:SNIPPET_LENGTH],
+            'title_text': normalize(title)[:256],
+            'text': normalize(f"{title} {body or ''}"),
+        },
+    )
+
+
+def index_course(course):
+    _store(DocumentKind.COURSE, course.pk, course.name, course.description,
+           course_id=course.pk, snippet=course.description)
+
+
+def index_lesson(lesson):
+    course_id = None
+    if lesson.unit_id is not None:
+        from school.models import Unit
+        course_id = Unit.objects.filter(pk=lesson.unit_id).values_list('course_id', flat=True).first()
+    # paid lesson content is searchable but never shown in the results
+    _store(DocumentKind.LESSON, lesson.pk, lesson.title, lesson.content, course_id=course_id)
+
+
+def index_article(article):
+    _store(DocumentKind.ARTICLE, article.pk, article.title, article.content, snippet=article.content)
+
+
+def remove(kind, object_id):
+    SearchDocument.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def search(query, kind=None, page=1, per_page=20):
+    """
+    Ranked results for one page plus whether there is a next one.
+    MariaDB/MySQL use the FULLTEXT index, other databases a small ranked LIKE scan.
+    """
+    words = terms(query)
+    if not words:
+        return [], False
+    qs = SearchDocument.objects.only('kind', 'object_id', 'course_id', 'title', 'snippet')
+    if kind in DocumentKind.values:
+        qs = qs.filter(kind=kind)
+    offset = (page - 1) * per_page
+
+    if connection.vendor == 'mysql':
+        text = ' '.join(words)
+        qs = (qs
+              .extra(where=["MATCH (`text`) AGAINST (%s IN NATURAL LANGUAGE MODE)"], params=[text])
+              .annotate(score=RawSQL(
+                  "MATCH (`title_text`) AGAINST (%s IN NATURAL LANGUAGE MODE) * 2"
+                  " + MATCH (`text`) AGAINST (%s IN NATURAL LANGUAGE MODE)",
+                  [text, text]))
+              .order_by('-score', '-id'))
+        rows = list(qs[offset:offset + per_page + 1])
+    else:
+        for word in words:
+            qs = qs.filter(text__contains=word)
+        candidates = list(qs.only('kind', 'object_id', 'course_id', 'title', 'snippet', 'title_text', 'text')
+                          .order_by('-updated_at')[:FALLBACK_CANDIDATES])
+        for doc in candidates:
+            doc.score = sum(2 * doc.title_text.count(w) + doc.text.count(w) for w in words)
+        candidates.sort(key=lambda d: (-d.score, -d.pk))
+        rows = candidates[offset:offset + per_page + 1]
+
+    return rows[:per_page], len(rows) > per_page
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from school.models import Course, Lesson
+from article.models import Article
+from search import index
+
+
+class Command(BaseCommand):
+    help = "Index every course, lesson and article for search, in batches (existing rows are updated)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model, index_one in ((Course, index.index_course),
+                                 (Lesson, index.index_lesson),
+                                 (Article, index.index_article)):
+            last_id = 0
+            done = 0
+            while True:
+                batch = list(model.objects.filter(pk__gt=last_id).order_by('pk')[:batch_size])
+                if not batch:
+                    break
+                for obj in batch:
+                    index_one(obj)
+                done += len(batch)
+                last_id = batch[-1].pk
+            self.stdout.write(f"{model.__name__}: {done} indexed.")
+        self.stdout.write(self.style.SUCCESS("search index rebuilt."))
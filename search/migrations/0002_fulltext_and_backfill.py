@@ -0,0 +1,64 @@
+from itertools import chain, islice
+from django.db import migrations
+from search.normalize import normalize
+
+
+BATCH_SIZE = 500
+
+
+def create_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute("CREATE FULLTEXT INDEX search_doc_text_ft ON search_searchdocument (`text`)")
+    schema_editor.execute("CREATE FULLTEXT INDEX search_doc_title_ft ON search_searchdocument (`title_text`)")
+
+
+def drop_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute("DROP INDEX search_doc_text_ft ON search_searchdocument")
+    schema_editor.execute("DROP INDEX search_doc_title_ft ON search_searchdocument")
+
+
+def backfill(apps, schema_editor):
+    SearchDocument = apps.get_model('search', 'SearchDocument')
+    Course = apps.get_model('school', 'Course')
+    Lesson = apps.get_model('school', 'Lesson')
+    Article = apps.get_model('article', 'Article')
+
+    def doc(kind, object_id, title, body, course_id=None, snippet=''):
+        title = title or ''
+        return SearchDocument(
+            kind=kind, object_id=object_id, course_id=course_id,
+            title=title[:256], snippet=(snippet or '')[:300],
+            title_text=normalize(title)[:256], text=normalize(f"{title} {body or ''}"),
+        )
+
+    # streamed: only one batch of documents is ever in memory
+    docs = chain(
+        (doc('course', c.pk, c.name, c.description, c.pk, c.description)
+         for c in Course.objects.iterator(chunk_size=BATCH_SIZE)),
+        (doc('lesson', l.pk, l.title, l.content, l.unit.course_id if l.unit_id else None)
+         for l in Lesson.objects.select_related('unit').iterator(chunk_size=BATCH_SIZE)),
+        (doc('article', a.pk, a.title, a.content, snippet=a.content)
+         for a in Article.objects.iterator(chunk_size=BATCH_SIZE)),
+    )
+    while True:
+        batch = list(islice(docs, BATCH_SIZE))
+        if not batch:
+            break
+        SearchDocument.objects.bulk_create(batch, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+        ('school', '0005_course_counters'),
+        ('article', '0002_article_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext, drop_fulltext),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+from django.db import models
+
+
+class DocumentKind(models.TextChoices):
+    COURSE = 'course', 'Course'
+    LESSON = 'lesson', 'Lesson'
+    ARTICLE = 'article', 'Article'
+
+
+class SearchDocument(models.Model):
+    """
+    صف واحد لكل كورس/درس/مقال بنص مُطبّع، عليه فهرس FULLTEXT في MariaDB.
+    يُحدّث عند حفظ أو حذف المصدر، انظر search/signals.py.
+    """
+    kind = models.CharField(max_length=16, choices=DocumentKind.choices)
+    object_id = models.PositiveBigIntegerField()
+    # lessons link through their course
+    course_id = models.PositiveBigIntegerField(null=True, blank=True)
+    title = models.CharField(max_length=256)
+    snippet = models.CharField(max_length=300, blank=True)
+    title_text = models.CharField(max_length=256)
+    text = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.kind}#{self.object_id}: {self.title}"
+
+    class Meta:
+        unique_together = [['kind', 'object_id']]
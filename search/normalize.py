@@ -0,0 +1,31 @@
+import re
+
+
+# تشكيل + تطويل
+DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+FOLD = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي',
+    'ؤ': 'و',
+    'ة': 'ه',
+    '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
+    '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+})
+NON_WORD = re.compile(r'[^\w]+')
+# light stemming: "ال" and its common attached forms, so "الجبر" and "جبر" are the same term
+ARTICLE_PREFIX = re.compile(r'^(?:وال|بال|كال|فال|لل|ال)(?=\w{2,})')
+
+
+def normalize(text):
+    """
+    نفس التطبيع يُطبّق على النص المخزّن وعلى نص البحث:
+    حذف التشكيل، توحيد الألف والياء والتاء المربوطة، حذف "ال" التعريف، أرقام عربية -> لاتينية، حروف صغيرة.
+    """
+    if not text:
+        return ''
+    text = DIACRITICS.sub('', text.casefold()).translate(FOLD)
+    return ' '.join(ARTICLE_PREFIX.sub('', word) for word in NON_WORD.sub(' ', text).split())
+
+
+def terms(query):
+    return normalize(query).split()
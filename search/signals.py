@@ -0,0 +1,46 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from school.models import Course, Unit, Lesson
+from article.models import Article
+from . import index
+from .models import DocumentKind, SearchDocument
+
+
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, **kwargs):
+    index.index_course(instance)
+
+
+@receiver(post_save, sender=Lesson)
+def lesson_saved(sender, instance, **kwargs):
+    index.index_lesson(instance)
+
+
+@receiver(post_save, sender=Unit)
+def unit_saved(sender, instance, **kwargs):
+    # lesson results link through the course, follow a unit that moved
+    lesson_ids = Lesson.objects.filter(unit_id=instance.pk).values_list('id', flat=True)
+    (SearchDocument.objects
+     .filter(kind=DocumentKind.LESSON, object_id__in=list(lesson_ids))
+     .exclude(course_id=instance.course_id)
+     .update(course_id=instance.course_id))
+
+
+@receiver(post_save, sender=Article)
+def article_saved(sender, instance, **kwargs):
+    index.index_article(instance)
+
+
+@receiver(post_delete, sender=Course)
+def course_deleted(sender, instance, **kwargs):
+    index.remove(DocumentKind.COURSE, instance.pk)
+
+
+@receiver(post_delete, sender=Lesson)
+def lesson_deleted(sender, instance, **kwargs):
+    index.remove(DocumentKind.LESSON, instance.pk)
+
+
+@receiver(post_delete, sender=Article)
+def article_deleted(sender, instance, **kwargs):
+    index.remove(DocumentKind.ARTICLE, instance.pk)
@@ -0,0 +1,112 @@
+import importlib
+from unittest import mock
+from django.apps import apps
+from django.test import SimpleTestCase, TestCase
+from article.models import Article
+from authentication.models import Student
+from school.models import Course, Unit, Lesson
+from .index import search
+from .models import DocumentKind, SearchDocument
+from .normalize import normalize, terms
+
+
+class NormalizeTests(SimpleTestCase):
+    def test_arabic_folding(self):
+        self.assertEqual(normalize("أحمد"), normalize("احمد"))
+        self.assertEqual(normalize("إسلام آمنة"), "اسلام امنه")
+        self.assertEqual(normalize("مستشفى"), "مستشفي")
+        # diacritics and tatweel
+        self.assertEqual(normalize("مُـــدَرِّسٌ"), "مدرس")
+        self.assertEqual(normalize("٢٠٢٤"), "2024")
+
+    def test_definite_article(self):
+        self.assertEqual(normalize("الجبر"), "جبر")
+        self.assertEqual(normalize("والرياضيات بالعربية"), "رياضيات عربيه")
+        # too short to be a prefix
+        self.assertEqual(normalize("الم"), "الم")
+
+    def test_case_and_punctuation(self):
+        self.assertEqual(normalize("Hello, WORLD!  (Python)"), "hello world python")
+        self.assertEqual(terms("  C++ / Django? "), ["c", "django"])
+        self.assertEqual(normalize(None), '')
+
+
+class IndexSignalTests(TestCase):
+    def doc(self, kind, object_id):
+        return SearchDocument.objects.filter(kind=kind, object_id=object_id).first()
+
+    def test_course_and_lesson_follow_their_rows(self):
+        course = Course.objects.create(name="الجبر", description="Linear equations", price=5)
+        self.assertEqual(self.doc(DocumentKind.COURSE, course.pk).text, "جبر linear equations")
+
+        course.name = "Algebra"
+        course.save()
+        self.assertEqual(self.doc(DocumentKind.COURSE, course.pk).title, "Algebra")
+
+        unit = Unit.objects.create(name="unit", course=course)
+        lesson = Lesson.objects.create(title="Matrices", content="rows", unit=unit)
+        self.assertEqual(self.doc(DocumentKind.LESSON, lesson.pk).course_id, course.pk)
+
+        other = Course.objects.create(name="Geometry", price=5)
+        unit.course = other
+        unit.save()
+        self.assertEqual(self.doc(DocumentKind.LESSON, lesson.pk).course_id, other.pk)
+
+        lesson.delete()
+        course.delete()
+        self.assertIsNone(self.doc(DocumentKind.LESSON, lesson.pk))
+        self.assertIsNone(self.doc(DocumentKind.COURSE, course.pk))
+
+    def test_article(self):
+        student = Student.objects.create(username="writer", email="writer@example.com")
+        article = Article.objects.create(title="Notes", content="On sets", student=student)
+        self.assertEqual(self.doc(DocumentKind.ARTICLE, article.pk).snippet, "On sets")
+        article.delete()
+        self.assertIsNone(self.doc(DocumentKind.ARTICLE, article.pk))
+
+    def test_backfill(self):
+        course = Course.objects.create(name="Algebra", price=5)
+        Lesson.objects.create(title="Matrices", unit=Unit.objects.create(name="unit", course=course))
+        Lesson.objects.create(title="Loose")
+        indexed = set(SearchDocument.objects.values_list('kind', 'object_id', 'course_id', 'text'))
+        SearchDocument.objects.all().delete()
+
+        migration = importlib.import_module('search.migrations.0002_fulltext_and_backfill')
+        with mock.patch.object(migration, 'BATCH_SIZE', 2):
+            migration.backfill(apps, None)
+        self.assertEqual(set(SearchDocument.objects.values_list('kind', 'object_id', 'course_id', 'text')), indexed)
+
+
+class FallbackSearchTests(TestCase):
+    """search() without FULLTEXT, as on sqlite."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = [Course.objects.create(name=f"Algebra {i}", description="numbers", price=5) for i in range(3)]
+        cls.lesson = Lesson.objects.create(title="Intro", content="algebra basics")
+
+    def test_every_word_must_match(self):
+        results, has_next = search("algebra numbers")
+        self.assertEqual({r.object_id for r in results}, {c.pk for c in self.courses})
+        self.assertFalse(has_next)
+        self.assertEqual(search("algebra geometry"), ([], False))
+        self.assertEqual(search("  ?! "), ([], False))
+
+    def test_title_hits_rank_first(self):
+        results, _ = search("algebra")
+        # the lesson only has the word in its content
+        self.assertEqual([r.kind for r in results], [DocumentKind.COURSE] * 3 + [DocumentKind.LESSON])
+
+    def test_kind_filter(self):
+        results, _ = search("algebra", kind=DocumentKind.LESSON)
+        self.assertEqual([(r.kind, r.object_id) for r in results], [(DocumentKind.LESSON, self.lesson.pk)])
+        # unknown kinds search everything
+        self.assertEqual(len(search("algebra", kind="video")[0]), 4)
+
+    def test_pagination(self):
+        first, has_next = search("algebra", per_page=3)
+        self.assertTrue(has_next)
+        second, has_next = search("algebra", page=2, per_page=3)
+        self.assertFalse(has_next)
+        self.assertEqual(len(first) + len(second), 4)
+        self.assertFalse({r.pk for r in first} & {r.pk for r in second})
@@ -0,0 +1,31 @@
+from django.shortcuts import render
+from django.views.decorators.http import require_http_methods
+from .index import search as run_search
+from .models import DocumentKind
+
+
+PER_PAGE = 20
+# ranked results are paged with OFFSET, nobody reads this deep
+MAX_PAGE = 50
+
+
+@require_http_methods(["GET"])
+def search(request):
+    "Ranked search over courses, lessons and articles."
+    query = (request.GET.get('q') or '').strip()[:200]
+    kind = request.GET.get('kind')
+    try:
+        page = min(max(int(request.GET.get('page', 1)), 1), MAX_PAGE)
+    except ValueError:
+        page = 1
+
+    results, has_next = run_search(query, kind=kind, page=page, per_page=PER_PAGE) if query else ([], False)
+
+    return render(request, 'search.html', {
+        'query': query,
+        'kind': kind if kind in DocumentKind.values else '',
+        'results': results,
+        'page': page,
+        'has_next': has_next and page < MAX_PAGE,
+        'has_previous': page > 1,
+    })
@@ -0,0 +1,135 @@
+// صفحات الدروس والمقالات تعرض أول صفحة من التعليقات فقط
+// الردود والصفحات التالية تأتي من الـ JSON feed عند الضغط
+
+function commentCsrfToken() {
+    const input = document.querySelector('[name=csrfmiddlewaretoken]');
+    return input ? input.value : '';
+}
+
+function commentElement(tag, className, text) {
+    const el = document.createElement(tag);
+    if (className) el.className = className;
+    if (text !== undefined) el.textContent = text;
+    return el;
+}
+
+function renderReply(r) {
+    const row = commentElement('div', 'd-flex');
+    if (r.depth > 1) row.style.marginInlineStart = `${(r.depth - 1) * 1.5}rem`;
+    row.appendChild(commentElement('div', 'avatar ms-2', (r.sender || '?').charAt(0).toUpperCase()));
+    const body = commentElement('div');
+    const head = commentElement('div');
+    head.appendChild(commentElement('strong', '', r.sender));
+    head.appendChild(commentElement('span', 'text-muted small ms-2', r.since));
+    body.appendChild(head);
+    body.appendChild(commentElement('p', 'mb-0 mt-1', r.content));
+    row.appendChild(body);
+    return row;
+}
+
+function renderReplyForm(c, labels) {
+    const box = commentElement('div', 'collapse');
+    box.id = `reply-${c.id}`;
+    const form = commentElement('form', 'mt-2');
+    form.method = 'post';
+    form.action = c.reply_url;
+    const fields = { csrfmiddlewaretoken: commentCsrfToken(), receiver_type: 'comment', receiver_id: c.id, parent_id: c.id };
+    Object.entries(fields).forEach(([name, value]) => {
+        const input = commentElement('input');
+        input.type = 'hidden';
+        input.name = name;
+        input.value = value;
+        form.appendChild(input);
+    });
+    const textarea = commentElement('textarea', 'form-control mb-2');
+    textarea.name = 'content';
+    textarea.required = true;
+    textarea.placeholder = labels.placeholder;
+    form.appendChild(textarea);
+    const send = commentElement('button', 'btn btn-outline-primary btn-sm', labels.send);
+    send.type = 'submit';
+    form.appendChild(send);
+    box.appendChild(form);
+    return box;
+}
+
+function renderComment(c, labels) {
+    const card = commentElement('article', 'comment-card p-3 bg-white');
+    const row = commentElement('div', 'd-flex align-items-start');
+    row.appendChild(commentElement('div', 'avatar ms-2', (c.sender || '?').charAt(0).toUpperCase()));
+    const body = commentElement('div', 'flex-grow-1');
+
+    const head = commentElement('div', 'd-flex justify-content-between flex-wrap');
+    const who = commentElement('div');
+    who.appendChild(commentElement('strong', '', c.sender));
+    who.appendChild(commentElement('span', 'text-muted small ms-2', c.since));
+    head.appendChild(who);
+    // pages without reply forms leave the reply label out
+    const canReply = Boolean(c.reply_url && labels.reply);
+    if (canReply) {
+        const toggle = commentElement('a', 'link-secondary small', labels.reply);
+        toggle.href = `#reply-${c.id}`;
+        toggle.setAttribute('data-bs-toggle', 'collapse');
+        toggle.setAttribute('role', 'button');
+        head.appendChild(toggle);
+    }
+    body.appendChild(head);
+    body.appendChild(commentElement('p', 'mb-2 mt-1', c.content));
+    if (canReply) body.appendChild(renderReplyForm(c, labels));
+
+    if (c.reply_count && c.replies_url) {
+        const thread = commentElement('div', 'mt-3 reply-thread');
+        const more = commentElement('button', 'btn btn-link btn-sm p-0 js-load-replies', `${labels.replies} (${c.reply_count})`);
+        more.type = 'button';
+        more.dataset.url = c.replies_url;
+        thread.appendChild(more);
+        thread.appendChild(commentElement('div', 'vstack gap-3 js-replies'));
+        body.appendChild(thread);
+    }
+    row.appendChild(body);
+    card.appendChild(row);
+    return card;
+}
+
+document.addEventListener('click', event => {
+    const repliesButton = event.target.closest('.js-load-replies');
+    if (repliesButton) {
+        repliesButton.disabled = true;
+        fetch(repliesButton.dataset.url, { headers: { 'Accept': 'application/json' } })
+            .then(response => {
+                if (!response.ok) throw new Error(response.status);
+                return response.json();
+            })
+            .then(data => {
+                const box = repliesButton.parentElement.querySelector('.js-replies');
+                data.replies.forEach(r => box.appendChild(renderReply(r)));
+                repliesButton.remove();
+            })
+            .catch(() => { repliesButton.disabled = false; });
+        return;
+    }
+
+    const moreButton = event.target.closest('.js-load-comments');
+    if (moreButton) {
+        const list = document.getElementById(moreButton.dataset.target);
+        const labels = moreButton.dataset;
+        moreButton.disabled = true;
+        fetch(moreButton.dataset.url, { headers: { 'Accept': 'application/json' } })
+            .then(response => {
+                if (!response.ok) throw new Error(response.status);
+                return response.json();
+            })
+            .then(data => {
+                data.comments.forEach(c => list.appendChild(renderComment(c, labels)));
+                if (data.next) {
+                    const url = new URL(moreButton.dataset.url, window.location.href);
+                    url.searchParams.set('cursor', data.next);
+                    moreButton.dataset.url = url.toString();
+                    moreButton.disabled = false;
+                } else {
+                    moreButton.remove();
+                }
+            })
+            .catch(() => { moreButton.disabled = false; });
+    }
+});
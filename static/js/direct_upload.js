@@ -0,0 +1,87 @@
+// فيديو الدرس يُرفع من المتصفح مباشرة إلى الـ bucket
+// النموذج بعدها يرسل الـ token فقط، والسيرفر يتحقق من الملف قبل ربطه بالدرس
+
+function directUploadCsrfToken(form) {
+    const input = form.querySelector('[name=csrfmiddlewaretoken]');
+    return input ? input.value : '';
+}
+
+function directUploadJson(url, form, payload) {
+    return fetch(url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'X-CSRFToken': directUploadCsrfToken(form) },
+        body: JSON.stringify(payload),
+    }).then(response => response.json().then(data => {
+        if (!response.ok) throw new Error(data.error || response.status);
+        return data;
+    }));
+}
+
+// XHR rather than fetch: fetch has no upload progress
+function directUploadSend(method, url, body, onProgress) {
+    return new Promise((resolve, reject) => {
+        const xhr = new XMLHttpRequest();
+        xhr.open(method, url);
+        xhr.upload.addEventListener('progress', event => onProgress(event.loaded));
+        xhr.addEventListener('load', () => {
+            if (xhr.status >= 200 && xhr.status < 300) resolve(xhr);
+            else reject(new Error(xhr.status));
+        });
+        xhr.addEventListener('error', () => reject(new Error('network')));
+        xhr.send(body);
+    });
+}
+
+async function directUploadVideo(form, box, input, file) {
+    const hidden = form.querySelector('[name=video_upload]');
+    const bar = box.querySelector('.js-video-progress');
+    const submit = form.querySelector('[type=submit]');
+    const progress = loaded => {
+        const percent = Math.min(100, Math.round(loaded * 100 / file.size));
+        bar.style.width = `${percent}%`;
+        bar.textContent = `${percent}%`;
+    };
+
+    hidden.value = '';
+    submit.disabled = true;
+    bar.parentElement.classList.remove('d-none');
+    bar.classList.remove('bg-danger');
+    progress(0);
+    try {
+        const ticket = await directUploadJson(box.dataset.startUrl, form, { filename: file.name, size: file.size });
+        if (ticket.mode === 'post') {
+            const body = new FormData();
+            Object.entries(ticket.fields).forEach(([name, value]) => body.append(name, value));
+            body.append('file', file);
+            await directUploadSend('POST', ticket.url, body, progress);
+        } else {
+            const parts = [];
+            let done = 0;
+            for (let i = 0; i < ticket.urls.length; i++) {
+                const chunk = file.slice(i * ticket.part_size, (i + 1) * ticket.part_size);
+                const xhr = await directUploadSend('PUT', ticket.urls[i], chunk, loaded => progress(done + loaded));
+                done += chunk.size;
+                // the bucket CORS has to expose ETag for this header to be readable
+                parts.push({ PartNumber: i + 1, ETag: xhr.getResponseHeader('ETag') });
+            }
+            await directUploadJson(box.dataset.completeUrl, form, { token: ticket.token, parts });
+        }
+        hidden.value = ticket.token;
+        // the file is in the bucket already, do not post it again with the form
+        input.value = '';
+        progress(file.size);
+    } catch (error) {
+        bar.classList.add('bg-danger');
+        bar.textContent = box.dataset.failed;
+        input.value = '';
+    } finally {
+        submit.disabled = false;
+    }
+}
+
+document.addEventListener('change', event => {
+    const input = event.target;
+    const box = input.closest && input.closest('.js-direct-upload');
+    if (!box || input.type !== 'file' || !input.files.length) return;
+    directUploadVideo(input.form, box, input, input.files[0]);
+});
@@ -0,0 +1,25 @@
+// الملفات المرفوعة تنتقل إلى الـ bucket في الخلفية، الصفحة تسأل عن حالتها حتى تنتهي
+
+function pollJob(box, delay) {
+    fetch(box.dataset.url, { headers: { 'Accept': 'application/json' } })
+        .then(response => {
+            if (!response.ok) throw new Error(response.status);
+            return response.json();
+        })
+        .then(job => {
+            if (job.status === 'done') {
+                box.className = 'alert alert-success mb-2';
+                box.textContent = box.dataset.done;
+            } else if (job.status === 'failed') {
+                box.className = 'alert alert-danger mb-2';
+                box.textContent = box.dataset.failed;
+            } else {
+                setTimeout(() => pollJob(box, Math.min(delay * 2, 15000)), delay);
+            }
+        })
+        .catch(() => box.remove());
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    document.querySelectorAll('.js-job-status').forEach(box => pollJob(box, 1000));
+});
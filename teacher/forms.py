@@ -51,6 +51,9 @@ class UnitModelForm(forms.ModelForm):
 
 class LessonModelForm(forms.ModelForm):
 
+    # token of a video the browser already put in the bucket (static/js/direct_upload.js)
+    video_upload = forms.CharField(required=False, widget=forms.HiddenInput)
+
     class Meta:
         
         model = Lesson
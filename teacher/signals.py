@@ -0,0 +1,17 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from school.access import forget_teacher
+from .models import Teacher
+
+
+@receiver(pre_save, sender=Teacher)
+def teacher_user_changing(sender, instance, **kwargs):
+    # the row may be moved to another user, forget the old one as well
+    if instance.pk is not None:
+        forget_teacher(Teacher.objects.filter(pk=instance.pk).values_list('user_id', flat=True).first())
+
+
+@receiver(post_save, sender=Teacher)
+@receiver(post_delete, sender=Teacher)
+def teacher_changed(sender, instance, **kwargs):
+    forget_teacher(instance.user_id)
@@ -17,6 +17,10 @@ urlpatterns = [
     path('unit/delete/<int:pk>/', views.delete_unit, name='UnitDelete'),
     path('lesson/delete/<int:pk>/', views.delete_lesson, name='LessonDelete'),
     path('comment/delete/<int:pk>/', views.delete_comment, name="CommentDelete"),
+    path('comments/delete/', views.delete_comments, name="CommentsDelete"),
+
+    path('video-upload/start/', views.video_upload_start, name='VideoUploadStart'),
+    path('video-upload/complete/', views.video_upload_complete, name='VideoUploadComplete'),
 
     path('course/<int:pk>/update/', views.CourseUpdateView.as_view(), name='CourseUpdate'),
     path('course/<int:course_id>/unit/<int:pk>/update/', views.UnitUpdateView.as_view(), name='UnitUpdate'),
@@ -9,9 +9,23 @@ from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods 
 from django.shortcuts import get_object_or_404
 from school.models import Course, Unit, Lesson, Comment
+from school import counters
+from school.threads import attach_targets, delete_subtrees
+from django.utils.http import url_has_allowed_host_and_scheme
+from article.models import Article
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import datetime, time, timedelta
+from utils.pagination import KeysetPaginator
 from django.http import JsonResponse
 from teacher.forms import CourseModelForm, UnitModelForm, LessonModelForm
-from utils.s3 import upload_fileobj_to_s3, public_url
+from utils.s3 import upload_fileobj_to_s3, public_url, PRIVATE_S3_FOLDER
+from utils.upload_handlers import StreamingUploadMixin
+from jobs.media import defer_upload
+from utils.direct_upload import UploadError, start_video, complete_video, finalize_video
+from django.utils.translation import gettext
+import json
 import os
 
 
@@ -34,8 +48,15 @@ class CoursesManageListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
         return is_supervisor or is_teacher
 
     def get_queryset(self) -> QuerySet[Any]:
-        return super().get_queryset()
-        
+        # the counters live on the course row, sorting by them needs no join
+        return super().get_queryset().order_by(*counters.ordering(self.request.GET.get('sort')))
+
+    def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
+        context = super().get_context_data(**kwargs)
+        sort = self.request.GET.get('sort')
+        context['sort'] = sort if sort in counters.SORTS else counters.DEFAULT_SORT
+        return context
+
 
 class UnitsManageListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
     model = Unit
@@ -128,7 +149,8 @@ class CommentsManageListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
     model = Comment
     template_name = "operations/comments_manage.html"
     context_object_name = 'comments'
-
+    # keyset pages on (created_at, id): the last page costs what the first does
+    per_page = 50
 
     def test_func(self):
         is_teacher = getattr(self.request, 'is_teacher', None)
@@ -143,19 +165,68 @@ class CommentsManageListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
         
         return is_supervisor or is_teacher
 
+    def filters(self):
+        "The ?course= ?lesson= ?article= ?author= ?since= ?until= values that parsed."
+        get = self.request.GET
+        found = {}
+        for name in ('course', 'lesson', 'article'):
+            value = get.get(name, '')
+            if value.isdigit():
+                found[name] = int(value)
+        author = get.get('author', '').strip()
+        if author:
+            found['author'] = author
+        for name in ('since', 'until'):
+            value = parse_date(get.get(name, '') or '')
+            if value is not None:
+                found[name] = value
+        return found
+
     def get_queryset(self) -> QuerySet[Any]:
-        qs =  super().get_queryset()
-        qs.select_related('sender').order_by('-created_at')
+        qs = super().get_queryset().select_related('sender')
+        f = self.filters()
+        lesson_type = ContentType.objects.get_for_model(Lesson)
+        if 'lesson' in f:
+            qs = qs.filter(thread_content_type=lesson_type, thread_object_id=f['lesson'])
+        elif 'course' in f:
+            qs = qs.filter(thread_content_type=lesson_type,
+                           thread_object_id__in=Lesson.objects.filter(unit__course_id=f['course']).values('id'))
+        if 'article' in f:
+            qs = qs.filter(thread_content_type=ContentType.objects.get_for_model(Article),
+                           thread_object_id=f['article'])
+        if 'author' in f:
+            qs = qs.filter(sender__username=f['author'])
+        tz = timezone.get_current_timezone()
+        if 'since' in f:
+            qs = qs.filter(created_at__gte=datetime.combine(f['since'], time.min, tzinfo=tz))
+        if 'until' in f:
+            qs = qs.filter(created_at__lt=datetime.combine(f['until'] + timedelta(days=1), time.min, tzinfo=tz))
         return qs
 
+    def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
+        context = super().get_context_data(**kwargs)
+        page = KeysetPaginator(self.object_list, self.per_page).page(self.request.GET.get('cursor'))
+        attach_targets(page.object_list)
+        params = self.request.GET.copy()
+        params.pop('cursor', None)
+        context.update({
+            'comments': page.object_list,
+            'page': page,
+            'filters': self.filters(),
+            'query': params.urlencode(),
+            'courses': Course.objects.only('id', 'name').order_by('name'),
+        })
+        return context
 
 
 
 
-class CourseCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
+
+class CourseCreateView(StreamingUploadMixin, LoginRequiredMixin, UserPassesTestMixin, CreateView):
     model = Course
     form_class = CourseModelForm
     template_name = 'operations/create_course.html'
+    streaming_upload_fields = {'image': ('.jpg', '.jpeg', '.png')}
 
     
     def test_func(self):
@@ -176,20 +247,24 @@ class CourseCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
 
         self.object = form.save(commit=False)
 
+        deferred = []
         f = self.request.FILES.get("image")
         if f:
             _, ext = os.path.splitext(f.name)
             if ext:
                 if ext in ('.jpg', '.jpeg', '.png'):
 
-                    key = upload_fileobj_to_s3(f, content_type=f.content_type)
-                    self.object.image = public_url(key)
+                    # uploaded by the job worker, the course shows up without an image until then
+                    self.object.image = None
+                    deferred.append(('image', f))
 
                     form.cleaned_data["image"] = None
                     if "image" in form.files:
                         del form.files["image"]
 
         self.object.save()
+        for field, uploaded in deferred:
+            defer_upload(self.request, self.object, field, uploaded)
         return HttpResponseRedirect(self.get_success_url())
 
     def get_success_url(self) -> str:
@@ -235,10 +310,13 @@ class UnitCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
         return reverse('UnitsManage', args=[self.object.course.pk])
 
 
-class LessonCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
+class LessonCreateView(StreamingUploadMixin, LoginRequiredMixin, UserPassesTestMixin, CreateView):
     model = Lesson
     form_class = LessonModelForm
     template_name = 'operations/create_lesson.html'
+    streaming_upload_fields = {'image': ('.jpg', '.jpeg', '.png'), 'video': ('.mp4',)}
+    # paid content, only reachable through signed URLs (utils.s3.signed_url)
+    streaming_upload_folders = {'video': PRIVATE_S3_FOLDER}
 
     
     def test_func(self):
@@ -265,31 +343,45 @@ class LessonCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
 
         self.object = form.save(commit=False)
 
+        deferred = []
         image = self.request.FILES.get("image")
         if image:
             _, ext = os.path.splitext(image.name)
             if ext:
                 if ext in ('.jpg', '.jpeg', '.png'):
-                    key = upload_fileobj_to_s3(image, content_type=image.content_type)
-                    self.object.image = public_url(key)
+                    # the job worker uploads it and fills the field in, see jobs/media.py
+                    self.object.image = None
+                    deferred.append(('image', image))
 
                     form.cleaned_data["image"] = None
                     if "image" in form.files:
                         del form.files["image"]
 
-        video = self.request.FILES.get("video")
+        token = form.cleaned_data.get("video_upload")
+        if token:
+            # the browser already sent the file to the bucket, only check it and keep the key
+            try:
+                key = finalize_video(token, self.request.user.pk)
+            except UploadError:
+                form.add_error('video', gettext("the video upload could not be verified, please upload it again"))
+                return self.form_invalid(form)
+            self.object.video = public_url(key)
+
+        video = None if token else self.request.FILES.get("video")
         if video:
             _, ext = os.path.splitext(video.name)
             if ext:
                 if ext in ('.mp4',):
-                    key = upload_fileobj_to_s3(video, content_type=video.content_type)
-                    self.object.video = public_url(key)
+                    self.object.video = None
+                    deferred.append(('video', video))
 
                     form.cleaned_data["video"] = None
                     if "video" in form.files:
                         del form.files["video"]
 
         self.object.save()
+        for field, uploaded in deferred:
+            defer_upload(self.request, self.object, field, uploaded, folder=self.streaming_upload_folders.get(field))
         return HttpResponseRedirect(self.get_success_url())
 
 
@@ -423,12 +515,22 @@ class LessonUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
                     if "image" in form.files:
                         del form.files["image"]
 
-        video = self.request.FILES.get("video")
+        token = form.cleaned_data.get("video_upload")
+        if token:
+            # the browser already sent the file to the bucket, only check it and keep the key
+            try:
+                key = finalize_video(token, self.request.user.pk)
+            except UploadError:
+                form.add_error('video', gettext("the video upload could not be verified, please upload it again"))
+                return self.form_invalid(form)
+            self.object.video = public_url(key)
+
+        video = None if token else self.request.FILES.get("video")
         if video:
             _, ext = os.path.splitext(video.name)
             if ext:
-                if ext in ('.mp4'):
-                    key = upload_fileobj_to_s3(video, content_type=video.content_type)
+                if ext in ('.mp4',):
+                    key = upload_fileobj_to_s3(video, content_type=video.content_type, folder=PRIVATE_S3_FOLDER)
                     self.object.video = public_url(key)
 
                     form.cleaned_data["video"] = None
@@ -505,6 +607,65 @@ def delete_comment(request, pk):
     if is_supervisor is None:
         return HttpResponseForbidden()
     
-    comment = get_object_or_404(Comment, id=pk)
-    comment.delete()
+    comment = get_object_or_404(Comment.objects.only('id'), id=pk)
+    delete_subtrees([comment.pk])
     return JsonResponse({'message': 'comment deleted successfully.'}, status=204)
+
+
+@login_required
+@require_http_methods(["POST"])
+def delete_comments(request):
+    "bulk moderation: the checked comments and all their replies go in one transaction"
+    is_teacher = getattr(request, 'is_teacher', None)
+    is_supervisor = getattr(request, 'is_supervisor', None)
+    teacher = getattr(request, 'teacher', None)
+
+    if teacher is None:
+        return HttpResponseForbidden()
+    if is_teacher is None:
+        return HttpResponseForbidden()
+    if is_supervisor is None:
+        return HttpResponseForbidden()
+
+    ids = [int(i) for i in request.POST.getlist('ids') if i.isdigit()]
+    delete_subtrees(ids)
+    next_url = request.POST.get('next', '')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = reverse('CommentsManage')
+    return HttpResponseRedirect(next_url)
+
+
+def _can_upload(request):
+    return (getattr(request, 'teacher', None) is not None
+            and getattr(request, 'is_teacher', None) is not None
+            and getattr(request, 'is_supervisor', None) is not None
+            and (request.is_teacher or request.is_supervisor))
+
+
+@login_required
+@require_http_methods(["POST"])
+def video_upload_start(request):
+    "presigned POST / multipart URLs so the browser uploads the lesson video straight to the bucket"
+    if not _can_upload(request):
+        return HttpResponseForbidden()
+    try:
+        data = json.loads(request.body)
+        ticket = start_video(request.user.pk, str(data.get('filename', '')), int(data.get('size', 0)))
+    except (ValueError, TypeError, AttributeError) as e:
+        # UploadError is a ValueError too
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(ticket)
+
+
+@login_required
+@require_http_methods(["POST"])
+def video_upload_complete(request):
+    "joins the parts of a multipart upload; the lesson form then submits the token"
+    if not _can_upload(request):
+        return HttpResponseForbidden()
+    try:
+        data = json.loads(request.body)
+        complete_video(str(data.get('token', '')), request.user.pk, data.get('parts') or [])
+    except (ValueError, TypeError, AttributeError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'token': data['token']})
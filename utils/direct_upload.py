@@ -0,0 +1,116 @@
+import math
+import os
+from django.conf import settings
+from django.core import signing
+from utils import s3
+
+
+SALT = "utils.direct_upload"
+
+VIDEO_TYPE = "video/mp4"
+VIDEO_EXTENSIONS = ('.mp4',)
+
+
+class UploadError(ValueError):
+    pass
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def start_video(user_id, filename, size):
+    """
+    يجهّز رفع فيديو درس من المتصفح مباشرة إلى الـ bucket.
+    الملفات الصغيرة: presigned POST واحد. الكبيرة: multipart مع رابط موقّع لكل جزء.
+    يرجع dict للمتصفح فيه token موقّع يُرسل لاحقاً مع نموذج الدرس.
+    """
+    _, ext = os.path.splitext(filename or '')
+    if ext.lower() not in VIDEO_EXTENSIONS:
+        raise UploadError("only .mp4 videos can be uploaded")
+    max_size = _setting('LESSON_VIDEO_MAX_SIZE', 2 * 1024 ** 3)
+    if not 0 < size <= max_size:
+        raise UploadError("video is empty or too large")
+
+    key = s3.new_key(filename, s3.PRIVATE_S3_FOLDER)
+    expires = _setting('DIRECT_UPLOAD_EXPIRES', 3600)
+    ticket = {'k': key, 's': size, 'u': user_id}
+
+    if size <= _setting('DIRECT_UPLOAD_MULTIPART_THRESHOLD', 64 * 1024 ** 2):
+        post = s3.presigned_post(key, VIDEO_TYPE, size, expires)
+        return {
+            'mode': 'post',
+            'url': post['url'],
+            'fields': post['fields'],
+            'token': signing.dumps(ticket, salt=SALT),
+        }
+
+    part_size = _setting('DIRECT_UPLOAD_PART_SIZE', 16 * 1024 ** 2)
+    # S3 allows at most 10000 parts, grow the part size for very large files
+    part_size = max(part_size, math.ceil(size / 10000))
+    part_count = math.ceil(size / part_size)
+    upload_id = s3.start_multipart(key, VIDEO_TYPE)
+    ticket['m'] = upload_id
+    return {
+        'mode': 'multipart',
+        'part_size': part_size,
+        'urls': s3.presigned_part_urls(key, upload_id, part_count, expires),
+        'token': signing.dumps(ticket, salt=SALT),
+    }
+
+
+def _ticket(token, user_id):
+    try:
+        ticket = signing.loads(token, salt=SALT, max_age=_setting('DIRECT_UPLOAD_EXPIRES', 3600) * 2)
+    except signing.BadSignature:
+        raise UploadError("upload token is invalid or expired")
+    if ticket.get('u') != user_id:
+        raise UploadError("upload token belongs to another user")
+    return ticket
+
+
+def complete_video(token, user_id, parts):
+    "Stitches the parts the browser uploaded; parts = [{'PartNumber': n, 'ETag': '...'}]."
+    ticket = _ticket(token, user_id)
+    if 'm' not in ticket:
+        return
+    try:
+        parts = sorted(({'PartNumber': int(p['PartNumber']), 'ETag': str(p['ETag'])} for p in parts),
+                       key=lambda p: p['PartNumber'])
+    except (KeyError, TypeError, ValueError):
+        raise UploadError("malformed part list")
+    if not parts:
+        raise UploadError("no parts were uploaded")
+    from botocore.exceptions import ClientError
+
+    try:
+        s3.complete_multipart(ticket['k'], ticket['m'], parts)
+    except ClientError:
+        # the stored parts are billed until aborted, the browser starts over with a new ticket
+        s3.abort_multipart(ticket['k'], ticket['m'])
+        raise UploadError("the video parts could not be joined, upload it again")
+
+
+def finalize_video(token, user_id):
+    """
+    يتحقق من الملف الموجود فعلاً في الـ bucket قبل ربطه بالدرس:
+    الحجم يساوي الحجم المعلن، النوع video/mp4، وأول البايتات توقيع MP4 (ftyp).
+    يرجع المفتاح، وأي ملف لا يطابق يُحذف، وأي multipart لم يكتمل يُلغى.
+    """
+    ticket = _ticket(token, user_id)
+    key = ticket['k']
+    meta = s3.head(key)
+    if meta is None:
+        if 'm' in ticket:
+            # never completed: drop the parts instead of waiting for abort_stale_uploads
+            s3.abort_multipart(key, ticket['m'])
+        raise UploadError("the video was not uploaded")
+    valid = (
+        meta.get('ContentLength') == ticket['s']
+        and meta.get('ContentType') == VIDEO_TYPE
+        and s3.read_head_bytes(key, 12)[4:8] == b'ftyp'
+    )
+    if not valid:
+        s3.delete(key)
+        raise UploadError("the uploaded file is not the declared mp4 video")
+    return key
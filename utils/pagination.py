@@ -0,0 +1,95 @@
+from django.core import signing
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+SALT = "utils.pagination.cursor"
+
+
+class KeysetPage:
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+
+class KeysetPaginator:
+    """
+    ترقيم صفحات بالمؤشر على (created_at, id) تنازلياً بدل OFFSET و COUNT(*).
+    أي صفحة تكلّف نفس تكلفة الصفحة الأولى ما دام هناك فهرس على (created_at, id).
+    المؤشر موقّع، وأي مؤشر تالف أو قديم يرجع للصفحة الأولى بدل رفع خطأ.
+    """
+    def __init__(self, queryset, per_page, order_field='created_at'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.order_field = order_field
+
+    def _cursor(self, obj, direction):
+        value = getattr(obj, self.order_field)
+        return signing.dumps({'v': value.isoformat(), 'i': obj.pk, 'd': direction}, salt=SALT)
+
+    def _decode(self, cursor):
+        if not cursor:
+            return None
+        try:
+            data = signing.loads(cursor, salt=SALT)
+            value = parse_datetime(data['v'])
+            if value is None or data['d'] not in ('n', 'p'):
+                return None
+            return value, int(data['i']), data['d']
+        except (signing.BadSignature, KeyError, TypeError, ValueError):
+            return None
+
+    def page(self, cursor=None):
+        field = self.order_field
+        decoded = self._decode(cursor)
+        limit = self.per_page + 1
+
+        if decoded is None:
+            rows = list(self.queryset.order_by(f'-{field}', '-pk')[:limit])
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_next, has_previous = has_more, False
+
+        elif decoded[2] == 'n':
+            value, pk, _ = decoded
+            after = Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk})
+            rows = list(self.queryset.filter(after).order_by(f'-{field}', '-pk')[:limit])
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_next, has_previous = has_more, True
+
+        else:
+            value, pk, _ = decoded
+            before = Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk})
+            rows = list(self.queryset.filter(before).order_by(field, 'pk')[:limit])
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            rows.reverse()
+            has_next, has_previous = True, has_more
+
+        if decoded is not None and not rows:
+            # the rows around the cursor were deleted, start over
+            return self.page(None)
+
+        return KeysetPage(
+            rows,
+            has_next,
+            has_previous,
+            self._cursor(rows[-1], 'n') if has_next else None,
+            self._cursor(rows[0], 'p') if has_previous else None,
+        )
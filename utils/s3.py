@@ -1,27 +1,219 @@
-import os, boto3
-from botocore.exceptions import ClientError
+import os
+import hashlib
+import logging
+import threading
+import time
 from schoolia import settings
 import random
 import uuid
 
-BUCKET = settings.AWS_STORAGE_BUCKET_NAME
-REGION = settings.AWS_S3_REGION_NAME
-UPLOAD_S3_FOLDER = settings.UPLOAD_S3_FOLDER
+logger = logging.getLogger(__name__)
 
-s3_client = boto3.client(
-    "s3",
-    region_name=REGION,
-    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
-    )
+# settings.py only defines these with USE_S3, the module still imports without them
+BUCKET = getattr(settings, 'AWS_STORAGE_BUCKET_NAME', None)
+REGION = getattr(settings, 'AWS_S3_REGION_NAME', None)
+UPLOAD_S3_FOLDER = getattr(settings, 'UPLOAD_S3_FOLDER', "media/courses/")
+# paid content: the bucket policy leaves it private, pages link to it through signed_url()
+PRIVATE_S3_FOLDER = getattr(settings, 'PRIVATE_S3_FOLDER', "private/lessons/")
+SIGNED_URL_WINDOW = getattr(settings, 'SIGNED_MEDIA_URL_WINDOW', 3600)
+
+ENDPOINT_URL = getattr(settings, 'AWS_S3_ENDPOINT_URL', None)
+
+MiB = 1024 * 1024
+
+TRANSFER = {
+    'image': {'multipart_threshold': 16 * MiB, 'multipart_chunksize': 8 * MiB, 'max_concurrency': 4},
+    'video': {'multipart_threshold': 32 * MiB, 'multipart_chunksize': 32 * MiB, 'max_concurrency': 10},
+    'default': {'multipart_threshold': 8 * MiB, 'multipart_chunksize': 8 * MiB, 'max_concurrency': 4},
+}
+TRANSFER.update(getattr(settings, 'S3_TRANSFER', {}))
+
+RETRIES = getattr(settings, 'S3_RETRIES', {'mode': 'standard', 'total_max_attempts': 5})
+
+# one pooled connection per transfer thread, otherwise parallel parts queue on the pool
+POOL_SIZE = getattr(settings, 'S3_MAX_POOL_CONNECTIONS',
+                    max(10, *(c.get('max_concurrency', 10) for c in TRANSFER.values())))
+CONNECT_TIMEOUT = getattr(settings, 'S3_CONNECT_TIMEOUT', 5)
+READ_TIMEOUT = getattr(settings, 'S3_READ_TIMEOUT', 60)
+
+_client = (None, None)
+_client_lock = threading.Lock()
+
+
+def client():
+    """
+    The process' boto3 client, built on first use: importing this module does not load boto3.
+    Clients are thread safe once built, sessions are not, so the build runs under a lock with a session of its own.
+    A child process never reuses its parent's client (and its pooled sockets): the pid is checked on every call.
+    """
+    global _client
+    pid, current = _client
+    if pid == os.getpid():
+        return current
+    with _client_lock:
+        if _client[0] != os.getpid():
+            import boto3
+            from botocore.config import Config
+
+            session = boto3.session.Session(
+                aws_access_key_id=getattr(settings, 'AWS_ACCESS_KEY_ID', None),
+                aws_secret_access_key=getattr(settings, 'AWS_SECRET_ACCESS_KEY', None),
+                region_name=REGION,
+            )
+            _client = (os.getpid(), session.client(
+                "s3",
+                endpoint_url=ENDPOINT_URL,
+                config=Config(
+                    retries=RETRIES,
+                    # presigned URLs (uploads, paid content) need SigV4 in every region
+                    signature_version='s3v4',
+                    max_pool_connections=POOL_SIZE,
+                    connect_timeout=CONNECT_TIMEOUT,
+                    read_timeout=READ_TIMEOUT,
+                    tcp_keepalive=True,
+                ),
+            ))
+        return _client[1]
+
+
+def __getattr__(name):
+    # s3.s3_client still works for code written when the client was a module global
+    if name == 's3_client':
+        return client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _missing(error, *codes):
+    return error.response.get("Error", {}).get("Code") in codes
+
+
+def file_class(name, content_type=None):
+    "Which TRANSFER entry a file uses: 'image', 'video' or 'default'."
+    kind = (content_type or '').split('/')[0]
+    _, ext = os.path.splitext(name or '')
+    if kind == 'video' or ext.lower() in ('.mp4',):
+        return 'video'
+    if kind == 'image' or ext.lower() in ('.jpg', '.jpeg', '.png', '.webp'):
+        return 'image'
+    return 'default'
+
+
+def transfer_config(kind='default', **overrides):
+    "boto3 TransferConfig for a file class; max_bandwidth is in bytes per second, None for no cap."
+    from boto3.s3.transfer import TransferConfig
+
+    options = {**TRANSFER.get(kind, TRANSFER['default']), **overrides}
+    return TransferConfig(use_threads=options.get('max_concurrency', 10) > 1, **options)
+
+
+class TransferProgress:
+    """
+    Callback for upload_fileobj: boto calls it from its worker threads with the bytes sent since the last call.
+    Logs every ``step`` percent, or every ``step`` MiB when the size is unknown.
+    """
 
-def upload_fileobj_to_s3(file_obj, key=None, content_type=None):
+    def __init__(self, label, size=None, step=10):
+        self.label = label
+        self.size = size
+        self.step = step
+        self.sent = 0
+        self.reported = 0
+        self._lock = threading.Lock()
 
-    _, ext = os.path.splitext(file_obj.name)
-    new_filename = f"{uuid.uuid4().hex}{ext}"
+    def __call__(self, bytes_sent):
+        with self._lock:
+            self.sent += bytes_sent
+            mark = self.sent * 100 // self.size if self.size else self.sent // MiB
+            if mark - self.reported < self.step and self.sent != self.size:
+                return
+            self.reported = mark
+        if self.size:
+            logger.info("upload %s: %d%% of %d bytes", self.label, mark, self.size)
+        else:
+            logger.info("upload %s: %d MiB", self.label, mark)
 
 
-    key = f"{UPLOAD_S3_FOLDER}{new_filename}"
+def new_key(filename, folder=None):
+    "مفتاح جديد فريد داخل مجلد الرفع مع الحفاظ على امتداد الملف"
+    _, ext = os.path.splitext(filename)
+    return f"{folder or UPLOAD_S3_FOLDER}{uuid.uuid4().hex}{ext.lower()}"
+
+
+def content_key(digest, filename, folder=None):
+    "The key of a file by its SHA-256: the same bytes always land on the same object (per folder)."
+    _, ext = os.path.splitext(filename or "")
+    return f"{folder or UPLOAD_S3_FOLDER}{digest}{ext.lower()}"
+
+
+def is_private(key):
+    return bool(key) and key.startswith(PRIVATE_S3_FOLDER)
+
+
+def file_digest(file_obj, chunk_size=MiB):
+    "(sha256 hex, size) of a file object, read in chunks and rewound."
+    digest = hashlib.sha256()
+    size = 0
+    chunks = file_obj.chunks(chunk_size) if hasattr(file_obj, "chunks") else iter(lambda: file_obj.read(chunk_size), b"")
+    for chunk in chunks:
+        digest.update(chunk)
+        size += len(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest(), size
+
+
+def find_existing(digest, size, filename=None, folder=None):
+    """
+    Key of an object already holding these bytes in ``folder``, or None.
+    The hash index answers first and HEAD confirms the object is still there with the same size;
+    without an index row the content key itself is checked (objects stored before the index existed).
+    """
+    from jobs.models import StoredObject
+
+    folder = folder or UPLOAD_S3_FOLDER
+    row = StoredObject.objects.filter(sha256=digest).first()
+    # a public copy must not serve paid content, nor the other way round
+    if row is not None and row.key.startswith(folder):
+        meta = head(row.key)
+        if meta is not None and meta.get("ContentLength") == size:
+            return row.key
+        row.delete()
+    if filename:
+        key = content_key(digest, filename, folder)
+        meta = head(key)
+        if meta is not None and meta.get("ContentLength") == size:
+            remember(digest, key, size)
+            return key
+    return None
+
+
+def remember(digest, key, size):
+    from jobs.models import StoredObject
+
+    StoredObject.objects.update_or_create(sha256=digest, defaults={"key": key, "size": size})
+
+
+def upload_fileobj_to_s3(file_obj, key=None, content_type=None, kind=None, progress=None, digest=None, folder=None):
+    """
+    kind: 'image' / 'video' / 'default' picks the transfer settings, guessed from the name and type when empty.
+    progress: callable(bytes_sent) called from the transfer threads; large videos log their progress by default.
+    digest: the file's SHA-256 when the caller already computed it while receiving the file.
+    folder: UPLOAD_S3_FOLDER by default, PRIVATE_S3_FOLDER for paid content.
+    The key is content addressed: bytes the bucket already has are not sent again.
+    """
+
+    # streamed to the bucket while the request was read (utils/upload_handlers.py)
+    if getattr(file_obj, "s3_key", None):
+        return file_obj.claim()
+
+    if digest is None:
+        digest, size = file_digest(file_obj)
+    else:
+        size = file_obj.size
+    existing = find_existing(digest, size, file_obj.name, folder)
+    if existing is not None:
+        return existing
+
+    key = content_key(digest, file_obj.name, folder)
 
     extra = {"ContentType": content_type} if content_type else {}
 
@@ -37,8 +229,14 @@ def upload_fileobj_to_s3(file_obj, key=None, content_type=None):
         except Exception:
             pass
 
+    kind = kind or file_class(file_obj.name, content_type)
+    if progress is None and kind == 'video':
+        progress = TransferProgress(key, size)
+
     # رفع الملف
-    s3_client.upload_fileobj(file_obj, BUCKET, key, ExtraArgs=extra)
+    client().upload_fileobj(file_obj, BUCKET, key, ExtraArgs=extra,
+                             Callback=progress, Config=transfer_config(kind))
+    remember(digest, key, size)
 
     return key
 
@@ -46,5 +244,182 @@ def public_url(key):
     """
     يبني رابط URL صحيح من المفتاح
     """
+    if ENDPOINT_URL:
+        return f"{ENDPOINT_URL.rstrip('/')}/{BUCKET}/{key}"
     return f"https://{BUCKET}.s3.{REGION}.amazonaws.com/{key}"
 
+
+def presigned_get(key, expires):
+    return client().generate_presigned_url("get_object", Params={"Bucket": BUCKET, "Key": key}, ExpiresIn=expires)
+
+
+SIGNED_KEY = "s3:signed:{window}:{digest}"
+
+
+def signed_url(key):
+    """
+    Presigned GET URL of a private object, one per key and SIGNED_MEDIA_URL_WINDOW: every page and worker
+    hands out the same URL for the whole window, so browsers keep the file cached, and signing happens once.
+    The URL lives until the end of the next window, a page opened just before the switch still plays.
+    """
+    from django.core.cache import cache
+
+    now = time.time()
+    window = int(now // SIGNED_URL_WINDOW)
+    cache_key = SIGNED_KEY.format(window=window, digest=hashlib.sha1(f"{BUCKET}/{key}".encode()).hexdigest())
+    url = cache.get(cache_key)
+    if url is None:
+        # SigV4 signatures last 7 days at most
+        url = presigned_get(key, min(int((window + 2) * SIGNED_URL_WINDOW - now), 7 * 24 * 3600))
+        # add(): when two workers sign at once, both hand out the first one's URL
+        if not cache.add(cache_key, url, int((window + 1) * SIGNED_URL_WINDOW - now) + 1):
+            url = cache.get(cache_key) or url
+    return url
+
+
+def key_from_url(url):
+    "The key behind a public_url() of this bucket, None for anything else (external links, local media)."
+    prefix = public_url("")
+    url = str(url or "")
+    if url.startswith(prefix) and len(url) > len(prefix):
+        return url[len(prefix):]
+    return None
+
+
+def head(key):
+    "ContentLength/ContentType/ETag of an object, None when it does not exist."
+    from botocore.exceptions import ClientError
+
+    try:
+        return client().head_object(Bucket=BUCKET, Key=key)
+    except ClientError as e:
+        if _missing(e, "404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+
+
+def read_head_bytes(key, length=64):
+    "The first bytes of an object (file signature checks) without downloading it."
+    response = client().get_object(Bucket=BUCKET, Key=key, Range=f"bytes=0-{length - 1}")
+    return response["Body"].read()
+
+
+def delete(key):
+    client().delete_object(Bucket=BUCKET, Key=key)
+
+
+def presigned_post(key, content_type, max_size, expires):
+    "Fields for a browser form POST of exactly this key, type and at most max_size bytes."
+    return client().generate_presigned_post(
+        BUCKET,
+        key,
+        Fields={"Content-Type": content_type},
+        Conditions=[
+            {"Content-Type": content_type},
+            ["content-length-range", 1, max_size],
+        ],
+        ExpiresIn=expires,
+    )
+
+
+def start_multipart(key, content_type):
+    return client().create_multipart_upload(Bucket=BUCKET, Key=key, ContentType=content_type)["UploadId"]
+
+
+def presigned_part_urls(key, upload_id, part_count, expires):
+    return [
+        client().generate_presigned_url(
+            "upload_part",
+            Params={"Bucket": BUCKET, "Key": key, "UploadId": upload_id, "PartNumber": number},
+            ExpiresIn=expires,
+        )
+        for number in range(1, part_count + 1)
+    ]
+
+
+def complete_multipart(key, upload_id, parts):
+    "parts: [{'PartNumber': 1, 'ETag': '...'}, ...] in order."
+    client().complete_multipart_upload(
+        Bucket=BUCKET, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts},
+    )
+
+
+def abort_multipart(key, upload_id):
+    "Drops the parts stored so far; an upload already completed or aborted is fine."
+    from botocore.exceptions import ClientError
+
+    try:
+        client().abort_multipart_upload(Bucket=BUCKET, Key=key, UploadId=upload_id)
+    except ClientError as e:
+        if not _missing(e, "404", "NoSuchUpload"):
+            raise
+
+
+def stale_multipart_uploads(before, prefix=""):
+    "(key, upload_id) of the multipart uploads started before an aware datetime and never completed."
+    paginator = client().get_paginator("list_multipart_uploads")
+    for page in paginator.paginate(Bucket=BUCKET, Prefix=prefix):
+        for upload in page.get("Uploads", []):
+            if upload["Initiated"] < before:
+                yield upload["Key"], upload["UploadId"]
+
+
+ABORT_RULE_ID = "abort-incomplete-multipart-uploads"
+
+
+def abort_incomplete_uploads_after(days):
+    """
+    Bucket lifecycle rule letting S3 drop the parts of uploads still incomplete after days.
+    The other rules of the bucket are kept.
+    """
+    from botocore.exceptions import ClientError
+
+    try:
+        rules = client().get_bucket_lifecycle_configuration(Bucket=BUCKET)["Rules"]
+    except ClientError as e:
+        if not _missing(e, "NoSuchLifecycleConfiguration"):
+            raise
+        rules = []
+    rules = [rule for rule in rules if rule.get("ID") != ABORT_RULE_ID]
+    rules.append({
+        "ID": ABORT_RULE_ID,
+        "Filter": {"Prefix": ""},
+        "Status": "Enabled",
+        "AbortIncompleteMultipartUpload": {"DaysAfterInitiation": days},
+    })
+    client().put_bucket_lifecycle_configuration(Bucket=BUCKET, LifecycleConfiguration={"Rules": rules})
+
+
+
+def put_bytes(key, body, content_type=None, cache_control=None):
+    extra = {"ContentType": content_type} if content_type else {}
+    if cache_control:
+        extra["CacheControl"] = cache_control
+    client().put_object(Bucket=BUCKET, Key=key, Body=bytes(body), **extra)
+
+
+def get_bytes(key):
+    return client().get_object(Bucket=BUCKET, Key=key)["Body"].read()
+
+
+def copy(source, key):
+    "Server side copy inside the bucket, in parallel parts for large objects."
+    client().copy({"Bucket": BUCKET, "Key": source}, BUCKET, key,
+                  Config=transfer_config(file_class(source)))
+
+
+def upload_part(key, upload_id, number, body):
+    "Uploads one part of a multipart upload and returns its entry for complete_multipart."
+    response = client().upload_part(Bucket=BUCKET, Key=key, UploadId=upload_id, PartNumber=number, Body=bytes(body))
+    return {"PartNumber": number, "ETag": response["ETag"]}
+
+
+def head_bucket():
+    from botocore.exceptions import ClientError
+
+    try:
+        return client().head_bucket(Bucket=BUCKET)
+    except ClientError as e:
+        if _missing(e, "404", "NoSuchBucket", "NotFound"):
+            return None
+        raise
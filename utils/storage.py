@@ -0,0 +1,141 @@
+import mimetypes
+import os
+import threading
+from django.conf import settings
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+from django.utils.module_loading import import_string
+from utils import s3
+
+
+class Storage:
+    """
+    The object operations the background jobs need, by key: the bucket in production,
+    a directory for tests and installs without S3 (OBJECT_STORAGE, see get_storage).
+    Multipart and presigned uploads only exist on S3 and stay in utils.s3.
+    """
+
+    def put_bytes(self, key, body, content_type=None, cache_control=None):
+        raise NotImplementedError
+
+    def get_bytes(self, key):
+        raise NotImplementedError
+
+    def head(self, key):
+        "{'ContentLength': ..., 'ContentType': ...} of an object, None when it does not exist."
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def url(self, key):
+        "Where a browser fetches the object; may expire (signed), so render it, don't store it."
+        raise NotImplementedError
+
+    def key_from_url(self, url):
+        "The key behind url() of this storage, None for anything else."
+        raise NotImplementedError
+
+
+class S3Storage(Storage):
+    def put_bytes(self, key, body, content_type=None, cache_control=None):
+        s3.put_bytes(key, body, content_type, cache_control=cache_control)
+
+    def get_bytes(self, key):
+        return s3.get_bytes(key)
+
+    def head(self, key):
+        return s3.head(key)
+
+    def delete(self, key):
+        s3.delete(key)
+
+    def url(self, key):
+        # paid content is only reachable through a signature
+        return s3.signed_url(key) if s3.is_private(key) else s3.public_url(key)
+
+    def key_from_url(self, url):
+        return s3.key_from_url(url)
+
+
+class LocalStorage(Storage):
+    """
+    Keys are paths under ``root`` (MEDIA_ROOT by default) and URLs are MEDIA_URL + key,
+    served by school.views.media_file. Cache-Control is the media view's business here.
+    """
+
+    def __init__(self, root=None, base_url=None):
+        self.root = os.fspath(root or getattr(settings, 'MEDIA_ROOT', None) or os.path.join(settings.BASE_DIR, 'media'))
+        self.base_url = base_url or settings.MEDIA_URL
+
+    def path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError(f"key outside the storage root: {key!r}")
+        return path
+
+    def put_bytes(self, key, body, content_type=None, cache_control=None):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # readers never see half a file
+        partial = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        with open(partial, 'wb') as f:
+            f.write(body)
+        os.replace(partial, path)
+
+    def get_bytes(self, key):
+        with open(self.path(key), 'rb') as f:
+            return f.read()
+
+    def head(self, key):
+        try:
+            size = os.path.getsize(self.path(key))
+        except OSError:
+            return None
+        return {'ContentLength': size, 'ContentType': mimetypes.guess_type(key)[0] or 'application/octet-stream'}
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def url(self, key):
+        return f"{self.base_url}{key}"
+
+    def key_from_url(self, url):
+        url = str(url or "")
+        if url.startswith(self.base_url) and len(url) > len(self.base_url):
+            return url[len(self.base_url):]
+        # file fields on local storage hold the bare name
+        if url and '://' not in url and not url.startswith('/'):
+            return url
+        return None
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """
+    The configured Storage, one per process: OBJECT_STORAGE is a dotted path,
+    empty for S3Storage with USE_S3 and LocalStorage without.
+    """
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                path = getattr(settings, 'OBJECT_STORAGE', '')
+                if not path:
+                    path = 'utils.storage.S3Storage' if getattr(settings, 'USE_S3', False) else 'utils.storage.LocalStorage'
+                _storage = import_string(path)()
+    return _storage
+
+
+@receiver(setting_changed)
+def _setting_changed(setting, **kwargs):
+    # override_settings in tests switches the storage too
+    global _storage
+    if setting in ('OBJECT_STORAGE', 'USE_S3', 'MEDIA_ROOT', 'MEDIA_URL'):
+        _storage = None
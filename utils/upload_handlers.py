@@ -0,0 +1,193 @@
+import hashlib
+import os
+from functools import wraps
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from utils import s3
+
+
+class S3UploadedFile(UploadedFile):
+    """
+    ملف وصل الـ bucket أثناء قراءة الطلب، لا يوجد منه شيء على السيرفر.
+    upload_fileobj_to_s3 يرجع s3_key مباشرة بدل رفعه مرة ثانية.
+    """
+
+    def __init__(self, s3_key, name, content_type, size, charset=None, content_type_extra=None):
+        super().__init__(None, name, content_type, size, charset, content_type_extra)
+        self.s3_key = s3_key
+        # set once the view keeps the key, see claim()
+        self.claimed = False
+        # (sha256, size) of a per-request key: deleted after the response unless claimed
+        self.disposable = None
+
+    def claim(self):
+        "The view keeps the object: a per-request key joins the content index so later uploads reuse it."
+        self.claimed = True
+        if self.disposable:
+            s3.remember(self.disposable[0], self.s3_key, self.disposable[1])
+        return self.s3_key
+
+    def open(self, mode=None):
+        return self
+
+    def close(self):
+        pass
+
+
+class S3StreamingUploadHandler(FileUploadHandler):
+    """
+    Sends the chosen file fields to the bucket while Django is still reading the request body, hashing them on the way.
+    Memory holds at most one part (STREAMING_UPLOAD_PART_SIZE) and nothing is written to /tmp.
+    ``fields`` maps a field name to the extensions to stream, None for any; other files take the usual path.
+    ``folders`` maps a field name to its bucket folder when it is not UPLOAD_S3_FOLDER (paid content).
+    """
+
+    def __init__(self, request=None, fields=None, folders=None):
+        super().__init__(request)
+        self.fields = fields or {}
+        self.folders = folders or {}
+        self.part_size = getattr(settings, 'STREAMING_UPLOAD_PART_SIZE', 8 * 1024 * 1024)
+        self.active = False
+
+    def _wanted(self, field_name, file_name):
+        if field_name not in self.fields:
+            return False
+        extensions = self.fields[field_name]
+        return extensions is None or os.path.splitext(file_name)[1] in extensions
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.active = self._wanted(field_name, file_name)
+        if not self.active:
+            return
+        self.folder = self.folders.get(field_name)
+        self.key = s3.new_key(file_name, self.folder)
+        self.upload_id = None
+        self.parts = []
+        self.buffer = bytearray()
+        self.size = 0
+        self.digest = hashlib.sha256()
+        raise StopFutureHandlers()
+
+    def _flush(self):
+        # the multipart upload only starts once a full part is waiting, small files go in one PUT
+        if self.upload_id is None:
+            self.upload_id = s3.start_multipart(self.key, self.content_type)
+        try:
+            self.parts.append(s3.upload_part(self.key, self.upload_id, len(self.parts) + 1, self.buffer))
+        except Exception:
+            self._abort()
+            raise
+        self.buffer = bytearray()
+
+    def _abort(self):
+        self.active = False
+        if self.upload_id is not None:
+            s3.abort_multipart(self.key, self.upload_id)
+            self.upload_id = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return raw_data
+        self.buffer += raw_data
+        self.size += len(raw_data)
+        self.digest.update(raw_data)
+        if len(self.buffer) >= self.part_size:
+            self._flush()
+        return None
+
+    def file_complete(self, file_size):
+        if not self.active:
+            return None
+        self.active = False
+        digest = self.digest.hexdigest()
+        disposable = None
+        if self.upload_id is None:
+            # the whole file is still in memory: a file the bucket already has is never sent
+            key = s3.find_existing(digest, self.size, self.file_name, self.folder)
+            if key is None:
+                key = s3.content_key(digest, self.file_name, self.folder)
+                s3.put_bytes(key, self.buffer, self.content_type)
+                s3.remember(digest, key, self.size)
+        else:
+            # the parts went out before the hash was known, keep one copy only
+            if self.buffer:
+                self._flush()
+            s3.complete_multipart(self.key, self.upload_id, self.parts)
+            key = s3.find_existing(digest, self.size, folder=self.folder)
+            if key is not None:
+                s3.delete(self.key)
+            else:
+                key = self.key
+                disposable = (digest, self.size)
+        self.buffer = bytearray()
+        uploaded = S3UploadedFile(key, self.file_name, self.content_type, self.size,
+                                  self.charset, self.content_type_extra)
+        uploaded.disposable = disposable
+        return uploaded
+
+    def upload_interrupted(self):
+        if self.active:
+            self._abort()
+
+
+def add_streaming_handler(request, fields, folders=None):
+    "Must run before anything touches request.POST/FILES."
+    request.upload_handlers.insert(0, S3StreamingUploadHandler(request, fields, folders))
+
+
+def discard_unclaimed(request):
+    """
+    Per-request keys the view did not keep (invalid form, failed CSRF check, an exception) are removed
+    from the bucket. Content addressed keys stay: other rows may point at the same object.
+    """
+    if not hasattr(request, '_files'):
+        return
+    for _, files in request.FILES.lists():
+        for f in files:
+            if isinstance(f, S3UploadedFile) and f.disposable and not f.claimed:
+                s3.delete(f.s3_key)
+
+
+def streaming_uploads(fields):
+    """
+    Function views: the CSRF check reads the body, so it moves inside, after the handler is added.
+    Put it under @login_required so anonymous requests never reach the bucket.
+    """
+    def decorator(view):
+        protected = csrf_protect(view)
+
+        @csrf_exempt
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'POST':
+                return protected(request, *args, **kwargs)
+            add_streaming_handler(request, fields)
+            try:
+                return protected(request, *args, **kwargs)
+            finally:
+                discard_unclaimed(request)
+        return wrapper
+    return decorator
+
+
+class StreamingUploadMixin:
+    """
+    Class based views: goes first in the bases so the login/permission mixins run before the body is read.
+    """
+    streaming_upload_fields = {}
+    streaming_upload_folders = {}
+
+    @method_decorator(csrf_exempt)
+    def dispatch(self, request, *args, **kwargs):
+        return super().dispatch(request, *args, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        add_streaming_handler(request, self.streaming_upload_fields, self.streaming_upload_folders)
+        try:
+            return csrf_protect(super().post)(request, *args, **kwargs)
+        finally:
+            discard_unclaimed(request)